@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+import tempfile
+
+from utils.benchmark import benchmark_parser
+from utils.benchmark import benchmark_order_statistics
+from utils.benchmark import benchmark_svm_probability
+
+from utils.validation import validates_main_benchmark_arguments
+
+
+# Default values (number of files/windows/rows and number of samples/features for each benchmark)
+N_FILES = {'parser': 4500, 'order_statistics': 1000, 'svm_probability': 2000}
+N_SAMPLES = {'parser': 3000, 'order_statistics': 2400, 'svm_probability': 88}
+
+
+parser = argparse.ArgumentParser(description="This script measures the performance of various stages of the experiment on synthetic data.")
+parser.add_argument('benchmark', type=str, help="The benchmark to run (either parser, order_statistics or svm_probability).")
+parser.add_argument('-fo', '--folder', type=str, default=None, help="The path of the folder where the synthetic data are created (temporary folder if not given).")
+parser.add_argument('-nf', '--n_files', type=int, default=None, help="The number of files of the synthetic dataset (number of windows for order_statistics, of rows for svm_probability).")
+parser.add_argument('-ns', '--n_samples', type=int, default=None, help="The number of samples per file of the synthetic dataset (per window for order_statistics, number of features for svm_probability).")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    benchmark = args.benchmark
+    folder = args.folder
+    n_files = args.n_files if args.n_files is not None else N_FILES.get(benchmark)
+    n_samples = args.n_samples if args.n_samples is not None else N_SAMPLES.get(benchmark)
+
+    # Validates arguments
+    errors = validates_main_benchmark_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Uses a temporary folder if none is given
+    temporary_folder = None
+    if folder is None and benchmark == 'parser':
+        temporary_folder = tempfile.TemporaryDirectory()
+        folder = temporary_folder.name
+
+    # Runs the benchmark
+    if benchmark == 'parser':
+        benchmark_parser(folder, n_files, n_samples)
+    elif benchmark == 'order_statistics':
+        benchmark_order_statistics(n_files, n_samples)
+    elif benchmark == 'svm_probability':
+        benchmark_svm_probability(n_files, n_samples)
+
+    if temporary_folder is not None:
+        temporary_folder.cleanup()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+
+from timeit import default_timer as timer
+
+from pipeline.acquisition import load_sisfall_data
+from pipeline.streaming import CascadeDetector
+
+from utils.utils import load_model_config
+from utils.validation import validates_main_cascade_arguments
+
+
+# Default values
+IGNORED_SUBJECTS = ['SA17', 'SA20', 'SA23', 'SE01', 'SE02', 'SE03', 'SE04', 'SE05', 'SE06', 'SE07', 'SE08', 'SE09', 'SE10', 'SE11', 'SE12', 'SE13', 'SE14', 'SE15']
+FREQUENCIES = [1, 2, 5, 10, 20, 50, 100, 200]
+MODEL = 'rf'
+SPLIT = 1
+CACHE_FOLDER = None
+WORKERS = 1
+HOP = 500
+THRESHOLD = 0.5
+GATE_THRESHOLD = 1.5
+GATE_JERK = 0.0
+GATE_HOLD = 10000
+
+
+parser = argparse.ArgumentParser(description="This script evaluates the impact gate of the cascade fall detector on the SisFall data set by comparing it with the detector scoring every window.")
+parser.add_argument('dataset_folder', type=str, help="The path of the folder containing the SisFall data set.")
+parser.add_argument('model_folder', type=str, help="The path of the folder where main_experiment saved the fitted models (--model_folder).")
+parser.add_argument('-is', '--ignored_subjects', type=str, default=IGNORED_SUBJECTS, nargs='+', help="The list of ignored subjects as subjects names from SA01 to SA23 and SE01 to SE15.")
+parser.add_argument('-fr', '--frequencies', type=int, default=FREQUENCIES, nargs='+', help="The list of frequencies of the models [Hz] as numbers from 1 to 200 included and divisor of 200.")
+parser.add_argument('-mo', '--model', type=str, default=MODEL, help="The machine learning algorithm of the models (either knn, svm, dt, rf or gb).")
+parser.add_argument('-sl', '--split', type=int, default=SPLIT, help="The split whose fitted model is used (must be at least 1).")
+parser.add_argument('-ca', '--cache_folder', type=str, default=CACHE_FOLDER, help="The path of the folder where the parsed dataset files are cached (no cache if not given).")
+parser.add_argument('-wo', '--workers', type=int, default=WORKERS, help="The number of processes used to load the dataset (must be at least 1).")
+parser.add_argument('-ho', '--hop', type=int, default=HOP, help="The time between two predictions in [ms] (must be at least 1).")
+parser.add_argument('-th', '--threshold', type=float, default=THRESHOLD, help="The fall score above which an alert is raised.")
+parser.add_argument('-gt', '--gate_threshold', type=float, default=GATE_THRESHOLD, help="The acceleration magnitude of a candidate impact in [g] (must be at least 0).")
+parser.add_argument('-gj', '--gate_jerk', type=float, default=GATE_JERK, help="The change of the acceleration magnitude of a candidate impact in [g/s] (must be at least 0).")
+parser.add_argument('-gh', '--gate_hold', type=int, default=GATE_HOLD, help="The time after a candidate impact during which the windows are scored in [ms] (must be at least 1).")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    dataset_folder = args.dataset_folder
+    model_folder = args.model_folder
+    ignored_subjects = args.ignored_subjects
+    frequencies = args.frequencies
+    model = args.model
+    split = args.split
+    cache_folder = args.cache_folder
+    workers = args.workers
+    hop = args.hop
+    threshold = args.threshold
+    gate_threshold = args.gate_threshold
+    gate_jerk = args.gate_jerk
+    gate_hold = args.gate_hold
+
+    # Validates arguments
+    errors = validates_main_cascade_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Loads the raw counts of all axes of SisFall dataset (the gate uses the accelerometer whatever the sensors of the models)
+    raw_dataset = load_sisfall_data(dataset_folder, ignored_subjects, list(range(0, 9)), cache_folder, workers, compact=True)
+    trials = [d.counts for d in raw_dataset['data']]
+    is_fall = raw_dataset['activity'].str.startswith('F').values
+
+    report = []
+    for frequency in frequencies:
+
+        # Loads the model of the frequency, its scaler and its configuration
+        frequency_model_folder = model_folder + '/' + str(frequency) + 'Hz'
+        config = load_model_config(frequency_model_folder)
+        classifier = joblib.load(frequency_model_folder + '/' + model + '_split_' + str(split) + '.joblib')
+        scaler = joblib.load(frequency_model_folder + '/scaler.joblib')
+        hop_samples = max(1, hop * frequency // 1000)
+        hold_samples = max(1, gate_hold * frequency // 1000)
+
+        # Replays each trial through the detector scoring every window (null gate) and through the gated detector
+        detectors = [CascadeDetector(classifier, scaler, config, hop_samples, 0, 0, hold_samples),
+                     CascadeDetector(classifier, scaler, config, hop_samples, gate_threshold, gate_jerk, hold_samples)]
+        alerts = np.zeros((len(detectors), len(trials)), dtype=bool)
+        times = []
+        for d, detector in enumerate(detectors):
+            start = timer()
+            for t, counts in enumerate(trials):
+                _, scores = detector.process(t, counts)
+                alerts[d, t] = np.any(scores >= threshold)
+                detector.remove_device(t)
+            times.append(timer() - start)
+
+        # Compares the windows scored, the falls detected and the false alarms of both detectors
+        gated = detectors[1]
+        recall = np.mean(alerts[:, is_fall], axis=1) if np.any(is_fall) else np.zeros(2)
+        false_alarms = np.mean(alerts[:, ~is_fall], axis=1) if np.any(~is_fall) else np.zeros(2)
+        report.append({'frequency': frequency, 'windows': gated.windows, 'scored': gated.gated,
+                       'skipped [%]': 100 * (1 - gated.gated / max(gated.windows, 1)), 'recall': recall[0],
+                       'gated recall': recall[1], 'recall lost': recall[0] - recall[1], 'false alarms': false_alarms[0],
+                       'gated false alarms': false_alarms[1], 'time [s]': times[0], 'gated time [s]': times[1]})
+        print(str(frequency) + "Hz: " + str(gated.gated) + " of " + str(gated.windows) + " windows scored, recall "
+              + '{:.3f}'.format(recall[0]) + " -> " + '{:.3f}'.format(recall[1]))
+
+    print()
+    print(pd.DataFrame(report).to_string(index=False, float_format='{:.3f}'.format))
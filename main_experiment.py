@@ -1,17 +1,34 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import argparse
+import numpy as np
 import pandas as pd
 
 from pipeline.acquisition import load_sisfall_data
-from pipeline.preprocessing import change_activity_duration
-from pipeline.preprocessing import change_activity_sampling
-from pipeline.preprocessing import divide_fall
-from pipeline.feature_extraction import extract_features
+from pipeline.acquisition import scale_counts
+from pipeline.acquisition import COLUMNS
+from pipeline.preprocessing import trim_activities
+from pipeline.preprocessing import resample_activities
+from pipeline.preprocessing import divide_falls
+from pipeline.feature_extraction import extract_features_batch
+from pipeline.feature_extraction import extract_segments_features
+from pipeline.feature_extraction import select_features
 from pipeline.processing import fit_and_test_classifiers
 from pipeline.evaluation import evaluate_classifiers
-
+from pipeline.evaluation import calculates_scores
+
+from utils.utils import create_output_hierarchy
+from utils.utils import append_results
+from utils.utils import load_results
+from utils.utils import save_checkpoint
+from utils.utils import load_checkpoint
+from utils.utils import save_model_config
+from utils.cache import dataset_fingerprint
+from utils.cache import features_cache_key
+from utils.cache import load_cached_features
+from utils.cache import cache_features
 from utils.validation import validates_main_experiment_arguments
 
 
@@ -25,6 +42,24 @@ POST_TIME = 500
 CLASSIFICATION = 'binary'
 MODELS = ['knn', 'svm', 'dt', 'rf', 'gb']
 K_FOLD = 5
+CACHE_FOLDER = None
+WORKERS = 1
+SPECTRAL = 'fft'
+RESAMPLING = 'decimate'
+N_JOBS = 1
+SCORES = 'probability'
+RESULTS = 'full'
+MODEL_FOLDER = None
+RENDERING = 'show'
+PLOT_JOBS = 1
+PLOTS = 'all'
+EXPORT = 'excel'
+FEATURE_CACHE = None
+FEATURE_CACHE_SIZE = 1024
+EXTRACTION = 'sensors'
+
+# Arguments which do not change the results (may differ when a run is resumed)
+UNCHECKED_ARGUMENTS = ['output_folder', 'cache_folder', 'feature_cache', 'feature_cache_size', 'workers', 'n_jobs', 'rendering', 'plot_jobs', 'plots', 'export', 'resume']
 
 
 parser = argparse.ArgumentParser(description="This script fits and tests various machine learning algorithms to differenciate between falls and activities of daily living and then output various results.")
@@ -32,13 +67,29 @@ parser.add_argument('dataset_folder', type=str, help="The path of the folder con
 parser.add_argument('output_folder', type=str, help="The path of the folder where all the results will be saved.")
 parser.add_argument('-se', '--sensors', type=int, default=SENSORS_AXES, nargs='+', help="The list of sensors axes as numbers from 0 to 8 included.")
 parser.add_argument('-is', '--ignored_subjects', type=str, default=IGNORED_SUBJECTS, nargs='+', help="The list of ignored subjects as subjects names from SA01 to SA23 and SE01 to SE15.")
-parser.add_argument('-du', '--duration', type=int, default=DURATION, help="The duration of the sample in [ms] as a number between 1000 and 12000 included.")
+parser.add_argument('-du', '--duration', type=int, default=DURATION, help="The duration of the sample in [ms] as a number between 1000 and 10000 included.")
 parser.add_argument('-fr', '--frequencies', type=int, default=FREQUENCIES, nargs='+', help="The list of frequencies of the sampling [Hz] as numbers from 1 to 200 included and divisor of 200.")
 parser.add_argument('-pr', '--pre_time', type=int, default=PRE_TIME, help="The duration after the impact in [ms] (must be between 100 and 5000, only available with multi-class).")
 parser.add_argument('-po', '--post_time', type=int, default=POST_TIME, help="The duration before the impact in [ms] (must be between 100 and 5000, only available with multi-class).")
 parser.add_argument('-cl', '--classification', type=str, default=CLASSIFICATION, help="The classification type (either binary or multi-class).")
 parser.add_argument('-mo', '--models', type=str, default=MODELS, nargs='+', help="The list of machine learning algorithms to use (either knn, svm, dt, rg or gb).")
 parser.add_argument('-kf', '--k_fold', type=int, default=K_FOLD, help="The number of folds to use (must be between 2 and 10).")
+parser.add_argument('-ca', '--cache_folder', type=str, default=CACHE_FOLDER, help="The path of the folder where the parsed dataset files are cached (no cache if not given).")
+parser.add_argument('-wo', '--workers', type=int, default=WORKERS, help="The number of processes used to load the dataset (must be at least 1).")
+parser.add_argument('-sp', '--spectral', type=str, default=SPECTRAL, help="The frequency domain features (either fft or rfft).")
+parser.add_argument('-rs', '--resampling', type=str, default=RESAMPLING, help="The resampling method (either decimate or polyphase).")
+parser.add_argument('-nj', '--n_jobs', type=int, default=N_JOBS, help="The number of processes used to fit and test the models (must be at least 1).")
+parser.add_argument('-sc', '--scores', type=str, default=SCORES, help="The scores of the models lacking cheap probabilities such as svm (either probability or decision).")
+parser.add_argument('-re', '--results', type=str, default=RESULTS, help="The results kept for each split (either full or light which drops the models and test data).")
+parser.add_argument('-mf', '--model_folder', type=str, default=MODEL_FOLDER, help="The path of the folder where the fitted models are saved (not saved if not given).")
+parser.add_argument('-rd', '--rendering', type=str, default=RENDERING, help="The rendering of the charts (either show or headless which only saves them without display).")
+parser.add_argument('-pj', '--plot_jobs', type=int, default=PLOT_JOBS, help="The number of processes used to render the charts in headless mode (must be at least 1).")
+parser.add_argument('-pl', '--plots', type=str, default=PLOTS, help="The charts to plot (either all or summary which skips the confusion matrix of each split).")
+parser.add_argument('-ex', '--export', type=str, default=EXPORT, help="The final export of the scores besides the results.csv store (either excel or none).")
+parser.add_argument('-fc', '--feature_cache', type=str, default=FEATURE_CACHE, help="The path of the folder where the feature matrices of each frequency are cached (not cached if not given).")
+parser.add_argument('-fs', '--feature_cache_size', type=int, default=FEATURE_CACHE_SIZE, help="The maximal size of the feature cache in [MB] (must be at least 1).")
+parser.add_argument('-fx', '--extraction', type=str, default=EXTRACTION, help="The channels whose features are extracted (either sensors or superset which extracts all axes once and selects the wanted sensors before fitting, only with rfft, whole sensors and binary classification).")
+parser.add_argument('-rm', '--resume', action='store_true', help="Resume the latest run of the output folder from its checkpoints (a new run is started if there is none).")
 args = parser.parse_args()
 
 
@@ -56,6 +107,22 @@ if __name__ == '__main__':
     classification = args.classification
     models = args.models
     k_fold = args.k_fold
+    cache_folder = args.cache_folder
+    workers = args.workers
+    spectral = args.spectral
+    resampling = args.resampling
+    n_jobs = args.n_jobs
+    scores = args.scores
+    lightweight = args.results == 'light'
+    model_folder = args.model_folder
+    headless = args.rendering == 'headless'
+    plot_jobs = args.plot_jobs
+    cnf_plots = args.plots == 'all'
+    excel = args.export == 'excel'
+    feature_cache = args.feature_cache
+    feature_cache_size = args.feature_cache_size
+    superset = args.extraction == 'superset'
+    resume = args.resume
 
     # Validates arguments
     errors = validates_main_experiment_arguments(args)
@@ -64,43 +131,101 @@ if __name__ == '__main__':
         [print(e) for e in errors]
         sys.exit("Invalid arguments. Aborted.")
 
-    # Loads SisFall dataset
-    raw_dataset = load_sisfall_data(dataset_folder, ignored_subjects, sensors)
+    columns = [COLUMNS[s] for s in sensors]
+    extracted_sensors = list(range(0, 9)) if superset else sensors
+    extracted_columns = [COLUMNS[s] for s in extracted_sensors]
+    class_names = ['ADL', 'Fall'] if classification == 'binary' else ['ADL', 'Fall', 'Pre-fall', 'Post-fall']
     all_results = []
 
-    # Preprocesses the dataset for each frequency
+    # Creates the output folder of the run or reuses the latest one (the scores are stored as soon as each split is done)
+    run_folder = create_output_hierarchy(output_folder, frequencies, models, resume)
+    checkpoint_folder = run_folder + '/checkpoints'
+
+    # Ensures a resumed run keeps the arguments changing its results
+    arguments = {k: v for k, v in vars(args).items() if k not in UNCHECKED_ARGUMENTS}
+    checkpointed_arguments = load_checkpoint(checkpoint_folder + '/arguments.joblib')
+    if checkpointed_arguments is not None and checkpointed_arguments != arguments:
+        sys.exit("The arguments differ from the resumed run " + run_folder + ". Aborted.")
+    save_checkpoint(arguments, checkpoint_folder + '/arguments.joblib')
+
+    # Lists the splits already stored
+    stored = load_results(output_folder, "run == '" + os.path.basename(run_folder) + "'")
+    stored_splits = set(zip(stored['frequency'], stored['abbreviation'], stored['ksplit']))
+    features_files = {f: checkpoint_folder + '/' + str(f) + 'Hz/features.joblib' for f in frequencies}
+
+    # Computes the keys of the feature matrices in the cache (content of the dataset and preprocessing parameters, the
+    # sensors are kept in their given order which sets the order of the columns and the grouping of the magnitudes)
+    features_keys = {}
+    if feature_cache is not None:
+        fingerprint = dataset_fingerprint(dataset_folder, ignored_subjects)
+        for frequency in frequencies:
+            parameters = {'sensors': extracted_sensors, 'ignored_subjects': sorted(ignored_subjects), 'duration': duration,
+                          'frequency': frequency, 'classification': classification, 'spectral': spectral,
+                          'resampling': resampling}
+            if classification != 'binary':
+                parameters.update({'pre_time': pre_time, 'post_time': post_time})
+            features_keys[frequency] = features_cache_key(fingerprint, parameters)
+
+    # Retrieves the checkpointed or cached features and lists the frequencies lacking features
+    features = {}
+    for frequency in frequencies:
+        features[frequency] = load_checkpoint(features_files[frequency])
+        if features[frequency] is None and feature_cache is not None:
+            features[frequency] = load_cached_features(feature_cache, features_keys[frequency])
+    missing_frequencies = [f for f in frequencies if features[f] is None]
+
+    # Loads SisFall dataset, changes the duration of all samples and resamples them at once (only if features are missing)
+    if len(missing_frequencies) != 0:
+        raw_dataset = load_sisfall_data(dataset_folder, ignored_subjects, extracted_sensors, cache_folder, workers, compact=True)
+        samples = trim_activities([d.counts for d in raw_dataset['data']], duration)
+        samples = scale_counts(np.stack(samples), extracted_sensors)
+        resampled = resample_activities(samples, missing_frequencies, resampling)
+        is_fall = raw_dataset['activity'].str.startswith('F').values
+
+    # Stores the scores of each split as soon as it is done (the splits stored by a resumed run are skipped)
+    def store_split(result, frequency):
+        if (frequency, result['abbreviation'], result['ksplit']) not in stored_splits:
+            split_results = pd.DataFrame([result])
+            split_results.insert(0, 'frequency', [frequency])
+            append_results(run_folder, calculates_scores(split_results, len(class_names)))
+            stored_splits.add((frequency, result['abbreviation'], result['ksplit']))
+
+    # Extracts the features for each frequency (or reuses the checkpointed or cached ones)
     for frequency in frequencies:
-        dataset = pd.DataFrame()
-        labels = []
-
-        for i in raw_dataset.index:
-            d = raw_dataset['data'][i]
-            d = change_activity_duration(d, duration)
-            d = change_activity_sampling(d, frequency)
-
-            is_fall = raw_dataset['activity'][i].startswith('F')
-            if classification == 'binary':
-                dataset = dataset.append(extract_features(d, True))
-                labels.append(1 if is_fall else 0)
-            else:
-                activity, pre_fall, post_fall = divide_fall(d, is_fall, pre_time, post_time)
-                dataset = dataset.append(extract_features(activity, True))
-                labels.append(1 if is_fall else 0)
-                if is_fall:
-                    dataset = dataset.append(extract_features(pre_fall, True))
-                    labels.append(2)
-                    dataset = dataset.append(extract_features(post_fall, True))
-                    labels.append(3)
-
-        # Fits and tests models
-        results = fit_and_test_classifiers(dataset, labels, models, k_fold)
+
+        if features[frequency] is not None:
+            dataset, labels = features.pop(frequency)
+        elif classification == 'binary':
+            data = resampled.pop(frequency)
+            dataset = extract_features_batch(data, extracted_columns, True, spectral=spectral, frequency=frequency)
+            labels = list(is_fall.astype(int))
+        else:
+            data = resampled.pop(frequency)
+            segments, labels = divide_falls(data, is_fall, pre_time, post_time)
+            dataset = extract_segments_features(data, segments, extracted_columns, True, spectral=spectral, frequency=frequency)
+        if not os.path.isfile(features_files[frequency]):
+            save_checkpoint((dataset, labels), features_files[frequency])
+        if frequency in missing_frequencies and feature_cache is not None:
+            cache_features(feature_cache, features_keys[frequency], (dataset, labels), feature_cache_size * 1024 ** 2)
+
+        # Selects the features of the wanted sensors from the features of all axes
+        if superset:
+            dataset = select_features(dataset, columns, True, spectral)
+
+        # Fits and tests models (the splits checkpointed by a previous run are reused)
+        frequency_model_folder = None
+        if model_folder is not None:
+            frequency_model_folder = model_folder + '/' + str(frequency) + 'Hz'
+            os.makedirs(frequency_model_folder, exist_ok=True)
+            save_model_config(frequency_model_folder, {'sensors': sensors, 'frequency': frequency, 'duration': duration, 'classification': classification, 'spectral': spectral, 'resampling': resampling})
+        results = fit_and_test_classifiers(dataset, labels, models, k_fold, n_jobs, scores == 'probability', lightweight, frequency_model_folder, checkpoint_folder + '/' + str(frequency) + 'Hz', lambda result: store_split(result, frequency))
         results.insert(0, 'frequency', [frequency] * len(models) * k_fold)
+        results = calculates_scores(results, len(class_names))
         all_results.append(results)
 
     all_results = pd.concat(all_results, sort=False)
     all_results.index = list(range(0, all_results.shape[0]))
 
-    class_names = ['ADL', 'Fall'] if classification == 'binary' else ['ADL', 'Fall', 'Pre-fall', 'Post-fall']
-    evaluate_classifiers(all_results, output_folder, class_names, frequencies, models, k_fold)
+    evaluate_classifiers(all_results, run_folder, class_names, frequencies, models, k_fold, headless, plot_jobs, cnf_plots, excel)
 
     print()
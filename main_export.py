@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import joblib
+import numpy as np
+
+from timeit import default_timer as timer
+
+from pipeline.acquisition import COLUMNS
+from pipeline.feature_extraction import extract_features_batch
+from pipeline.feature_extraction import features_names
+from pipeline.compiled import export_model
+from pipeline.compiled import load_compiled_model
+
+from utils.utils import load_model_config
+from utils.benchmark import time_function
+from utils.validation import validates_main_export_arguments
+
+
+# Default values
+OUTPUT_FILE = None
+N_ROWS = 1000
+REPEATS = 200
+
+
+parser = argparse.ArgumentParser(description="This script compiles a tree model saved by main_experiment and its scaler into flat NumPy arrays evaluated without scikit-learn.")
+parser.add_argument('model_file', type=str, help="The path of a decision tree, random forest or gradient boosting model saved by main_experiment with --model_folder (e.g. models/50Hz/rf_split_1.joblib).")
+parser.add_argument('-of', '--output_file', type=str, default=OUTPUT_FILE, help="The path of the compiled model (.npz, next to the model file if not given).")
+parser.add_argument('-nr', '--n_rows', type=int, default=N_ROWS, help="The number of random rows on which the compiled model is compared with the model (must be at least 1).")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    model_file = args.model_file
+    output_file = args.output_file if args.output_file is not None else os.path.splitext(model_file)[0] + '.npz'
+    n_rows = args.n_rows
+
+    # Validates arguments
+    errors = validates_main_export_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Loads the model, its scaler and its configuration
+    model_folder = os.path.dirname(os.path.abspath(model_file))
+    config = load_model_config(model_folder)
+    model = joblib.load(model_file)
+    scaler = joblib.load(model_folder + '/scaler.joblib')
+    columns = [COLUMNS[s] for s in config['sensors']]
+    names = features_names(columns, True, config['spectral'])
+
+    # Compiles the model and loads it back
+    export_model(model, scaler, config, names, output_file)
+    start = timer()
+    compiled = load_compiled_model(output_file)
+    load_time = timer() - start
+
+    # Compares the probabilities of both models on random rows within the range of the features
+    random = np.random.RandomState(0)
+    rows = scaler.data_min_ + random.rand(n_rows, len(names)) * (scaler.data_max_ - scaler.data_min_)
+    expected = model.predict_proba(scaler.transform(rows))
+    probabilities = compiled.predict_proba(rows)
+    agreement = np.mean(np.argmax(expected, axis=1) == np.argmax(probabilities, axis=1))
+
+    # Times the prediction of a single row and of a single window of samples
+    window = random.randn(1, max(1, config['duration'] * config['frequency'] // 1000), len(columns))
+    row_time, _ = time_function(lambda r: model.predict_proba(scaler.transform(r)), [rows[0:1]] * REPEATS)
+    compiled_row_time, _ = time_function(compiled.predict_proba, [rows[0:1]] * REPEATS)
+    window_time, _ = time_function(lambda w: model.predict_proba(scaler.transform(extract_features_batch(w, columns, True, config['spectral'], config['frequency']))), [window] * REPEATS)
+    compiled_window_time, _ = time_function(compiled.predict_windows, [window] * REPEATS)
+
+    print("compiled model  : " + output_file + " (" + '{:.1f}'.format(os.path.getsize(output_file) / 1024) + " kB, loaded in " + '{:.2f}'.format(load_time * 1000) + " ms)")
+    print("trees           : " + str(len(compiled.roots)) + " (" + str(len(compiled.feature)) + " nodes, depth " + str(compiled.depth) + ")")
+    print("used features   : " + str(len(compiled.names)) + " of " + str(len(names)))
+    print("max difference  : " + '{:.2e}'.format(np.max(np.abs(expected - probabilities))) + " on " + str(n_rows) + " random rows (" + '{:.1f}'.format(agreement * 100) + "% same classes)")
+    print("single row      : " + '{:.1f}'.format(row_time / REPEATS * 1e6) + " us with scikit-learn, " + '{:.1f}'.format(compiled_row_time / REPEATS * 1e6) + " us compiled")
+    print("single window   : " + '{:.1f}'.format(window_time / REPEATS * 1e6) + " us with scikit-learn, " + '{:.1f}'.format(compiled_window_time / REPEATS * 1e6) + " us compiled")
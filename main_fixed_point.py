@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.model_selection import StratifiedKFold
+
+from pipeline.acquisition import load_sisfall_data
+from pipeline.acquisition import scale_counts
+from pipeline.acquisition import COLUMNS
+from pipeline.preprocessing import trim_activities
+from pipeline.preprocessing import decimate_activities
+from pipeline.preprocessing import SENSOR_FREQUENCY
+from pipeline.feature_extraction import compute_time_features
+from pipeline.feature_extraction import add_magnitudes
+from pipeline.feature_extraction import features_names
+from pipeline.processing import fit_and_test_classifiers
+from pipeline.compiled import compile_model
+from pipeline.compiled import CompiledModel
+from pipeline.fixed_point import extract_fixed_point_features
+from pipeline.fixed_point import fixed_point_units
+from pipeline.fixed_point import count_operations
+from pipeline.fixed_point import QuantizedModel
+from pipeline.fixed_point import OPERATIONS
+
+from utils.benchmark import time_function
+from utils.validation import validates_main_fixed_point_arguments
+
+
+# Default values
+SENSORS_AXES = [0, 1, 2, 3, 4, 5]
+IGNORED_SUBJECTS = ['SA17', 'SA20', 'SA23', 'SE01', 'SE02', 'SE03', 'SE04', 'SE05', 'SE06', 'SE07', 'SE08', 'SE09', 'SE10', 'SE11', 'SE12', 'SE13', 'SE14', 'SE15']
+DURATION = 10000
+FREQUENCIES = [1, 2, 5, 10, 20, 50, 100, 200]
+MODELS = ['dt', 'rf', 'gb']
+K_FOLD = 5
+CACHE_FOLDER = None
+WORKERS = 1
+N_JOBS = 1
+FRACTION_BITS = 4
+VALUE_BITS = 15
+REPEATS = 50
+
+
+parser = argparse.ArgumentParser(description="This script compares the fall detection of tree models on time domain features computed in floating point with their quantized version evaluated with integer arithmetic only on raw analog counts, and counts the operations of each window on a sensor.")
+parser.add_argument('dataset_folder', type=str, help="The path of the folder containing the SisFall data set.")
+parser.add_argument('-se', '--sensors', type=int, default=SENSORS_AXES, nargs='+', help="The list of sensors axes as numbers from 0 to 8 included (whole sensors, i.e. groups of three consecutive axes).")
+parser.add_argument('-is', '--ignored_subjects', type=str, default=IGNORED_SUBJECTS, nargs='+', help="The list of ignored subjects as subjects names from SA01 to SA23 and SE01 to SE15.")
+parser.add_argument('-du', '--duration', type=int, default=DURATION, help="The duration of the sample in [ms] as a number between 1000 and 10000 included.")
+parser.add_argument('-fr', '--frequencies', type=int, default=FREQUENCIES, nargs='+', help="The list of frequencies of the sampling [Hz] as numbers from 1 to 200 included and divisor of 200.")
+parser.add_argument('-mo', '--models', type=str, default=MODELS, nargs='+', help="The list of tree models to quantize (either dt, rf or gb).")
+parser.add_argument('-kf', '--k_fold', type=int, default=K_FOLD, help="The number of folds to use (must be between 2 and 10).")
+parser.add_argument('-ca', '--cache_folder', type=str, default=CACHE_FOLDER, help="The path of the folder where the parsed dataset files are cached (no cache if not given).")
+parser.add_argument('-wo', '--workers', type=int, default=WORKERS, help="The number of processes used to load the dataset (must be at least 1).")
+parser.add_argument('-nj', '--n_jobs', type=int, default=N_JOBS, help="The number of processes used to fit and test the models (must be at least 1).")
+parser.add_argument('-fb', '--fraction_bits', type=int, default=FRACTION_BITS, help="The number of fractional bits of the fixed-point samples (must be between 2 and 4).")
+parser.add_argument('-vb', '--value_bits', type=int, default=VALUE_BITS, help="The number of fractional bits of the fixed-point values of the leaves (must be between 1 and 40).")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    dataset_folder = args.dataset_folder
+    sensors = args.sensors
+    ignored_subjects = args.ignored_subjects
+    duration = args.duration
+    frequencies = args.frequencies
+    models = args.models
+    k_fold = args.k_fold
+    cache_folder = args.cache_folder
+    workers = args.workers
+    n_jobs = args.n_jobs
+    fraction_bits = args.fraction_bits
+    value_bits = args.value_bits
+
+    # Validates arguments
+    errors = validates_main_fixed_point_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Loads the raw counts of SisFall dataset and changes the duration of all samples
+    raw_dataset = load_sisfall_data(dataset_folder, ignored_subjects, sensors, cache_folder, workers, compact=True)
+    counts = np.stack(trim_activities([d.counts for d in raw_dataset['data']], duration))
+    labels = raw_dataset['activity'].str.startswith('F').values.astype(int)
+    columns = [COLUMNS[s] for s in sensors]
+
+    # Names and units of the time domain features (the first features of the rfft features)
+    units = fixed_point_units(sensors, True, fraction_bits)
+    names = features_names(columns, True, 'rfft')[0:len(units)]
+
+    report = []
+    for frequency in frequencies:
+
+        # Decimates the counts (keeps one sample out of k, which needs no arithmetic on a sensor)
+        data = decimate_activities(counts, SENSOR_FREQUENCY // frequency)
+        length = data.shape[1]
+
+        # Extracts the time domain features in floating point from the converted samples and in fixed point from the counts
+        floating, _ = add_magnitudes(scale_counts(data, sensors), columns)
+        floating = compute_time_features(floating)
+        fixed = extract_fixed_point_features(data, sensors, True, fraction_bits)
+
+        # Fits and tests the models on the floating point features (with the same scaler and splits)
+        results = fit_and_test_classifiers(floating, labels, models, k_fold, n_jobs)
+        scaler = MinMaxScaler().fit(floating)
+        splits = list(StratifiedKFold(n_splits=k_fold, random_state=None, shuffle=False).split(floating, labels))
+        config = {'sensors': sensors, 'frequency': frequency, 'duration': duration, 'classification': 'binary',
+                  'spectral': 'rfft', 'resampling': 'decimate'}
+
+        for model in models:
+
+            # Predicts the test windows of each split with the quantized model and counts its operations
+            float_pred = np.zeros(len(labels), dtype=int)
+            fixed_pred = np.zeros(len(labels), dtype=int)
+            operations = []
+            for _, result in results[results['abbreviation'] == model].iterrows():
+                test_index = splits[result['ksplit'] - 1][1]
+                arrays = compile_model(result['classifier'], scaler, config, names)
+                compiled = CompiledModel(arrays)
+                quantized = QuantizedModel(arrays, units, value_bits)
+                float_pred[test_index] = compiled.classes_[np.argmax(result['y_pred'], axis=1)]
+                fixed_pred[test_index] = quantized.classes_[np.argmax(quantized.predict_proba(fixed[test_index]), axis=1)]
+                comparisons = np.mean(quantized.comparisons(fixed[test_index][:, quantized.inputs]))
+                operations.append(count_operations(quantized.names, columns, length, comparisons, len(quantized.roots)))
+
+            # Times the features and prediction of a single window in both arithmetics (models of the last split)
+            window = data[test_index[0:1]]
+            float_time, _ = time_function(lambda w: compiled.predict_proba(compute_time_features(add_magnitudes(scale_counts(w, sensors), columns)[0])), [window] * REPEATS)
+            fixed_time, _ = time_function(lambda w: quantized.predict_proba(extract_fixed_point_features(w, sensors, True, fraction_bits)), [window] * REPEATS)
+
+            row = {'frequency': frequency, 'model': model, 'accuracy': np.mean(float_pred == labels),
+                   'fixed accuracy': np.mean(fixed_pred == labels), 'agreement': np.mean(float_pred == fixed_pred)}
+            row.update({o: np.mean([c[o] for c in operations]) for o in OPERATIONS})
+            row['operations'] = sum(row[o] for o in OPERATIONS)
+            row.update({'float [us]': float_time / REPEATS * 1e6, 'fixed [us]': fixed_time / REPEATS * 1e6})
+            report.append(row)
+            print(str(frequency) + "Hz " + model + ": accuracy " + '{:.3f}'.format(row['accuracy']) + " -> "
+                  + '{:.3f}'.format(row['fixed accuracy']) + ", " + '{:.0f}'.format(row['operations'])
+                  + " operations per window")
+
+    print()
+    print(pd.DataFrame(report).to_string(index=False, float_format='{:.3f}'.format))
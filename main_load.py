@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import sys
+import asyncio
+import argparse
+
+from timeit import default_timer as timer
+
+from utils.load_generator import replay_files
+from utils.validation import validates_main_load_arguments
+
+
+# Default values
+HOST = '127.0.0.1'
+PORT = 9000
+PROTOCOL = 'tcp'
+DEVICES = 100
+SPEED = 1.0
+CHUNK = 40
+THRESHOLD = 0.5
+
+
+parser = argparse.ArgumentParser(description="This script replays SisFall files on many concurrent devices sending their samples to main_server and reports the latency of the scores and of the alerts.")
+parser.add_argument('data_files', type=str, nargs='+', help="The paths of the SisFall files to replay (assigned to the devices in turn).")
+parser.add_argument('-ip', '--host', type=str, default=HOST, help="The address of the server.")
+parser.add_argument('-pt', '--port', type=int, default=PORT, help="The port of the server (between 1 and 65535).")
+parser.add_argument('-pr', '--protocol', type=str, default=PROTOCOL, help="The protocol of the devices (either tcp or udp).")
+parser.add_argument('-de', '--devices', type=int, default=DEVICES, help="The number of concurrent devices (must be at least 1).")
+parser.add_argument('-sp', '--speed', type=float, default=SPEED, help="The replay speed as a factor of the real time (must be positive).")
+parser.add_argument('-ch', '--chunk', type=int, default=CHUNK, help="The number of samples sent at once by each device (must be at least 1).")
+parser.add_argument('-th', '--threshold', type=float, default=THRESHOLD, help="The fall score above which an alert is raised.")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    data_files = args.data_files
+    host = args.host
+    port = args.port
+    protocol = args.protocol
+    devices = args.devices
+    speed = args.speed
+    chunk = args.chunk
+    threshold = args.threshold
+
+    # Validates arguments
+    errors = validates_main_load_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Replays the files on all devices at once
+    print("Replaying " + str(len(data_files)) + " files on " + str(devices) + " " + protocol + " devices at " + str(speed) + "x real time")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    start = timer()
+    statistics = loop.run_until_complete(replay_files(data_files, devices, host, port, protocol, speed, chunk))
+    stop = timer()
+
+    [print(line) for line in statistics.report(threshold)]
+    print("duration          : " + '{:.2f}'.format(stop - start) + " s")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import asyncio
+import argparse
+import joblib
+
+from pipeline.streaming import CascadeDetector
+from pipeline.compiled import load_compiled_model
+from pipeline.serving import IngestionServer
+
+from utils.utils import load_model_config
+from utils.validation import validates_main_server_arguments
+
+
+# Default values
+HOST = '127.0.0.1'
+TCP_PORT = 9000
+UDP_PORT = 9001
+HOP = 500
+MAX_BATCH = 256
+DEADLINE = 20
+IDLE_TIMEOUT = 60
+GATE_THRESHOLD = None
+GATE_JERK = 0.0
+GATE_HOLD = 10000
+
+
+parser = argparse.ArgumentParser(description="This script serves a streaming fall detector to many devices sending their samples over TCP or UDP.")
+parser.add_argument('model_file', type=str, help="The path of a model saved by main_experiment with --model_folder (its folder also contains the scaler and the configuration) or of a model compiled by main_export (.npz).")
+parser.add_argument('-ip', '--host', type=str, default=HOST, help="The address to listen on.")
+parser.add_argument('-tp', '--tcp_port', type=int, default=TCP_PORT, help="The TCP port (between 1 and 65535, 0 disables TCP).")
+parser.add_argument('-up', '--udp_port', type=int, default=UDP_PORT, help="The UDP port (between 1 and 65535, 0 disables UDP).")
+parser.add_argument('-ho', '--hop', type=int, default=HOP, help="The time between two predictions of a device in [ms] (must be at least 1).")
+parser.add_argument('-mb', '--max_batch', type=int, default=MAX_BATCH, help="The maximal number of windows scored at once (must be at least 1).")
+parser.add_argument('-dl', '--deadline', type=int, default=DEADLINE, help="The maximal waiting time of a window before being scored in [ms] (must be at least 0).")
+parser.add_argument('-it', '--idle_timeout', type=int, default=IDLE_TIMEOUT, help="The time without message after which the state of a UDP device is dropped in [s] (must be at least 1, the state of the TCP devices is dropped when their connection closes).")
+parser.add_argument('-gt', '--gate_threshold', type=float, default=GATE_THRESHOLD, help="The acceleration magnitude of a candidate impact in [g] (must be at least 0, the windows are only scored after a candidate impact, no gate if not given).")
+parser.add_argument('-gj', '--gate_jerk', type=float, default=GATE_JERK, help="The change of the acceleration magnitude of a candidate impact in [g/s] (must be at least 0).")
+parser.add_argument('-gh', '--gate_hold', type=int, default=GATE_HOLD, help="The time after a candidate impact during which the windows are scored in [ms] (must be at least 1).")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    model_file = args.model_file
+    host = args.host
+    tcp_port = args.tcp_port if args.tcp_port != 0 else None
+    udp_port = args.udp_port if args.udp_port != 0 else None
+    hop = args.hop
+    max_batch = args.max_batch
+    deadline = args.deadline
+    idle_timeout = args.idle_timeout
+    gate_threshold = args.gate_threshold
+    gate_jerk = args.gate_jerk
+    gate_hold = args.gate_hold
+
+    # Validates arguments
+    errors = validates_main_server_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Loads the model, its scaler and its configuration (a compiled model holds its scaler and configuration)
+    if model_file.endswith('.npz'):
+        model = load_compiled_model(model_file)
+        scaler = None
+        config = model.config
+    else:
+        model_folder = os.path.dirname(os.path.abspath(model_file))
+        config = load_model_config(model_folder)
+        model = joblib.load(model_file)
+        scaler = joblib.load(model_folder + '/scaler.joblib')
+
+    # Creates the detector (the windows are only scored after a candidate impact with a gate). Without gate, every
+    # sample is a candidate impact so that every window is scored, and the cascade detector only keeps the samples of
+    # the windows of each device so that their features are extracted for a whole batch at once
+    hop_samples = max(1, hop * config['frequency'] // 1000)
+    if gate_threshold is None:
+        detector = CascadeDetector(model, scaler, config, hop_samples, 0.0, 0.0, 1)
+    else:
+        detector = CascadeDetector(model, scaler, config, hop_samples, gate_threshold, gate_jerk,
+                                   max(1, gate_hold * config['frequency'] // 1000))
+
+    # Serves the devices until interrupted
+    server = IngestionServer(detector, max_batch, deadline / 1000, idle_timeout)
+    print("Listening on " + host + " (TCP port " + str(tcp_port) + ", UDP port " + str(udp_port) + ")")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(server.serve(host, tcp_port, udp_port))
+    except KeyboardInterrupt:
+        print("Stopped.")
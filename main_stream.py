@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import argparse
+import joblib
+import numpy as np
+
+from timeit import default_timer as timer
+
+from pipeline.acquisition import parse_file
+from pipeline.preprocessing import SENSOR_FREQUENCY
+from pipeline.streaming import StreamingDetector
+from pipeline.streaming import CascadeDetector
+from pipeline.compiled import load_compiled_model
+
+from utils.utils import load_model_config
+from utils.validation import validates_main_stream_arguments
+
+
+# Default values
+HOP = 500
+THRESHOLD = 0.5
+CHUNK = 40
+GATE_THRESHOLD = None
+GATE_JERK = 0.0
+GATE_HOLD = 10000
+
+
+parser = argparse.ArgumentParser(description="This script replays SisFall files through a streaming fall detector built from a model saved by main_experiment.")
+parser.add_argument('model_file', type=str, help="The path of a model saved by main_experiment with --model_folder (its folder also contains the scaler and the configuration) or of a model compiled by main_export (.npz).")
+parser.add_argument('data_files', type=str, nargs='+', help="The paths of the SisFall files to replay.")
+parser.add_argument('-ho', '--hop', type=int, default=HOP, help="The time between two predictions in [ms] (must be at least 1).")
+parser.add_argument('-th', '--threshold', type=float, default=THRESHOLD, help="The fall score above which an alert is raised.")
+parser.add_argument('-ch', '--chunk', type=int, default=CHUNK, help="The number of samples sent at once by the device (must be at least 1).")
+parser.add_argument('-gt', '--gate_threshold', type=float, default=GATE_THRESHOLD, help="The acceleration magnitude of a candidate impact in [g] (must be at least 0, the windows are only scored after a candidate impact, no gate if not given).")
+parser.add_argument('-gj', '--gate_jerk', type=float, default=GATE_JERK, help="The change of the acceleration magnitude of a candidate impact in [g/s] (must be at least 0).")
+parser.add_argument('-gh', '--gate_hold', type=int, default=GATE_HOLD, help="The time after a candidate impact during which the windows are scored in [ms] (must be at least 1).")
+args = parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    # Gets script parameters
+    model_file = args.model_file
+    data_files = args.data_files
+    hop = args.hop
+    threshold = args.threshold
+    chunk = args.chunk
+    gate_threshold = args.gate_threshold
+    gate_jerk = args.gate_jerk
+    gate_hold = args.gate_hold
+
+    # Validates arguments
+    errors = validates_main_stream_arguments(args)
+    if len(errors) != 0:
+        print("Problems with script arguments. Please check the following arguments:")
+        [print(e) for e in errors]
+        sys.exit("Invalid arguments. Aborted.")
+
+    # Loads the model, its scaler and its configuration (a compiled model holds its scaler and configuration)
+    if model_file.endswith('.npz'):
+        model = load_compiled_model(model_file)
+        scaler = None
+        config = model.config
+    else:
+        model_folder = os.path.dirname(os.path.abspath(model_file))
+        config = load_model_config(model_folder)
+        model = joblib.load(model_file)
+        scaler = joblib.load(model_folder + '/scaler.joblib')
+
+    # Creates the detector (the windows are only scored after a candidate impact with a gate)
+    hop_samples = max(1, hop * config['frequency'] // 1000)
+    if gate_threshold is None:
+        detector = StreamingDetector(model, scaler, config, hop_samples)
+    else:
+        detector = CascadeDetector(model, scaler, config, hop_samples, gate_threshold, gate_jerk,
+                                   max(1, gate_hold * config['frequency'] // 1000))
+
+    # Replays each file chunk by chunk as a separate device
+    total_samples = 0
+    total_windows = 0
+    start = timer()
+    for data_file in data_files:
+        counts = parse_file(data_file)
+        scores = []
+        ends = []
+        for i in range(0, len(counts), chunk):
+            chunk_ends, chunk_scores = detector.process(data_file, counts[i:i + chunk])
+            ends += chunk_ends
+            scores.append(chunk_scores)
+        scores = np.concatenate(scores)
+        total_samples += len(counts)
+        total_windows += len(scores)
+
+        # Reports the alerts of the file
+        alerts = [e for e, s in zip(ends, scores) if s >= threshold]
+        line = os.path.basename(data_file) + ": " + str(len(scores)) + " windows"
+        if len(scores) != 0:
+            line += ", max score " + '{:.3f}'.format(np.max(scores))
+        if len(alerts) != 0:
+            line += ", first alert at " + '{:.2f}'.format(alerts[0] / SENSOR_FREQUENCY) + " s (" + str(len(alerts)) + " alerts)"
+        else:
+            line += ", no alert"
+        print(line)
+    stop = timer()
+
+    print()
+    print("Replayed " + str(total_samples) + " samples (" + '{:.1f}'.format(total_samples / SENSOR_FREQUENCY) + " s of data) and "
+          + str(total_windows) + " windows in " + '{:.3f}'.format(stop - start) + " s")
+    if gate_threshold is not None:
+        print("Scored " + str(detector.gated) + " of " + str(detector.windows) + " windows ending on a hop (the others were skipped by the gate)")
@@ -1,30 +1,166 @@
 import os
+import json
+import warnings
+import hashlib
+import numpy as np
 import pandas as pd
 
+from concurrent.futures import ProcessPoolExecutor
+
 
 # Theses activities have only one trial and therefore need a different pre-processing
 SPECIAL_ACTIVITIES = ['D01', 'D02', 'D03', 'D04']
 SPECIAL_ACTIVITIES_STARTS = [1000, 5000, 9000, 13000, 17000]
 
+# Columns of the SisFall files and type used to store the raw analog counts
+COLUMNS = ['acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z', 'acc_2_x', 'acc_2_y', 'acc_2_z']
+RAW_DTYPE = np.int16
+
+# Conversion of the analog counts of each axis in gravity and radians per second
+ADC_SCALES = np.array([(2 * 16) / (2 ** 13)] * 3 + [(2 * 2000) / (2 ** 16)] * 3 + [(2 * 8) / (2 ** 14)] * 3)
+ADC_FACTORS = np.array([1.0] * 3 + [3.14159 / 180] * 3 + [1.0] * 3)
+
+# Separators of the SisFall files
+SEPARATORS = bytes.maketrans(b',;', b'  ')
+
+# Name of the file listing the entries of the cache
+CACHE_MANIFEST = 'manifest.json'
+
+
+class Trial:
+    """
+    Raw analog counts of the sample of an activity. The counts are only converted when a stage asks for them, which
+    keeps the sample four times smaller in memory than its converted DataFrame.
+    """
+
+    __slots__ = ('counts', 'sensors_axes', 'start')
+
+    def __init__(self, counts, sensors_axes, start=0):
+        """
+        :param counts: array of shape (samples, len(sensors_axes)) containing the raw counts
+        :param sensors_axes: sensors' axes of the counts
+        :param start: index of the first sample in the file of the activity
+        """
+
+        self.counts = counts
+        self.sensors_axes = sensors_axes
+        self.start = start
+
+    def __len__(self):
+        return len(self.counts)
+
+    def values(self, dtype=np.float64):
+        """
+        Converts the counts in gravity (accelerometers) and radians per second (gyroscope).
+
+        :param dtype: type of the converted values
+        :return: an array of shape (samples, len(sensors_axes)) containing the converted values
+        """
+
+        return scale_counts(self.counts, self.sensors_axes, dtype)
+
+    def to_dataframe(self, dtype=np.float64):
+        """
+        Converts the counts into the DataFrame returned by read_file.
+
+        :param dtype: type of the converted values
+        :return: a DataFrame containing the data of the sample
+        """
+
+        data = pd.DataFrame(self.values(dtype), columns=[COLUMNS[i] for i in self.sensors_axes])
+        data.set_index(create_time_index(len(data), self.start), inplace=True)
+        return data
+
 
-def load_sisfall_data(folder_path, ignored_subjects, sensors_axes):
+def load_sisfall_data(folder_path, ignored_subjects, sensors_axes, cache_folder=None, workers=1, compact=False):
     """
     Load the data contained in the SisFall dataset into a DataFrame.
 
     :param folder_path: path to the sisfall dataset
     :param ignored_subjects: list of subjects to ignore
     :param sensors_axes: list of sensors' axes to use
+    :param cache_folder: path to the folder caching the parsed files (no cache if None)
+    :param workers: number of processes parsing the files
+    :param compact: keep the raw counts in Trial objects instead of converted DataFrames
     :return: DataFrame containing all data
     """
 
     # DataFrame containing the whole dataset
     dataset = []
 
+    # Lists and reads all files of the wanted subjects
+    files = list_sisfall_files(folder_path, ignored_subjects)
+    raw_data = read_raw_files([f[2] for f in files], cache_folder, workers)
+
+    if compact:
+        return pd.DataFrame(create_trials(files, raw_data, sensors_axes))
+
+    # Converts the data of all activities (in the sorted order of the files)
+    for (subject, activity, _), raw in zip(files, raw_data):
+        if activity[0:3] in SPECIAL_ACTIVITIES:
+            for data in split_special_activity(convert_raw_data(raw, sensors_axes)):
+                data = {'subject': subject, 'activity': activity[0:3], 'trial': activity[9:12], 'data': data}
+                dataset.append(data)
+        else:
+            data = convert_raw_data(raw, sensors_axes)
+            data = {'subject': subject, 'activity': activity[0:3], 'trial': activity[9:12], 'data': data}
+            dataset.append(data)
+
+    return pd.DataFrame(dataset)
+
+
+def create_trials(files, raw_data, sensors_axes):
+    """
+    Copies the raw counts of the wanted sensors' axes of all samples into one contiguous array and creates a Trial
+    viewing each sample.
+
+    :param files: list of tuples (subject, file name, file path) as returned by list_sisfall_files
+    :param raw_data: list of arrays of shape (samples, 9) containing the raw counts of the files
+    :param sensors_axes: list of sensors' axes to use
+    :return: list of dictionaries describing each sample
+    """
+
+    dataset = []
+
+    # Selects the samples of all activities
+    samples = []
+    for (subject, activity, _), raw in zip(files, raw_data):
+        if activity[0:3] in SPECIAL_ACTIVITIES:
+            for i in SPECIAL_ACTIVITIES_STARTS:
+                samples.append((subject, activity, i, raw[i:i + 2000]))
+        else:
+            samples.append((subject, activity, 0, raw))
+
+    # Allocates one array for the counts of all samples
+    offsets = np.cumsum([0] + [len(s[3]) for s in samples])
+    counts = np.empty((offsets[-1], len(sensors_axes)), dtype=RAW_DTYPE)
+
+    # Copies the counts and creates the trials
+    for (subject, activity, start, raw), low, high in zip(samples, offsets[:-1], offsets[1:]):
+        counts[low:high] = raw[:, sensors_axes]
+        data = Trial(counts[low:high], sensors_axes, start)
+        data = {'subject': subject, 'activity': activity[0:3], 'trial': activity[9:12], 'data': data}
+        dataset.append(data)
+
+    return dataset
+
+
+def list_sisfall_files(folder_path, ignored_subjects):
+    """
+    Lists the files of the SisFall dataset sorted by subject and activity.
+
+    :param folder_path: path to the sisfall dataset
+    :param ignored_subjects: list of subjects to ignore
+    :return: list of tuples (subject, file name, file path)
+    """
+
+    files = []
+
     # Lists all subjects
     subjects = os.listdir(folder_path)
     subjects.sort()
 
-    # Reads data from all subjects
+    # Lists the files of all subjects
     for subject in subjects:
         subject_path = folder_path + '/' + subject
 
@@ -36,25 +172,69 @@ def load_sisfall_data(folder_path, ignored_subjects, sensors_axes):
         activities = os.listdir(subject_path)
         activities.sort()
 
-        # Reads data for all activities
         for activity in activities:
             if activity.endswith('.txt'):
-                if activity[0:3] in SPECIAL_ACTIVITIES:
-                    for i in SPECIAL_ACTIVITIES_STARTS:
-                        data = read_file(subject_path + '/' + activity, sensors_axes)
-                        data = data.iloc[i:i + 2000, :]
-                        data = {'subject': subject, 'activity': activity[0:3], 'trial': activity[9:12], 'data': data}
-                        dataset.append(data)
-                else:
-                    data = read_file(subject_path + '/' + activity, sensors_axes)
-                    data = {'subject': subject, 'activity': activity[0:3], 'trial': activity[9:12], 'data': data}
-                    dataset.append(data)
+                files.append((subject, activity, subject_path + '/' + activity))
 
         # Used for test purposes
         """if subject.startswith('SA01'):
             break"""
 
-    return pd.DataFrame(dataset)
+    return files
+
+
+def read_raw_files(files_paths, cache_folder=None, workers=1):
+    """
+    Reads the raw analog counts of many activities. The files missing from the cache are parsed by a pool of processes
+    when more than one worker is wanted. The counts are returned in the order of the given files.
+
+    :param files_paths: list of the paths of the files
+    :param cache_folder: path to the folder caching the parsed files (no cache if None)
+    :param workers: number of processes parsing the files
+    :return: list of arrays of shape (samples, 9) containing the raw counts
+    """
+
+    # Loads the cache and removes the entries whose file changed or disappeared
+    manifest = None
+    if cache_folder is not None:
+        manifest = load_cache_manifest(cache_folder)
+        evict_stale_entries(cache_folder, manifest)
+
+    # Reads the counts still valid in the cache
+    raw_data = [load_cached_data(f, cache_folder, manifest) for f in files_paths]
+    missing = [i for i, data in enumerate(raw_data) if data is None]
+
+    # Parses the missing files
+    if workers > 1 and len(missing) > 1:
+        chunksize = max(1, len(missing) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_file, [files_paths[i] for i in missing], chunksize=chunksize))
+    else:
+        parsed = [parse_file(files_paths[i]) for i in missing]
+
+    # Adds the parsed files to the cache
+    for i, data in zip(missing, parsed):
+        raw_data[i] = data
+        if cache_folder is not None:
+            cache_raw_data(files_paths[i], data, cache_folder, manifest)
+
+    # Persists the new entries of the cache
+    if cache_folder is not None:
+        save_cache_manifest(cache_folder, manifest)
+
+    return raw_data
+
+
+def split_special_activity(data):
+    """
+    Splits the single long trial of a special activity into its five samples. The file is converted only once and the
+    samples are views of its data (no copy).
+
+    :param data: the data of the whole trial
+    :return: list of the samples of the activity
+    """
+
+    return [data.iloc[i:i + 2000, :] for i in SPECIAL_ACTIVITIES_STARTS]
 
 
 def read_file(file_path, sensors_axes):
@@ -67,19 +247,226 @@ def read_file(file_path, sensors_axes):
     :return: a DataFrame containing the data for one activity
     """
 
-    # Reads the file and add the defined columns names
-    names = ['acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z', 'acc_2_x', 'acc_2_y', 'acc_2_z']
-    data = pd.read_csv(file_path, header=None, names=names, usecols=names, sep=',|;', engine='python')
+    data = parse_file(file_path)
+    return convert_raw_data(data, sensors_axes)
+
+
+def parse_file(file_path):
+    """
+    Parses a SisFall file into an array of raw analog counts. The files have a fixed layout (nine integer columns
+    separated by commas and lines terminated by semicolons) which allows to read them straight into an array instead of
+    using the regex separator of the pandas parser.
+
+    :param file_path: the path of the file containing the data of the activity
+    :return: an array of shape (samples, 9) containing the raw counts
+    """
+
+    # Reads the whole file
+    with open(file_path, 'rb') as file:
+        content = file.read()
+
+    data = parse_counts(content)
+    if data is None:
+        raise ValueError("Invalid SisFall file: " + file_path)
+
+    return data
+
+
+def parse_counts(content):
+    """
+    Parses raw analog counts in the layout of the SisFall files (nine integer columns separated by commas and lines
+    terminated by semicolons).
+
+    :param content: bytes of the counts
+    :return: an array of shape (samples, 9) containing the raw counts (None if the layout is invalid or a count does
+    not fit in RAW_DTYPE)
+    """
+
+    # Turns all separators into whitespaces and parses all integers at once (NumPy stops at the first invalid token
+    # with a DeprecationWarning, a ValueError in later versions, so the whole content must be read)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            data = np.fromstring(content.translate(SEPARATORS), dtype=np.int64, sep=' ')
+        except (DeprecationWarning, ValueError):
+            return None
+    if data.size % len(COLUMNS) != 0:
+        return None
+
+    # Rejects the counts which would wrap around when cast
+    limits = np.iinfo(RAW_DTYPE)
+    if data.size != 0 and (data.min() < limits.min or data.max() > limits.max):
+        return None
+
+    return data.reshape(-1, len(COLUMNS)).astype(RAW_DTYPE)
+
+
+def parse_file_csv(file_path):
+    """
+    Parses a SisFall file into an array of raw analog counts with the pandas parser. Slower reference implementation of
+    parse_file.
+
+    :param file_path: the path of the file containing the data of the activity
+    :return: an array of shape (samples, 9) containing the raw counts
+    """
 
-    # Converts the analog data in gravity
-    d1 = data.iloc[:, 0:3] * ((2 * 16) / (2 ** 13))
-    d2 = data.iloc[:, 3:6] * ((2 * 2000) / (2 ** 16)) * (3.14159 / 180)
-    d3 = data.iloc[:, 6:9] * ((2 * 8) / (2 ** 14))
-    data = pd.concat([d1, d2, d3], axis=1)
+    data = pd.read_csv(file_path, header=None, names=COLUMNS, usecols=COLUMNS, sep=',|;', engine='python')
+    return data.values.astype(RAW_DTYPE)
 
-    # Selects sensors
-    data = data.iloc[:, sensors_axes]
-    index = pd.date_range('1/1/2000', periods=len(data), freq='5ms')
-    data.set_index(index, inplace=True)
+
+def convert_raw_data(data, sensors_axes):
+    """
+    Converts the raw analog counts of an activity into a DataFrame with a corresponding time series to the frequency
+    of the sensor.
+
+    :param data: array of shape (samples, 9) containing the raw counts
+    :param sensors_axes: the data from which sensors' axes is wanted
+    :return: a DataFrame containing the data for one activity
+    """
+
+    data = pd.DataFrame(convert_counts(data, sensors_axes), columns=[COLUMNS[i] for i in sensors_axes])
+    data.set_index(create_time_index(len(data)), inplace=True)
 
     return data
+
+
+def create_time_index(samples, start=0):
+    """
+    Creates the time series corresponding to the frequency of the sensor (200Hz).
+
+    :param samples: number of samples
+    :param start: index of the first sample in the file of the activity
+    :return: DatetimeIndex of the samples
+    """
+
+    return pd.date_range(pd.Timestamp('1/1/2000') + pd.Timedelta(5 * start, unit='ms'), periods=samples, freq='5ms')
+
+
+def convert_counts(data, sensors_axes, dtype=np.float64):
+    """
+    Converts the raw analog counts of the wanted sensors' axes in gravity (accelerometers) and radians per second
+    (gyroscope).
+
+    :param data: array of shape (..., 9) containing the raw counts
+    :param sensors_axes: the data from which sensors' axes is wanted
+    :param dtype: type of the converted values
+    :return: an array of shape (..., len(sensors_axes)) containing the converted values
+    """
+
+    return scale_counts(data[..., sensors_axes], sensors_axes, dtype)
+
+
+def scale_counts(counts, sensors_axes, dtype=np.float64):
+    """
+    Converts raw analog counts already restricted to the wanted sensors' axes.
+
+    :param counts: array of shape (..., len(sensors_axes)) containing the raw counts
+    :param sensors_axes: sensors' axes of the counts
+    :param dtype: type of the converted values
+    :return: an array of the same shape containing the converted values
+    """
+
+    data = counts * ADC_SCALES[sensors_axes] * ADC_FACTORS[sensors_axes]
+    return data.astype(dtype, copy=False)
+
+
+def load_cached_data(file_path, cache_folder, manifest):
+    """
+    Memory-maps the cached raw analog counts of an activity if the file did not change since it was cached.
+
+    :param file_path: the path of the file containing the data of the activity
+    :param cache_folder: path to the folder caching the parsed files (no cache if None)
+    :param manifest: entries of the cache as returned by load_cache_manifest
+    :return: an array of shape (samples, 9) containing the raw counts or None if not cached
+    """
+
+    if cache_folder is None:
+        return None
+
+    # Identifies the version of the file
+    entry = manifest.get(os.path.abspath(file_path))
+    if entry is None:
+        return None
+    stat = os.stat(file_path)
+
+    # Reads the cached counts if they are still valid
+    cached_path = cache_folder + '/' + entry['file']
+    if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns and os.path.isfile(cached_path):
+        return np.load(cached_path, mmap_mode='r')
+
+    return None
+
+
+def cache_raw_data(file_path, data, cache_folder, manifest):
+    """
+    Adds the raw analog counts of an activity to the cache.
+
+    :param file_path: the path of the file containing the data of the activity
+    :param data: array of shape (samples, 9) containing the raw counts
+    :param cache_folder: path to the folder caching the parsed files
+    :param manifest: entries of the cache as returned by load_cache_manifest
+    """
+
+    key = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    file_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy'
+    np.save(cache_folder + '/' + file_name, data)
+    manifest[key] = {'file': file_name, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def load_cache_manifest(cache_folder):
+    """
+    Loads the entries of the cache of parsed files. Creates the cache folder if it does not exist.
+
+    :param cache_folder: path to the folder caching the parsed files
+    :return: dictionary of the entries keyed by the absolute path of the files
+    """
+
+    os.makedirs(cache_folder, exist_ok=True)
+
+    manifest_path = cache_folder + '/' + CACHE_MANIFEST
+    if not os.path.isfile(manifest_path):
+        return {}
+
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+
+def save_cache_manifest(cache_folder, manifest):
+    """
+    Saves the entries of the cache of parsed files. The manifest is replaced atomically so that an interrupted run
+    never leaves a corrupted cache.
+
+    :param cache_folder: path to the folder caching the parsed files
+    :param manifest: entries of the cache
+    """
+
+    manifest_path = cache_folder + '/' + CACHE_MANIFEST
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def evict_stale_entries(cache_folder, manifest):
+    """
+    Removes the entries of the cache whose file was modified or deleted since it was cached.
+
+    :param cache_folder: path to the folder caching the parsed files
+    :param manifest: entries of the cache
+    """
+
+    for key in list(manifest.keys()):
+        entry = manifest[key]
+
+        # Checks that the file still exists with the same size and modification time
+        stale = not os.path.isfile(key)
+        if not stale:
+            stat = os.stat(key)
+            stale = entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns
+
+        # Removes the entry and its cached counts
+        if stale:
+            cached_path = cache_folder + '/' + entry['file']
+            if os.path.isfile(cached_path):
+                os.remove(cached_path)
+            del manifest[key]
@@ -0,0 +1,211 @@
+import json
+import numpy as np
+
+from pipeline.acquisition import COLUMNS
+from pipeline.feature_extraction import extract_features_subset
+
+
+def export_model(model, scaler, config, names, file_location):
+    """
+    Exports a fitted tree model (decision tree, random forest or gradient boosting) and the MinMaxScaler of its
+    features to flat NumPy arrays saved in a .npz file, which is loaded and evaluated without scikit-learn (see
+    load_compiled_model).
+
+    :param model: fitted DecisionTreeClassifier, RandomForestClassifier or GradientBoostingClassifier
+    :param scaler: fitted MinMaxScaler of the features
+    :param config: parameters of the preprocessing and feature extraction of the model (see save_model_config)
+    :param names: names of the features of the model (as the columns of extract_features_batch)
+    :param file_location: path of the .npz file
+    """
+
+    np.savez(file_location, **compile_model(model, scaler, config, names))
+
+
+def load_compiled_model(file_location):
+    """
+    Loads a model exported by export_model.
+
+    :param file_location: path of the .npz file
+    :return: CompiledModel
+    """
+
+    with np.load(file_location) as artifact:
+        return CompiledModel({k: artifact[k] for k in artifact.files})
+
+
+def compile_model(model, scaler, config, names):
+    """
+    Flattens a fitted tree model (decision tree, random forest or gradient boosting) and the MinMaxScaler of its
+    features into NumPy arrays. The nodes of all trees are concatenated, the leaves point to themselves and the
+    features are renumbered among the features used by the trees.
+
+    :param model: fitted DecisionTreeClassifier, RandomForestClassifier or GradientBoostingClassifier
+    :param scaler: fitted MinMaxScaler of the features
+    :param config: parameters of the preprocessing and feature extraction of the model (see save_model_config)
+    :param names: names of the features of the model
+    :return: dictionary of the arrays (see CompiledModel)
+    """
+
+    kind = type(model).__name__
+    classes = np.asarray(model.classes_)
+
+    # Lists the trees and how their outputs are combined (output = link(init + weight * sum of the leaves values))
+    if kind == 'DecisionTreeClassifier' or kind == 'RandomForestClassifier':
+        trees = [model] if kind == 'DecisionTreeClassifier' else list(model.estimators_)
+        outputs = len(classes)
+        weight = 1 / len(trees)
+        init = np.zeros(outputs)
+        link = 'identity'
+    elif kind == 'GradientBoostingClassifier':
+        trees = list(model.estimators_.ravel())
+        outputs = model.estimators_.shape[1]
+        weight = model.learning_rate
+        link = 'logistic' if outputs == 1 else 'softmax'
+
+        # Retrieves the initial raw prediction (prior of the classes) from the decision function of any row
+        x = np.zeros((1, len(names)))
+        leaves = np.sum([[tree.predict(x)[0] for tree in stage] for stage in model.estimators_], axis=0)
+        init = model.decision_function(x).reshape(-1) - weight * leaves
+    else:
+        raise ValueError("Unsupported model " + kind + " (only decision trees, random forests and gradient boosting)")
+
+    # Concatenates the nodes of all trees (the leaves point to themselves)
+    offsets = np.cumsum([0] + [tree.tree_.node_count for tree in trees])
+    feature, threshold, left, right, value = [], [], [], [], []
+    for i, tree in enumerate(trees):
+        nodes = tree.tree_
+        leaves = nodes.children_left == -1
+        indices = np.arange(nodes.node_count)
+        feature.append(np.where(leaves, -1, nodes.feature))
+        threshold.append(np.where(leaves, np.inf, nodes.threshold))
+        left.append(offsets[i] + np.where(leaves, indices, nodes.children_left))
+        right.append(offsets[i] + np.where(leaves, indices, nodes.children_right))
+
+        # Probabilities of the classes of the leaves (classifiers) or value added to the raw prediction of the
+        # class of the tree (gradient boosting)
+        if kind == 'GradientBoostingClassifier':
+            tree_value = np.zeros((nodes.node_count, outputs))
+            tree_value[:, i % outputs] = nodes.value[:, 0, 0]
+        else:
+            tree_value = nodes.value[:, 0, :] / np.sum(nodes.value[:, 0, :], axis=1, keepdims=True)
+        value.append(tree_value)
+    feature = np.concatenate(feature)
+
+    # Renumbers the features among the used ones (the leaves compare the first one)
+    inputs = np.unique(feature[feature >= 0])
+    feature = np.where(feature >= 0, np.searchsorted(inputs, feature), 0)
+
+    return {'feature': feature.astype(np.int32), 'threshold': np.concatenate(threshold),
+            'left': np.concatenate(left).astype(np.int32), 'right': np.concatenate(right).astype(np.int32),
+            'value': np.concatenate(value), 'roots': offsets[:-1].astype(np.int32),
+            'depth': np.array(max(tree.tree_.max_depth for tree in trees)), 'weight': np.array(weight), 'init': init,
+            'link': np.array(link), 'classes': classes, 'inputs': inputs, 'names': np.array(names)[inputs],
+            'scale': scaler.scale_[inputs], 'minimum': scaler.min_[inputs], 'config': np.array(json.dumps(config))}
+
+
+class CompiledModel:
+    """
+    Tree model and scaler compiled by compile_model. The trees are evaluated for many rows at once with NumPy only:
+    all rows descend all trees together, one level per step (the rows reaching a leaf early stay on it). Only the
+    features used by the trees are scaled and they can be extracted alone from the windows of samples.
+    """
+
+    def __init__(self, arrays):
+        """
+        :param arrays: dictionary of the arrays returned by compile_model
+        """
+
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = np.stack([arrays['right'], arrays['left']], axis=1).ravel()
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.depth = int(arrays['depth'])
+        self.weight = float(arrays['weight'])
+        self.init = arrays['init']
+        self.link = str(arrays['link'])
+        self.classes_ = arrays['classes']
+        self.inputs = arrays['inputs']
+        self.names = list(arrays['names'])
+        self.scale = arrays['scale']
+        self.minimum = arrays['minimum']
+        self.config = json.loads(str(arrays['config']))
+        self.columns = [COLUMNS[s] for s in self.config['sensors']]
+
+    def predict_proba(self, features):
+        """
+        Predicts the probabilities of the classes from all the features of the model (as the fitted scaler and model).
+
+        :param features: array of shape (rows, features) of the unscaled features of extract_features_batch
+        :return: array of shape (rows, classes)
+        """
+
+        return self.evaluate(np.asarray(features)[:, self.inputs])
+
+    def evaluate(self, x):
+        """
+        Predicts the probabilities of the classes from the features used by the trees.
+
+        :param x: array of shape (rows, len(names)) of the unscaled used features
+        :return: array of shape (rows, classes)
+        """
+
+        # Scales the features (compared in single precision as in scikit-learn)
+        x = (x * self.scale + self.minimum).astype(np.float32)
+
+        # Combines the values of the leaves
+        return self.probabilities(self.init + self.weight * np.sum(self.value[self.descend(x)], axis=1))
+
+    def descend(self, x):
+        """
+        Descends all trees for all rows at once (the children of node n are at 2n for the right and 2n + 1 for the
+        left).
+
+        :param x: array of shape (rows, len(names)) of the features compared with the thresholds
+        :return: array of shape (rows, trees) of the leaves reached
+        """
+
+        values = x.ravel()
+        offsets = (np.arange(len(x)) * x.shape[1])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(x), len(self.roots)))
+        for _ in range(self.depth):
+            nodes = self.children[2 * nodes + (values[offsets + self.feature[nodes]] <= self.threshold[nodes])]
+
+        return nodes
+
+    def probabilities(self, raw):
+        """
+        Converts the combined values of the leaves into probabilities of the classes.
+
+        :param raw: array of shape (rows, outputs)
+        :return: array of shape (rows, classes)
+        """
+
+        if self.link == 'logistic':
+            probability = 1 / (1 + np.exp(-raw[:, 0]))
+            return np.stack([1 - probability, probability], axis=1)
+        if self.link == 'softmax':
+            raw = np.exp(raw - np.max(raw, axis=1, keepdims=True))
+            return raw / np.sum(raw, axis=1, keepdims=True)
+        return raw
+
+    def extract_features(self, windows):
+        """
+        Extracts only the features used by the trees.
+
+        :param windows: array of shape (windows, time, channels) of the converted samples of the sensors of the model
+        :return: array of shape (windows, len(names)) of the unscaled used features
+        """
+
+        return extract_features_subset(windows, self.columns, self.names, True, self.config['spectral'],
+                                       self.config['frequency'])
+
+    def predict_windows(self, windows):
+        """
+        Predicts the probabilities of the classes of windows of samples.
+
+        :param windows: array of shape (windows, time, channels) of the converted samples of the sensors of the model
+        :return: array of shape (windows, classes)
+        """
+
+        return self.evaluate(self.extract_features(windows))
@@ -2,89 +2,171 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-from sklearn.metrics import accuracy_score
-from sklearn.metrics import f1_score
+from concurrent.futures import ProcessPoolExecutor
+
 from sklearn.metrics import roc_auc_score
-from sklearn.metrics import multilabel_confusion_matrix
-from sklearn.metrics import recall_score
-from sklearn.metrics import precision_score
-from sklearn.metrics import plot_confusion_matrix
+from sklearn.metrics import ConfusionMatrixDisplay
 
-from utils.utils import create_output_hierarchy
 from utils.utils import save_to_file
 
 
-def evaluate_classifiers(results, output, class_names, frequencies, models, k_fold):
+# Columns of the results plotted for each frequency and model
+METRICS = ['fit_time', 'test_time', 'accuracy', 'specificity', 'sensitivity', 'precision', 'f1', 'auroc']
+
+
+def evaluate_classifiers(results, output_folder, class_names, frequencies, models, k_fold, headless=False, plot_jobs=1,
+                         cnf_plots=True, excel=True):
     """
     Evaluates the scores of various metrics for each split of each classifier. Plots various
     charts to allow a better visualisation.
 
-    :param results: dataframe of results
-    :param output: root output directory
+    :param results: dataframe of results (or of scores already calculated by calculates_scores)
+    :param output_folder: output directory of the run (created by create_output_hierarchy)
     :param class_names: list of class labels
     :param frequencies: list of frequencies
     :param models: list of models
     :param k_fold: number of fold in the cross-validation
+    :param headless: render the charts without display (Agg backend) instead of showing them
+    :param plot_jobs: number of processes rendering the charts (only in headless mode)
+    :param cnf_plots: plot the confusion matrix of each split
+    :param excel: export the scores to an excel file
     """
 
-    # Create output hierarchy
-    output_folder = create_output_hierarchy(output, frequencies, models)
-
     # Evaluates classifiers
-    results = calculates_scores(results)
+    if 'cnf_matrix' not in results:
+        results = calculates_scores(results, len(class_names))
 
     # Plots charts
-    plot_cnf_matrix(results, output_folder, class_names, k_fold)
-    plot_baw(results, output_folder, frequencies, models, k_fold)
-    plot_variation_over_frequency(results, output_folder, frequencies, models, k_fold)
+    if headless:
+        plt.switch_backend('Agg')
+    if cnf_plots:
+        plot_cnf_matrix(results, output_folder, class_names, k_fold, headless, plot_jobs)
+    plot_baw(results, output_folder, frequencies, models, k_fold, headless=headless, plot_jobs=plot_jobs)
+    plot_variation_over_frequency(results, output_folder, frequencies, models, k_fold, headless=headless,
+                                  plot_jobs=plot_jobs)
 
-    # Saves scores to file
-    save_to_file(output_folder, results)
+    # Exports scores to file
+    if excel:
+        save_to_file(output_folder, results)
 
 
-def calculates_scores(results):
+def calculates_scores(results, n_classes=None):
     """
-    Calculates the scores of various metrics for each split of each classifier.
+    Calculates the scores of various metrics for each split of each classifier. The confusion matrix of each split is
+    computed once from the stored predictions and all metrics except the AUROC are derived from the matrices of all
+    splits at once.
 
     :param results: dataframe of results
-    :return: dataframe of scores
+    :param n_classes: number of classes (deduced from the labels if None)
+    :return: dataframe of scores (with the confusion matrix of each split)
     """
 
-    scores = []
+    y_tests = list(results['y_test'])
+    y_scores = []
+    y_preds = []
 
-    # Evaluates each k-split of each classifier
+    # Converts the predicted scores of each k-split of each classifier
     for i in results.index:
-        y_test = results['y_test'][i]
-        y_pred = results['y_pred'][i]
-
-        # Calculates various metrics
-        auroc = roc_auc_score(y_test, y_pred if y_pred.shape[1] > 2 else y_pred[:, 1], average='macro', multi_class='ovo')
-        y_pred = np.argmax(y_pred, axis=1)
-        acc = accuracy_score(y_test, y_pred)
-        sp = specificity_score(y_test, y_pred)
-        se = recall_score(y_test, y_pred, average='macro')
-        pre = precision_score(y_test, y_pred, average='macro')
-        f1 = f1_score(y_test, y_pred, average='macro')
-
-        # Merge scores
-        score = {'accuracy': acc, 'specificity': sp, 'sensitivity': se, 'precision': pre, 'f1': f1, 'auroc': auroc}
-        scores.append(score)
+        y_score, y_pred = scores_to_predictions(results['y_pred'][i], results['score_type'][i] if 'score_type' in results else 'proba')
+        y_scores.append(y_score)
+        y_preds.append(y_pred)
+
+    # Calculates the AUROC from the scores
+    auroc = [roc_auc_score(y_test, y_score, average='macro', multi_class='ovo') for y_test, y_score in zip(y_tests, y_scores)]
+
+    # Calculates the other metrics from the confusion matrices
+    if n_classes is None:
+        n_classes = int(max(max(np.max(y_test), np.max(y_pred)) for y_test, y_pred in zip(y_tests, y_preds))) + 1
+    cnf_matrices = confusion_matrices(y_tests, y_preds, n_classes)
+    scores = scores_from_confusion_matrices(cnf_matrices)
+    scores['auroc'] = auroc
+    scores['cnf_matrix'] = list(cnf_matrices)
 
     # return dataframe of scores
-    scores = pd.DataFrame(scores)
+    scores = pd.DataFrame(scores, index=results.index)
     return pd.concat([results, scores], axis=1)
 
 
-def plot_cnf_matrix(results, output_folder, class_names, k_fold):
+def confusion_matrices(y_tests, y_preds, n_classes):
+    """
+    Computes the confusion matrices of many splits with one count of all (split, true label, predicted label) pairs.
+
+    :param y_tests: list of the true labels of each split
+    :param y_preds: list of the predicted labels of each split
+    :param n_classes: number of classes
+    :return: array of shape (splits, n_classes, n_classes) with the true labels as rows
+    """
+
+    splits = np.repeat(np.arange(len(y_tests)), [len(y) for y in y_tests])
+    pairs = (splits * n_classes + np.concatenate(y_tests)) * n_classes + np.concatenate(y_preds)
+    counts = np.bincount(pairs.astype(int), minlength=len(y_tests) * n_classes * n_classes)
+
+    return counts.reshape(len(y_tests), n_classes, n_classes)
+
+
+def scores_from_confusion_matrices(cnf_matrices):
+    """
+    Calculates the accuracy, specificity, sensitivity, precision and f1 of many splits from their confusion matrices.
+    The macro averages only include the classes present in the true or predicted labels of each split and the
+    ill-defined ratios count as zero, as with scikit-learn.
+
+    :param cnf_matrices: array of shape (splits, n_classes, n_classes) with the true labels as rows
+    :return: dictionary of arrays of the scores of each split
+    """
+
+    total = np.sum(cnf_matrices, axis=(1, 2))
+    tp = np.diagonal(cnf_matrices, axis1=1, axis2=2)
+    positives = np.sum(cnf_matrices, axis=2)
+    predicted = np.sum(cnf_matrices, axis=1)
+    fp = predicted - tp
+    fn = positives - tp
+    tn = total[:, np.newaxis] - tp - fp - fn
+    present = (positives + predicted) > 0
+
+    # Ratios per class (zero when ill-defined)
+    sensitivity = ratio(tp, positives)
+    precision = ratio(tp, predicted)
+    f1 = ratio(2 * tp, 2 * tp + fp + fn)
+    specificity = ratio(tn, tn + fp)
+
+    # Macro averages over the present classes
+    n_present = np.sum(present, axis=1)
+    scores = {
+        'accuracy': np.sum(tp, axis=1) / total,
+        'specificity': np.sum(specificity * present, axis=1) / 4,
+        'sensitivity': np.sum(sensitivity * present, axis=1) / n_present,
+        'precision': np.sum(precision * present, axis=1) / n_present,
+        'f1': np.sum(f1 * present, axis=1) / n_present
+    }
+    return scores
+
+
+def ratio(numerator, denominator):
+    """
+    Divides two arrays element-wise with zero where the denominator is zero.
+
+    :param numerator: array of numerators
+    :param denominator: array of denominators
+    :return: array of ratios
     """
-    Plots the confusion matrices for each k-fold of each classifier.
+
+    return np.divide(numerator, denominator, out=np.zeros(np.shape(numerator)), where=denominator > 0)
+
+
+def plot_cnf_matrix(results, output_folder, class_names, k_fold, headless=False, plot_jobs=1):
+    """
+    Plots the confusion matrices for each k-fold of each classifier from the matrices computed by calculates_scores.
 
     :param results: dataframe of scores
     :param output_folder: output directory
     :param class_names: list of class labels
     :param k_fold: number of fold in the cross-validation
+    :param headless: render the charts without display instead of showing them
+    :param plot_jobs: number of processes rendering the charts (only in headless mode)
     """
 
+    charts = []
+
     # Plots a chart for each k-split of each classifier
     for i in results.index:
 
@@ -92,22 +174,17 @@ def plot_cnf_matrix(results, output_folder, class_names, k_fold):
         name = results['name'][i]
         abbreviation = results['abbreviation'][i]
         frequency = str(results['frequency'][i]) + 'Hz'
-        clf = results['classifier'][i]
-        x_test = results['x_test'][i]
-        y_test = results['y_test'][i]
+        title = name + ": K-split " + str(i % k_fold + 1) + ' (' + frequency + ')'
 
-        # Creates and configures plot
-        disp = plot_confusion_matrix(clf, x_test, y_test, display_labels=class_names, cmap=plt.cm.Blues)
-        disp.ax_.set_title(name + ": K-split " + str(i % k_fold + 1) + ' (' + frequency + ')')
-
-        # Saves and shows figure
+        # Location of the figure
         save_folder = output_folder + '/plots/' + frequency + '/cnf/' + abbreviation
         file_location = save_folder + '/cnf_' + frequency + '_' + abbreviation + '_split_' + str(i % k_fold + 1) + '.png'
-        plt.savefig(file_location)
-        plt.show()
+        charts.append((results['cnf_matrix'][i], class_names, title, file_location))
+
+    render_charts(draw_cnf_matrix, charts, headless, plot_jobs)
 
 
-def plot_baw(results, output_folder, frequencies, models, k_fold, axes_ylim=None):
+def plot_baw(results, output_folder, frequencies, models, k_fold, axes_ylim=None, headless=False, plot_jobs=1):
     """
     Plots box and whisker charts of each classifier and their cross-validation (k-split) . Creates one plot
     per metric per frequency which compares the performance of each model.
@@ -118,31 +195,31 @@ def plot_baw(results, output_folder, frequencies, models, k_fold, axes_ylim=None
     :param models: list of classifiers
     :param k_fold: number of fold in the cross-validation
     :param axes_ylim: specific y-axis limits
+    :param headless: render the charts without display instead of showing them
+    :param plot_jobs: number of processes rendering the charts (only in headless mode)
     """
 
+    charts = []
+
     # Plots a chart for each metric of each frequency
     for frequency in frequencies:
-        for column in results.columns[8:]:
+        for column in METRICS:
 
             # Retrieves relevant results
             result = results.loc[results['frequency'] == frequency][column]
             freq = str(frequency) + 'Hz'
             scores = pd.DataFrame(result.values.reshape(k_fold, -1, order='F'))
 
-            # Creates and configures plot
-            plt.boxplot(scores, labels=models)
-            axes = plt.gca()
-            if axes_ylim is not None:
-                axes.set_ylim(axes_ylim)
-
-            # Saves and shows figure
+            # Location of the figure
             save_folder = output_folder + '/plots/' + freq + '/baw/'
             file_location = save_folder + 'baw_' + column + '_' + freq + '.png'
-            plt.savefig(file_location)
-            plt.show()
+            charts.append((scores, models, axes_ylim, file_location))
 
+    render_charts(draw_baw, charts, headless, plot_jobs)
 
-def plot_variation_over_frequency(results, output_folder, frequencies, models, k_fold, axes_ylim=None):
+
+def plot_variation_over_frequency(results, output_folder, frequencies, models, k_fold, axes_ylim=None, headless=False,
+                                  plot_jobs=1):
     """
     Plot the metrics' variations over the frequencies. Creates one plot per metric which
     compares the performance of each model across the frequencies.
@@ -153,12 +230,14 @@ def plot_variation_over_frequency(results, output_folder, frequencies, models, k
     :param models: list of classifiers
     :param k_fold: number of fold in the cross-validation
     :param axes_ylim: specific y-axis limits
+    :param headless: render the charts without display instead of showing them
+    :param plot_jobs: number of processes rendering the charts (only in headless mode)
     """
 
-    markers = ['o', ',', 'd', 's', 'v']
+    charts = []
 
     # Plots a chart for each metric
-    for column in results.columns[8:]:
+    for column in METRICS:
         result = results[column]
 
         # Calculates mean for each model
@@ -167,44 +246,138 @@ def plot_variation_over_frequency(results, output_folder, frequencies, models, k
         scores.columns = models
         scores.index = frequencies
 
-        # Creates and configures plot
-        plt.figure()
-        scores.plot(kind='line', linestyle='-', style=markers[:len(models)])
-        plt.xlabel('Sampling rate [Hz]')
-        plt.ylabel(column.capitalize())
-        plt.legend()
-        plt.grid(axis='y')
-        axes = plt.gca()
-        if axes_ylim is not None:
-            axes.set_ylim(axes_ylim)
-
-        # Plot a line for the max average across models
-        peak_idx = scores.mean(axis=1).idxmax()
-        plt.axvline(peak_idx, color='grey', linewidth=2, linestyle='--')
-
-        # Saves and shows figure
+        # Location of the figure
         save_folder = output_folder + '/plots/'
         file_location = save_folder + 'freq_' + column + '.png'
-        plt.savefig(file_location)
-        plt.show()
+        charts.append((scores, column, axes_ylim, file_location))
+
+    render_charts(draw_variation_over_frequency, charts, headless, plot_jobs)
 
 
-def specificity_score(y_test, y_pred):
+def render_charts(draw, charts, headless=False, plot_jobs=1):
+    """
+    Draws, saves and closes many charts. In headless mode, the charts are never shown and can be rendered by a pool
+    of processes using the Agg backend.
+
+    :param draw: function drawing and saving one chart from its arguments and returning its figure
+    :param charts: list of the arguments of each chart
+    :param headless: render the charts without display instead of showing them
+    :param plot_jobs: number of processes rendering the charts (only in headless mode)
     """
-    Calculates the specificity scores based on the true and predicted labels.
 
-    :param y_test: true labels
-    :param y_pred: predicted labels
-    :return: specificity scores
+    if headless and plot_jobs > 1:
+        with ProcessPoolExecutor(max_workers=plot_jobs, initializer=plt.switch_backend, initargs=('Agg',)) as executor:
+            list(executor.map(render_chart, [draw] * len(charts), charts))
+        return
+
+    for chart in charts:
+        figure = draw(*chart)
+        if not headless:
+            plt.show()
+        plt.close(figure)
+
+
+def render_chart(draw, chart):
     """
+    Draws, saves and closes one chart (used by the processes of render_charts).
+
+    :param draw: function drawing and saving the chart from its arguments and returning its figure
+    :param chart: arguments of the chart
+    """
+
+    plt.close(draw(*chart))
+
+
+def draw_cnf_matrix(cnf_matrix, class_names, title, file_location):
+    """
+    Draws and saves the chart of a confusion matrix.
+
+    :param cnf_matrix: confusion matrix with the true labels as rows
+    :param class_names: list of class labels
+    :param title: title of the chart
+    :param file_location: path of the saved figure
+    :return: figure
+    """
+
+    figure, axes = plt.subplots()
+    ConfusionMatrixDisplay(cnf_matrix, display_labels=class_names).plot(cmap=plt.cm.Blues, ax=axes)
+    axes.set_title(title)
+    figure.savefig(file_location)
+
+    return figure
+
+
+def draw_baw(scores, models, axes_ylim, file_location):
+    """
+    Draws and saves a box and whisker chart of the scores of each model.
+
+    :param scores: dataframe of scores with one column per model
+    :param models: list of classifiers
+    :param axes_ylim: specific y-axis limits
+    :param file_location: path of the saved figure
+    :return: figure
+    """
+
+    figure, axes = plt.subplots()
+    axes.boxplot(scores, labels=models)
+    if axes_ylim is not None:
+        axes.set_ylim(axes_ylim)
+    figure.savefig(file_location)
+
+    return figure
+
+
+def draw_variation_over_frequency(scores, column, axes_ylim, file_location):
+    """
+    Draws and saves the variation of a metric over the frequencies for each model.
+
+    :param scores: dataframe of mean scores with one row per frequency and one column per model
+    :param column: name of the metric
+    :param axes_ylim: specific y-axis limits
+    :param file_location: path of the saved figure
+    :return: figure
+    """
+
+    markers = ['o', ',', 'd', 's', 'v']
+
+    # Creates and configures plot
+    figure, axes = plt.subplots()
+    scores.plot(kind='line', linestyle='-', style=markers[:scores.shape[1]], ax=axes)
+    axes.set_xlabel('Sampling rate [Hz]')
+    axes.set_ylabel(column.capitalize())
+    axes.legend()
+    axes.grid(axis='y')
+    if axes_ylim is not None:
+        axes.set_ylim(axes_ylim)
+
+    # Plot a line for the max average across models
+    peak_idx = scores.mean(axis=1).idxmax()
+    axes.axvline(peak_idx, color='grey', linewidth=2, linestyle='--')
+    figure.savefig(file_location)
+
+    return figure
+
+
+def scores_to_predictions(y_pred, score_type):
+    """
+    Converts the scores returned by a classifier into the scores used by the AUROC and the predicted labels. The
+    scores are either probabilities or values of the decision function (turned into pseudo-probabilities with a
+    softmax for multi-class problems).
+
+    :param y_pred: predicted scores
+    :param score_type: type of the scores (either proba or decision)
+    :return: scores for the AUROC and predicted labels
+    """
+
+    # Binary decision function (positive for the second class)
+    if y_pred.ndim == 1:
+        return y_pred, (y_pred > 0).astype(int)
+
+    if score_type == 'decision':
+        y_score = np.exp(y_pred - np.max(y_pred, axis=1, keepdims=True))
+        y_pred = y_score / np.sum(y_score, axis=1, keepdims=True)
 
-    mcm = multilabel_confusion_matrix(y_test, y_pred)
-    tn = mcm[:, 0, 0]
-    # tp = mcm[:, 1, 1]
-    # fn = mcm[:, 1, 0]
-    fp = mcm[:, 0, 1]
-    sp = tn / (tn + fp)
-    return sum(sp) / 4
+    return y_pred if y_pred.shape[1] > 2 else y_pred[:, 1], np.argmax(y_pred, axis=1)
 
 
 
@@ -3,6 +3,18 @@ import numpy as np
 import pandas as pd
 
 
+# Names of the features extracted for each channel
+TIME_FEATURES_NAMES = ['mean', 'var', 'std', 'median', 'max', 'min', 'ptp', 'centile25', 'centile75']
+FEATURES_NAMES = TIME_FEATURES_NAMES + ['psd', 'pse']
+
+# Frequency bands [Hz] whose power is extracted by the spectral engine
+SPECTRAL_BANDS = [(0, 1), (1, 3), (3, 8), (8, 20), (20, 100)]
+SPECTRAL_FEATURES_NAMES = ['energy', 'entropy', 'dominant'] + ['band_' + str(b[0]) + '_' + str(b[1]) for b in SPECTRAL_BANDS]
+
+# Maximum number of samples processed at once to bound the memory used by the spectra
+BATCH_SIZE = 256
+
+
 def extract_features(data, with_magnitude):
     """
     Extracts various features from the time and frequency domains from a given sample of activity. Also constructs
@@ -21,8 +33,7 @@ def extract_features(data, with_magnitude):
             data[name] = magnitude
 
     # Creates features vector name
-    names = ['mean', 'var', 'std', 'median', 'max', 'min', 'ptp', 'centile25', 'centile75', 'psd', 'pse']
-    columns = list('_'.join(n) for n in itertools.product(names, data.columns.tolist()))
+    columns = list('_'.join(n) for n in itertools.product(FEATURES_NAMES, data.columns.tolist()))
 
     # Time domain features
     features = np.mean(data, axis=0)
@@ -45,3 +56,458 @@ def extract_features(data, with_magnitude):
     # Creates a DataFrame
     features = pd.DataFrame([features], columns=columns)
     return features
+
+
+def extract_features_batch(data, columns, with_magnitude, spectral='fft', frequency=None, welch_segments=1):
+    """
+    Extracts the same features as extract_features from many samples of activity at once. The features of all
+    samples are computed with one set of reductions over the time axis. The frequency domain features are either the
+    ones of extract_features ('fft') or the ones of the spectral engine ('rfft', see extract_spectral_features).
+
+    :param data: array of shape (samples, time, channels) containing the data from the activities
+    :param columns: names of the channels
+    :param with_magnitude: calculate the magnitude of the sensors
+    :param spectral: frequency domain features (either fft or rfft)
+    :param frequency: sampling frequency of the data [Hz] (only used with rfft)
+    :param welch_segments: number of segments averaged by the Welch method (only used with rfft)
+    :return: DataFrame with one row of features per sample
+    """
+
+    # Calculates the acceleration and rotation magnitudes
+    if with_magnitude:
+        data, columns = add_magnitudes(data, columns)
+
+    # Creates features vector name
+    names = FEATURES_NAMES if spectral == 'fft' else TIME_FEATURES_NAMES + SPECTRAL_FEATURES_NAMES
+    names = list('_'.join(n) for n in itertools.product(names, columns))
+
+    # Extracts the features by batch of samples
+    features = []
+    for i in range(0, data.shape[0], BATCH_SIZE):
+        batch = data[i:i + BATCH_SIZE]
+        if spectral == 'fft':
+            features.append(compute_features(batch))
+        else:
+            spectral_features = extract_spectral_features(batch, frequency, welch_segments)
+            features.append(np.hstack([compute_time_features(batch), spectral_features]))
+    features = np.vstack(features) if len(features) > 0 else np.empty((0, len(names)))
+
+    return pd.DataFrame(features, columns=names)
+
+
+def extract_features_list(samples, columns, with_magnitude, **kwargs):
+    """
+    Extracts the features of samples of activity of various lengths. The samples of same length are stacked and their
+    features are extracted at once with extract_features_batch.
+
+    :param samples: list of arrays of shape (time, channels) containing the data from the activities
+    :param columns: names of the channels
+    :param with_magnitude: calculate the magnitude of the sensors
+    :param kwargs: options of extract_features_batch
+    :return: DataFrame with one row of features per sample (in the order of the samples)
+    """
+
+    # Groups the samples by length
+    lengths = np.array([len(s) for s in samples])
+    features = []
+    order = []
+    for length in np.unique(lengths):
+        indices = np.flatnonzero(lengths == length)
+        batch = np.stack([samples[i] for i in indices])
+        features.append(extract_features_batch(batch, columns, with_magnitude, **kwargs))
+        order.append(indices)
+
+    # Restores the order of the samples
+    features = pd.concat(features, ignore_index=True)
+    features.index = np.concatenate(order)
+    return features.sort_index()
+
+
+def extract_segments_features(data, segments, columns, with_magnitude, spectral='fft', frequency=None,
+                              welch_segments=1):
+    """
+    Extracts the features of extract_features_batch from segments of a batch of samples of activity (e.g. the phases
+    of the falls). The cumulative sums of the data, of their squares and of the spectra of extract_features are
+    computed once per sample so that the moments and the fft features of any segment come from two lookups. The
+    order statistics and the rfft features are computed for all segments of the same length at once.
+
+    :param data: array of shape (samples, time, channels) containing the data from the activities
+    :param segments: array of shape (segments, 3) of the sample, start and stop of each segment
+    :param columns: names of the channels
+    :param with_magnitude: calculate the magnitude of the sensors
+    :param spectral: frequency domain features (either fft or rfft)
+    :param frequency: sampling frequency of the data [Hz] (only used with rfft)
+    :param welch_segments: number of segments averaged by the Welch method (only used with rfft)
+    :return: DataFrame with one row of features per segment
+    """
+
+    # Calculates the acceleration and rotation magnitudes
+    if with_magnitude:
+        data, columns = add_magnitudes(data, columns)
+
+    # Creates features vector name
+    names = FEATURES_NAMES if spectral == 'fft' else TIME_FEATURES_NAMES + SPECTRAL_FEATURES_NAMES
+    names = list('_'.join(n) for n in itertools.product(names, columns))
+
+    # Extracts the features by batch of samples
+    features = np.empty((len(segments), len(names)))
+    for i in range(0, data.shape[0], BATCH_SIZE):
+        indices = np.flatnonzero((segments[:, 0] >= i) & (segments[:, 0] < i + BATCH_SIZE))
+        batch = segments[indices] - [i, 0, 0]
+        features[indices] = compute_segments_features(data[i:i + BATCH_SIZE], batch, spectral, frequency, welch_segments)
+
+    return pd.DataFrame(features, columns=names)
+
+
+def select_features(features, columns, with_magnitude, spectral='rfft'):
+    """
+    Selects the features of some channels from the features extracted for a superset of channels (e.g. all nine
+    axes and their magnitudes). The selected features are identical to the ones extracted from these channels only
+    if each feature only depends on its channel, i.e. with the rfft spectral features and magnitudes of whole sensors.
+
+    :param features: DataFrame of the features of the superset of channels
+    :param columns: names of the wanted channels
+    :param with_magnitude: select the magnitude of the sensors (three consecutive channels)
+    :param spectral: frequency domain features of the DataFrame (either fft or rfft)
+    :return: DataFrame of the features in the order of extract_features_batch
+    """
+
+    return features[features_names(columns, with_magnitude, spectral)]
+
+
+def features_names(columns, with_magnitude, spectral='fft'):
+    """
+    Creates the names of the features of extract_features_batch (without extracting them).
+
+    :param columns: names of the channels
+    :param with_magnitude: calculate the magnitude of the sensors (three consecutive channels)
+    :param spectral: frequency domain features (either fft or rfft)
+    :return: list of the names of the features
+    """
+
+    # Adds the names of the magnitude channels
+    columns = list(columns)
+    if with_magnitude:
+        columns += ['mag_' + columns[i][0:len(columns[i]) - 2] for i in range(0, len(columns), 3)]
+
+    names = FEATURES_NAMES if spectral == 'fft' else TIME_FEATURES_NAMES + SPECTRAL_FEATURES_NAMES
+    return list('_'.join(n) for n in itertools.product(names, columns))
+
+
+def extract_features_subset(data, columns, names, with_magnitude, spectral='fft', frequency=None):
+    """
+    Extracts only some features of extract_features_batch from many samples of activity (e.g. the features used by a
+    fitted model). Each group of statistics (moments, order statistics and frequency domain) is only computed for the
+    channels having a wanted feature in the group, and not at all if there is none. The fft features still need all
+    channels since their spectrum is computed over the channels.
+
+    :param data: array of shape (samples, time, channels) containing the data from the activities
+    :param columns: names of the channels
+    :param names: names of the wanted features (as the columns of extract_features_batch)
+    :param with_magnitude: calculate the magnitude of the sensors
+    :param spectral: frequency domain features (either fft or rfft)
+    :param frequency: sampling frequency of the data [Hz] (only used with rfft)
+    :return: array of shape (samples, len(names)) of the features in the order of the names
+    """
+
+    # Locates the statistic and the channel of each wanted feature
+    statistics = FEATURES_NAMES if spectral == 'fft' else TIME_FEATURES_NAMES + SPECTRAL_FEATURES_NAMES
+    channels = list(columns)
+    if with_magnitude:
+        channels += ['mag_' + columns[i][0:len(columns[i]) - 2] for i in range(0, len(columns), 3)]
+    positions = {s + '_' + c: (i, j) for i, s in enumerate(statistics) for j, c in enumerate(channels)}
+    wanted = np.array([positions[n] for n in names], dtype=int).reshape(-1, 2)
+
+    # Calculates the acceleration and rotation magnitudes (only if a wanted feature depends on them, the fft features
+    # depend on all channels)
+    if with_magnitude and (np.any(wanted[:, 1] >= len(columns)) or (spectral == 'fft' and np.any(wanted[:, 0] >= 9))):
+        data, _ = add_magnitudes(data, columns)
+
+    # Computes each group of statistics for the channels having a wanted feature
+    values = np.zeros((data.shape[0], len(statistics), len(channels)))
+    for start, stop in [(0, 3), (3, 9), (9, len(statistics))]:
+        indices = np.unique(wanted[(wanted[:, 0] >= start) & (wanted[:, 0] < stop), 1])
+        if len(indices) == 0:
+            continue
+
+        if start == 0:
+            group = np.stack(moment_statistics(data[:, :, indices]), axis=1)
+        elif start == 3:
+            minimum, centile25, median, centile75, maximum, ptp = order_statistics(data[:, :, indices])
+            group = np.stack([median, maximum, minimum, ptp, centile25, centile75], axis=1)
+        elif spectral == 'fft':
+            psd = np.abs(np.fft.fft(data, axis=2)) ** 2 / data.shape[1]
+            pse = psd * np.log(np.where(psd > 0, psd, 1))
+            group = np.stack([np.sum(psd, axis=1), -np.sum(pse, axis=1)], axis=1)[:, :, indices]
+        else:
+            group = extract_spectral_features(data[:, :, indices], frequency).reshape(data.shape[0], stop - start, -1)
+        values[:, start:stop, indices] = group
+
+    return values[:, wanted[:, 0], wanted[:, 1]]
+
+
+def compute_segments_features(data, segments, spectral, frequency, welch_segments):
+    """
+    Computes the features of extract_segments_features for segments of a batch of samples.
+
+    :param data: array of shape (samples, time, channels)
+    :param segments: array of shape (segments, 3) of the sample, start and stop of each segment
+    :param spectral: frequency domain features (either fft or rfft)
+    :param frequency: sampling frequency of the data [Hz] (only used with rfft)
+    :param welch_segments: number of segments averaged by the Welch method (only used with rfft)
+    :return: array of shape (segments, features)
+    """
+
+    samples, starts, stops = segments[:, 0], segments[:, 1], segments[:, 2]
+    lengths = (stops - starts)[:, np.newaxis]
+
+    # Moments from the cumulative sums of the data shifted by the first value of each sample (the variance of single
+    # values is set to zero instead of the rounding error of the sums)
+    shift = data[:, 0, :]
+    shifted = data - shift[:, np.newaxis, :]
+    s1 = segment_sums(cumulative_sum(shifted), samples, starts, stops)
+    s2 = segment_sums(cumulative_sum(shifted * shifted), samples, starts, stops)
+    mean = shift[samples] + s1 / lengths
+    var = np.maximum(s2 - s1 * s1 / lengths, 0) / lengths
+    var[lengths[:, 0] == 1] = 0
+
+    # Order statistics (and rfft features) of the segments grouped by length
+    statistics = np.empty((len(segments), 6, data.shape[2]))
+    spectral_features = None
+    for length in np.unique(lengths):
+        indices = np.flatnonzero(lengths[:, 0] == length)
+        windows = data[samples[indices, np.newaxis], starts[indices, np.newaxis] + np.arange(length)]
+        statistics[indices] = np.stack(order_statistics(windows), axis=1)
+        if spectral != 'fft':
+            features = extract_spectral_features(windows, frequency, welch_segments)
+            if spectral_features is None:
+                spectral_features = np.empty((len(segments), features.shape[1]))
+            spectral_features[indices] = features
+
+    # Spectra over the channels of each time step as in extract_features (empty bins do not contribute)
+    if spectral == 'fft':
+        power = np.abs(np.fft.fft(data, axis=2)) ** 2
+        entropy = power * np.log(np.where(power > 0, power, 1))
+        power = segment_sums(cumulative_sum(power), samples, starts, stops)
+        entropy = segment_sums(cumulative_sum(entropy), samples, starts, stops)
+
+        # Normalises by the length of the segments (psd * log(psd) with psd = power / length)
+        psd = power / lengths
+        pse = (entropy - np.log(lengths) * power) / lengths
+        spectral_features = np.hstack([psd, -pse])
+
+    minimum, centile25, median, centile75, maximum, ptp = np.moveaxis(statistics, 1, 0)
+    return np.hstack([mean, var, np.sqrt(var), median, maximum, minimum, ptp, centile25, centile75, spectral_features])
+
+
+def cumulative_sum(data):
+    """
+    Computes the cumulative sums along the time axis starting with zero.
+
+    :param data: array of shape (samples, time, channels)
+    :return: array of shape (samples, time + 1, channels)
+    """
+
+    sums = np.zeros((data.shape[0], data.shape[1] + 1, data.shape[2]))
+    np.cumsum(data, axis=1, out=sums[:, 1:, :])
+    return sums
+
+
+def segment_sums(sums, samples, starts, stops):
+    """
+    Computes the sums of segments from cumulative sums.
+
+    :param sums: array of shape (samples, time + 1, channels) as returned by cumulative_sum
+    :param samples: sample of each segment
+    :param starts: start of each segment
+    :param stops: stop of each segment
+    :return: array of shape (segments, channels)
+    """
+
+    return sums[samples, stops] - sums[samples, starts]
+
+
+def add_magnitudes(data, columns):
+    """
+    Adds the magnitude of each sensor (group of three consecutive channels) to the channels of the samples.
+
+    :param data: array of shape (samples, time, channels)
+    :param columns: names of the channels
+    :return: array with the magnitude channels and the names of all channels
+    """
+
+    magnitudes = []
+    names = list(columns)
+    for i in range(0, data.shape[2], 3):
+        magnitudes.append(np.linalg.norm(data[:, :, i:i + 3], axis=2))
+        names.append('mag_' + columns[i][0:len(columns[i]) - 2])
+
+    return np.concatenate([data, np.stack(magnitudes, axis=2)], axis=2), names
+
+
+def compute_features(data):
+    """
+    Computes the features of extract_features for a batch of samples.
+
+    :param data: array of shape (samples, time, channels)
+    :return: array of shape (samples, features) ordered as FEATURES_NAMES then channels
+    """
+
+    # Time domain features
+    features = [compute_time_features(data)]
+
+    # Frequency domain features (spectrum over the channels of each time step as in extract_features, empty bins do not
+    # contribute as in compute_segments_features)
+    psd = np.abs(np.fft.fft(data, axis=2)) ** 2
+    psd = psd / data.shape[1]
+    pse = psd * np.log(np.where(psd > 0, psd, 1))
+    features.append(np.sum(psd, axis=1))
+    features.append(-np.sum(pse, axis=1))
+
+    return np.hstack(features)
+
+
+def compute_time_features(data):
+    """
+    Computes the time domain features of extract_features for a batch of samples. The moments come from one pass over
+    the data and the order statistics from one partition of each channel.
+
+    :param data: array of shape (samples, time, channels)
+    :return: array of shape (samples, features) ordered as TIME_FEATURES_NAMES then channels
+    """
+
+    mean, var, std = moment_statistics(data)
+    minimum, centile25, median, centile75, maximum, ptp = order_statistics(data)
+
+    return np.hstack([mean, var, std, median, maximum, minimum, ptp, centile25, centile75])
+
+
+def moment_statistics(data):
+    """
+    Computes the mean, variance and standard deviation of each channel in one pass. The sums are shifted by the first
+    value of each channel to avoid the cancellation of the naive one-pass variance.
+
+    :param data: array of shape (samples, time, channels)
+    :return: arrays of shape (samples, channels) of the mean, variance and standard deviation
+    """
+
+    length = data.shape[1]
+    shift = data[:, 0, :]
+    shifted = data - shift[:, np.newaxis, :]
+
+    # Sums and sums of squares of the shifted data
+    s1 = np.sum(shifted, axis=1)
+    s2 = np.einsum('ijk,ijk->ik', shifted, shifted)
+
+    mean = shift + s1 / length
+    var = np.maximum(s2 - s1 * s1 / length, 0) / length
+
+    return mean, var, np.sqrt(var)
+
+
+def order_statistics(data):
+    """
+    Computes the minimum, 25th percentile, median, 75th percentile, maximum and range of each channel with a single
+    partition of the time axis. The percentiles are linearly interpolated as in np.percentile.
+
+    :param data: array of shape (samples, time, channels)
+    :return: arrays of shape (samples, channels) of the minimum, 25th percentile, median, 75th percentile, maximum and
+    range
+    """
+
+    last = data.shape[1] - 1
+
+    # Positions of the percentiles in the sorted data
+    positions = [q * last for q in (0.25, 0.5, 0.75)]
+    kth = {0, last}
+    for p in positions:
+        kth.update((int(p), min(int(p) + 1, last)))
+
+    # Partitions the data once so that all wanted positions hold their sorted value
+    partitioned = np.partition(data, sorted(kth), axis=1)
+
+    # Interpolates the percentiles
+    centiles = []
+    for p in positions:
+        low = partitioned[:, int(p), :]
+        high = partitioned[:, min(int(p) + 1, last), :]
+        centiles.append(low + (high - low) * (p - int(p)))
+
+    minimum = partitioned[:, 0, :]
+    maximum = partitioned[:, last, :]
+
+    return minimum, centiles[0], centiles[1], centiles[2], maximum, maximum - minimum
+
+
+def extract_spectral_features(data, frequency, welch_segments=1):
+    """
+    Extracts the frequency domain features of a batch of samples from one real FFT along the time axis of each channel.
+    The same power spectrum gives the energy, the spectral entropy, the dominant frequency (ignoring the DC
+    component) and the power in each of the SPECTRAL_BANDS. With more than one Welch segment, the spectrum is the
+    average of the spectra of Hann-windowed segments overlapping by half.
+
+    :param data: array of shape (samples, time, channels)
+    :param frequency: sampling frequency of the data [Hz]
+    :param welch_segments: number of segments averaged by the Welch method
+    :return: array of shape (samples, features) ordered as SPECTRAL_FEATURES_NAMES then channels
+    """
+
+    psd, frequencies = power_spectrum(data, frequency, welch_segments)
+    return compute_spectral_features(psd, frequencies)
+
+
+def compute_spectral_features(psd, frequencies):
+    """
+    Computes the frequency domain features of extract_spectral_features from the power spectrum of a batch of samples.
+
+    :param psd: array of shape (samples, bins, channels) of the one-sided power spectrum (see power_spectrum)
+    :param frequencies: frequencies of the bins
+    :return: array of shape (samples, features) ordered as SPECTRAL_FEATURES_NAMES then channels
+    """
+
+    # Energy and spectral entropy of the normalised spectrum (empty bins do not contribute)
+    energy = np.sum(psd, axis=1)
+    p = psd / np.where(energy > 0, energy, 1)[:, np.newaxis, :]
+    entropy = -np.sum(p * np.log(np.where(p > 0, p, 1)), axis=1)
+
+    # Dominant frequency
+    dominant = frequencies[np.argmax(psd[:, 1:, :], axis=1) + 1] if psd.shape[1] > 1 else np.zeros_like(energy)
+
+    # Power of each band
+    features = [energy, entropy, dominant]
+    for low, high in SPECTRAL_BANDS:
+        band = (frequencies >= low) & (frequencies < high)
+        features.append(np.sum(psd[:, band, :], axis=1))
+
+    return np.hstack(features)
+
+
+def power_spectrum(data, frequency, welch_segments=1):
+    """
+    Computes the one-sided power spectrum of each channel of a batch of samples. The spectrum is normalised so that
+    its sum is the energy of the signal (Parseval's theorem), which is only approximated with the Welch method.
+
+    :param data: array of shape (samples, time, channels)
+    :param frequency: sampling frequency of the data [Hz]
+    :param welch_segments: number of segments averaged by the Welch method
+    :return: array of shape (samples, bins, channels) and frequencies of the bins
+    """
+
+    length = data.shape[1]
+
+    if welch_segments <= 1 or length < 2 * (welch_segments + 1):
+        # Periodogram of the whole sample
+        psd = np.abs(np.fft.rfft(data, axis=1)) ** 2 / length
+    else:
+        # Averages the periodograms of overlapping Hann-windowed segments
+        length = 2 * data.shape[1] // (welch_segments + 1)
+        window = np.hanning(length)
+        starts = np.arange(welch_segments) * (length // 2)
+        segments = data[:, starts[:, np.newaxis] + np.arange(length), :] * window[:, np.newaxis]
+        psd = np.abs(np.fft.rfft(segments, axis=2)) ** 2 / np.sum(window ** 2)
+        psd = np.mean(psd, axis=1) * (data.shape[1] / length)
+
+    # Folds the negative frequencies on the positive ones (except DC and Nyquist)
+    psd[:, 1:(length + 1) // 2, :] *= 2
+
+    return psd, np.fft.rfftfreq(length, 1 / frequency)
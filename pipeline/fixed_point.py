@@ -0,0 +1,219 @@
+import numpy as np
+
+from pipeline.acquisition import ADC_SCALES
+from pipeline.acquisition import ADC_FACTORS
+from pipeline.feature_extraction import TIME_FEATURES_NAMES
+from pipeline.compiled import CompiledModel
+
+
+# Number of fractional bits of the fixed-point samples (the sums of squares of a 10s window at 200Hz of the gyroscope
+# magnitude overflow 64 bits above 4)
+FRACTION_BITS = 4
+
+# Number of fractional bits of the fixed-point values of the leaves of the quantized trees
+VALUE_BITS = 15
+
+# Categories of the operations counted on a sensor
+OPERATIONS = ['additions', 'multiplications', 'divisions', 'shifts', 'comparisons', 'square roots']
+
+
+def integer_sqrt(values):
+    """
+    Computes the integer square root (floor of the square root) of non-negative integers. The rounded floating point
+    square root is corrected by one when the conversion of large integers makes it miss (the corrections compare the
+    roots with quotients since their squares overflow near the largest int64).
+
+    :param values: array of non-negative int64
+    :return: array of int64 of the same shape
+    """
+
+    roots = np.floor(np.sqrt(values.astype(np.float64))).astype(np.int64)
+    roots -= roots > values // np.maximum(roots, 1)
+    roots += roots + 1 <= values // (roots + 1)
+
+    return roots
+
+
+def extract_fixed_point_features(counts, sensors_axes, with_magnitude, fraction_bits=FRACTION_BITS):
+    """
+    Extracts the time domain features of extract_features from the raw analog counts of many samples of activity with
+    integer arithmetic only, as a sensor without floating point unit would. The counts are converted to fixed-point
+    numbers with fraction_bits fractional bits (shifted left) and never scaled: one unit of each feature is given by
+    fixed_point_units. The mean is rounded, the variance is floored, the standard deviation and the magnitudes are
+    integer square roots and the order statistics are exact for the axes (the percentiles are interpolated between
+    two sorted values at quarters, hence exactly with at least two fractional bits).
+
+    :param counts: array of shape (samples, time, len(sensors_axes)) of the raw counts
+    :param sensors_axes: sensors' axes of the counts (whole sensors when with magnitude)
+    :param with_magnitude: calculate the magnitude of the sensors (three consecutive channels)
+    :param fraction_bits: number of fractional bits of the samples
+    :return: array of int64 of shape (samples, features) ordered as TIME_FEATURES_NAMES then channels
+    """
+
+    # Converts the counts to fixed-point numbers and adds the magnitudes of the sensors
+    x = counts.astype(np.int64) << fraction_bits
+    if with_magnitude:
+        squares = np.square(counts.astype(np.int64))
+        magnitudes = [np.sum(squares[:, :, i:i + 3], axis=2) << (2 * fraction_bits) for i in range(0, len(sensors_axes), 3)]
+        x = np.concatenate([x, integer_sqrt(np.stack(magnitudes, axis=2))], axis=2)
+    length = x.shape[1]
+
+    # Moments from the sums and sums of squares (the variance has twice the fractional bits of the samples)
+    s1 = np.sum(x, axis=1)
+    s2 = np.einsum('ijk,ijk->ik', x, x)
+    mean = (2 * s1 + length) // (2 * length)
+    var = (length * s2 - s1 * s1) // (length * length)
+    std = integer_sqrt(var)
+
+    # Order statistics from the sorted samples (the positions of the percentiles are counted in quarters)
+    ordered = np.sort(x, axis=1)
+    last = length - 1
+    centiles = []
+    for quarter in (1, 2, 3):
+        position = quarter * last
+        low = ordered[:, position // 4, :]
+        high = ordered[:, min(position // 4 + 1, last), :]
+        centiles.append(low + (((high - low) * (position % 4)) >> 2))
+    minimum = ordered[:, 0, :]
+    maximum = ordered[:, last, :]
+
+    return np.hstack([mean, var, std, centiles[1], maximum, minimum, maximum - minimum, centiles[0], centiles[2]])
+
+
+def fixed_point_units(sensors_axes, with_magnitude, fraction_bits=FRACTION_BITS):
+    """
+    Computes the value of one unit of each feature of extract_fixed_point_features in the units of extract_features
+    (gravity or radians per second, squared for the variance).
+
+    :param sensors_axes: sensors' axes of the counts
+    :param with_magnitude: calculate the magnitude of the sensors
+    :param fraction_bits: number of fractional bits of the samples
+    :return: array of shape (features,) ordered as TIME_FEATURES_NAMES then channels
+    """
+
+    scales = list(ADC_SCALES[sensors_axes] * ADC_FACTORS[sensors_axes])
+    if with_magnitude:
+        scales += [scales[i] for i in range(0, len(sensors_axes), 3)]
+    scales = np.array(scales) / 2 ** fraction_bits
+
+    return np.concatenate([scales, scales ** 2] + [scales] * (len(TIME_FEATURES_NAMES) - 2))
+
+
+def count_operations(names, columns, length, comparisons=0.0, trees=0):
+    """
+    Counts the integer operations of one window on a sensor computing only the features used by a model (as
+    extract_fixed_point_features does for all of them) and evaluating its quantized trees. Sorting a channel is
+    counted as a merge sort (length * ceil(log2(length)) comparisons) and a square root as one operation.
+
+    :param names: names of the used features (as the columns of extract_features_batch)
+    :param columns: names of the channels of the sensors
+    :param length: number of samples of the window
+    :param comparisons: average number of nodes compared in all trees per window (see QuantizedModel.comparisons)
+    :param trees: number of trees whose leaves are summed
+    :return: dictionary of the number of operations of each category of OPERATIONS
+    """
+
+    # Channels of the moments and of the order statistics (the magnitudes need the three axes of their sensor)
+    magnitudes = ['mag_' + columns[i][0:len(columns[i]) - 2] for i in range(0, len(columns), 3)]
+    moments, orders = set(), set()
+    for name in names:
+        statistic = next(s for s in TIME_FEATURES_NAMES if name.startswith(s + '_'))
+        (moments if statistic in TIME_FEATURES_NAMES[0:3] else orders).add(name[len(statistic) + 1:])
+    used_magnitudes = [m for m in magnitudes if m in moments | orders]
+    axes = {c for c in columns if c in moments | orders}
+    axes.update(columns[3 * magnitudes.index(m) + i] for m in used_magnitudes for i in range(3))
+
+    counts = dict.fromkeys(OPERATIONS, 0.0)
+
+    # Conversion of the axes and magnitudes (three squares, two additions, one shift and a square root per sample)
+    counts['shifts'] += length * (len(axes) + len(used_magnitudes))
+    counts['multiplications'] += 3 * length * len(used_magnitudes)
+    counts['additions'] += 2 * length * len(used_magnitudes)
+    counts['square roots'] += length * len(used_magnitudes)
+
+    # Moments (sums and sums of squares, then the rounded mean, the variance and its square root)
+    counts['additions'] += len(moments) * (2 * length + 2)
+    counts['multiplications'] += len(moments) * (length + 4)
+    counts['divisions'] += 2 * len(moments)
+    counts['square roots'] += len(moments)
+
+    # Order statistics (sort, then the interpolation of three percentiles and the range)
+    counts['comparisons'] += len(orders) * length * int(np.ceil(np.log2(max(length, 2))))
+    counts['additions'] += 7 * len(orders)
+    counts['multiplications'] += 3 * len(orders)
+    counts['shifts'] += 3 * len(orders)
+
+    # Trees (one comparison per node visited and one addition per leaf)
+    counts['comparisons'] += comparisons
+    counts['additions'] += trees
+
+    return counts
+
+
+class QuantizedModel(CompiledModel):
+    """
+    Compiled model evaluated with integer arithmetic only on the fixed-point features of extract_fixed_point_features.
+    The scaler is folded into the thresholds: a node comparing the scaled feature with t compares the fixed-point
+    feature with floor((t - minimum) / scale / unit). The values of the leaves (multiplied by the weight of the trees)
+    and the initial raw prediction are fixed-point numbers with value_bits fractional bits, so that the leaves are
+    summed as integers and only the link of gradient boosting remains in floating point.
+    """
+
+    def __init__(self, arrays, units, value_bits=VALUE_BITS):
+        """
+        :param arrays: dictionary of the arrays returned by compile_model
+        :param units: value of one unit of each feature of the model (see fixed_point_units)
+        :param value_bits: number of fractional bits of the values of the leaves
+        """
+
+        super().__init__(arrays)
+        self.value_bits = value_bits
+        self.internal = np.isfinite(self.threshold)
+
+        # Moves the thresholds to the fixed-point units of their feature (the leaves compare anything)
+        units = np.asarray(units)[self.inputs]
+        thresholds = (self.threshold - self.minimum[self.feature]) / self.scale[self.feature] / units[self.feature]
+        self.threshold = np.where(self.internal, np.floor(np.where(self.internal, thresholds, 0)), 0).astype(np.int64)
+
+        # Quantizes the weighted values of the leaves and the initial raw prediction
+        self.value = np.round(self.value * self.weight * 2 ** value_bits).astype(np.int64)
+        self.init = np.round(self.init * 2 ** value_bits).astype(np.int64)
+
+    def predict_proba(self, features):
+        """
+        Predicts the probabilities of the classes from all the fixed-point features of the model.
+
+        :param features: array of int64 of shape (rows, features) of extract_fixed_point_features
+        :return: array of shape (rows, classes)
+        """
+
+        return self.evaluate(features[:, self.inputs])
+
+    def evaluate(self, x):
+        """
+        Predicts the probabilities of the classes from the fixed-point features used by the trees.
+
+        :param x: array of int64 of shape (rows, len(names)) of the used features
+        :return: array of shape (rows, classes)
+        """
+
+        raw = self.init + np.sum(self.value[self.descend(x)], axis=1)
+        return self.probabilities(raw / 2 ** self.value_bits)
+
+    def comparisons(self, x):
+        """
+        Counts the nodes compared by each row in all trees (the internal nodes on its paths).
+
+        :param x: array of int64 of shape (rows, len(names)) of the used features
+        :return: array of shape (rows,) of the number of comparisons
+        """
+
+        values = x.ravel()
+        offsets = (np.arange(len(x)) * x.shape[1])[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(x), len(self.roots)))
+        compared = np.zeros(len(x), dtype=int)
+        for _ in range(self.depth):
+            compared += np.sum(self.internal[nodes], axis=1)
+            nodes = self.children[2 * nodes + (values[offsets + self.feature[nodes]] <= self.threshold[nodes])]
+
+        return compared
@@ -1,5 +1,11 @@
 import numpy as np
 
+from scipy import signal
+
+
+# Sampling frequency of the SisFall sensors [Hz]
+SENSOR_FREQUENCY = 200
+
 
 def change_activity_duration(data, duration):
     """
@@ -26,6 +32,29 @@ def change_activity_duration(data, duration):
     return data
 
 
+def trim_activities(samples, duration):
+    """
+    Cuts a batch of activity samples to match the wanted duration as change_activity_duration does. The bounds of all
+    samples are computed at once and the returned samples are views of the given ones (no copy). The samples shorter
+    than the duration are kept whole.
+
+    :param samples: list of arrays of shape (time, channels) sampled at the frequency of the sensor
+    :param duration: the duration of the activity
+    :return: list of the samples shortened to match the given duration
+    """
+
+    # Calculates the number of samples to remove at the start and end of each sample
+    total_samples = int(duration * SENSOR_FREQUENCY / 1000)
+    lengths = np.array([len(s) for s in samples])
+    no_samples_to_remove = lengths - total_samples
+
+    # Removes the extra sample at the end when the number of samples to remove is odd
+    starts = np.clip(no_samples_to_remove // 2, 0, None)
+    stops = np.clip(lengths - (no_samples_to_remove - no_samples_to_remove // 2), None, lengths)
+
+    return [s[start:stop] for s, start, stop in zip(samples, starts, stops)]
+
+
 def change_activity_sampling(data, frequency):
     """
     Changes the frequency of the activity sample which allows to simulate sensor with a lower or higher sampling
@@ -43,6 +72,47 @@ def change_activity_sampling(data, frequency):
     return data
 
 
+def resample_activities(data, frequencies, method='decimate'):
+    """
+    Changes the frequency of a batch of activity samples recorded at the frequency of the sensor to each of the given
+    frequencies (which must divide it). Each frequency is derived from the lowest frequency already computed that is
+    a multiple of it (200Hz -> 100Hz -> 50Hz -> ...) instead of starting again from the frequency of the sensor.
+
+    :param data: array of shape (samples, time, channels) containing the data at the frequency of the sensor
+    :param frequencies: list of frequencies in which to change the sampling
+    :param method: either decimate (keeps one sample out of k as change_activity_sampling) or polyphase (applies an
+    anti-aliasing filter before decimating)
+    :return: dictionary of the arrays resampled to each frequency
+    """
+
+    resampled = {SENSOR_FREQUENCY: data}
+
+    # Resamples from the highest to the lowest frequency
+    for frequency in sorted(set(frequencies), reverse=True):
+        if frequency not in resampled:
+            source = min(f for f in resampled if f % frequency == 0)
+            resampled[frequency] = decimate_activities(resampled[source], source // frequency, method)
+
+    return {f: resampled[f] for f in frequencies}
+
+
+def decimate_activities(data, factor, method='decimate'):
+    """
+    Reduces the frequency of a batch of activity samples by an integer factor.
+
+    :param data: array of shape (samples, time, channels)
+    :param factor: ratio between the current and the wanted frequency
+    :param method: either decimate (keeps one sample out of k) or polyphase (applies an anti-aliasing filter)
+    :return: array of shape (samples, ceil(time / factor), channels)
+    """
+
+    if factor == 1:
+        return data
+    if method == 'polyphase':
+        return signal.resample_poly(data, 1, factor, axis=1)
+    return data[:, ::factor, :]
+
+
 def divide_fall(data, is_fall, pre_time, post_time):
     """
     Divides falls into its three defined phases which are pre-fall, fall and post-fall. The ADL samples are
@@ -83,3 +153,45 @@ def divide_fall(data, is_fall, pre_time, post_time):
     else:
         adl = data
         return adl, None, None
+
+
+def divide_falls(data, is_fall, pre_time, post_time):
+    """
+    Divides a batch of falls into their three phases as divide_fall does. The impact peaks of all samples are found
+    with one vectorized call and the phases are returned as bounds instead of slices of the samples.
+
+    :param data: array of shape (samples, time, channels)
+    :param is_fall: array of booleans telling if each sample is a fall or an ADL
+    :param pre_time: time before the impact point
+    :param post_time: time after the impact point
+    :return: array of shape (segments, 3) of the sample, start and stop of each segment and list of their labels
+    (the ADL or fall, then the pre-fall and post-fall of the falls)
+    """
+
+    length = data.shape[1]
+    indices = np.arange(data.shape[0])
+
+    # Determines the peak value of the magnitude
+    peaks = np.argmax(np.sqrt(np.sum(np.square(data), axis=2)), axis=1)
+
+    # Determines where to split the fall samples
+    size_l = int(length * (pre_time / 1000))
+    size_h = int(length * (post_time / 1000))
+    low = np.clip(peaks - size_l, 0, None)
+    high = np.where(peaks + size_h < length, peaks + size_h, length)
+
+    # Ensures to have at least one sample per phase
+    low[low == 0] = 1
+    high[high == length] = length - 1
+
+    # Creates the segments of all samples (the ADL are not divided)
+    main = np.stack([indices, np.where(is_fall, low, 0), np.where(is_fall, high, length)], axis=1)
+    pre_fall = np.stack([indices, np.zeros_like(low), low], axis=1)
+    post_fall = np.stack([indices, high, np.full_like(high, length)], axis=1)
+    segments = np.stack([main, pre_fall, post_fall], axis=1)
+
+    # Keeps the pre-fall and post-fall phases of the falls only
+    labels = np.stack([np.asarray(is_fall, dtype=int), np.full(len(indices), 2), np.full(len(indices), 3)], axis=1)
+    keep = np.stack([np.ones(len(indices), dtype=bool), is_fall, is_fall], axis=1)
+
+    return segments[keep], list(labels[keep])
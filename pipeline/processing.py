@@ -1,7 +1,12 @@
+import os
+import tempfile
+import joblib
 import pandas as pd
 import numpy as np
 
-from datetime import datetime
+from time import process_time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
 
 from sklearn import neighbors
 from sklearn import svm
@@ -13,9 +18,14 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.ensemble import GradientBoostingClassifier
 
 from sklearn.model_selection import StratifiedKFold
+from sklearn.calibration import CalibratedClassifierCV
 
+from utils.utils import save_checkpoint
+from utils.utils import load_checkpoint
 
-def fit_and_test_classifiers(x, y, classifiers_names, k_fold):
+
+def fit_and_test_classifiers(x, y, classifiers_names, k_fold, n_jobs=1, probability=True, lightweight=False,
+                             model_folder=None, checkpoint_folder=None, on_split=None):
     """"
     Fits and tests the wanted classifiers with the previously preprocessed data.
 
@@ -23,69 +33,240 @@ def fit_and_test_classifiers(x, y, classifiers_names, k_fold):
     :param y: corresponding labels
     :param classifiers_names: wanted classifiers
     :param k_fold: number of folds in the k-fold cross-validation
+    :param n_jobs: number of processes fitting and testing the classifiers
+    :param probability: fit the classifiers lacking cheap probabilities (SVM) with an internal calibration, otherwise
+    they are scored with their decision function
+    :param lightweight: keep only the test indices, labels, predictions and timings of each split instead of the fitted
+    classifier and the test data
+    :param model_folder: path to the folder where the fitted classifiers and the scaler of the data are saved (not saved
+    if None), along with the classifiers lacking probabilities calibrated once on the whole data when probability is
+    False
+    :param checkpoint_folder: path to the folder where the output of each split is saved as soon as it is done (the
+    splits already saved are loaded instead of being fitted again, no checkpoint if None)
+    :param on_split: function called with the result of each split (dictionary) as soon as it is done, and with the
+    results of the checkpointed splits first (not called if None)
     :return: results of each split
     """
 
-    # Normalizes data
-    x = preprocessing.MinMaxScaler().fit_transform(x)
+    # Normalizes data (the scaler is saved with the fitted classifiers)
+    scaler = preprocessing.MinMaxScaler().fit(x)
+    x = scaler.transform(x)
     y = np.array(y)
+    if model_folder is not None:
+        joblib.dump(scaler, model_folder + '/scaler.joblib')
 
     # Creates classifier and k-fold
-    classifiers, full_names = create_classifiers(classifiers_names)
+    classifiers, full_names = create_classifiers(classifiers_names, probability)
+
+    # Calibrates the probabilities of the classifiers scored with their decision function once outside of the k-fold
+    # (the saved calibrated classifiers are deployed with main_stream and main_server)
+    if model_folder is not None:
+        for name, classifier in zip(classifiers_names, classifiers):
+            if not hasattr(classifier, 'predict_proba'):
+                joblib.dump(calibrate_classifier(classifier, x, y, k_fold), model_folder + '/' + name + '_calibrated.joblib')
     kf = StratifiedKFold(n_splits=k_fold, random_state=None, shuffle=False)
-    results = []
-
-    # Fits and tests each classifier
-    for i, classifier in enumerate(classifiers):
-        for k, (train_index, test_index) in enumerate(kf.split(x, y)):
-            x_train, x_test = x[train_index], x[test_index]
-            y_train, y_test = y[train_index], y[test_index]
-
-            # Fits and times the fitting process
-            clf = clone(classifier)
-            start_fit = datetime.now()
-            clf.fit(x_train, y_train)
-            stop_fit = datetime.now()
-            fit_time = stop_fit.timestamp() - start_fit.timestamp()
-
-            # Tests and times the testing process
-            start_test = datetime.now()
-            y_pred = clf.predict_proba(x_test)
-            stop_test = datetime.now()
-            test_time = (stop_test.timestamp() - start_test.timestamp())
-
-            # Merges results
-            result = {'ksplit': k + 1, 'name': full_names[i], 'abbreviation': classifiers_names[i], 'classifier': clf, 'x_test': x_test, 'y_test': y_test, 'y_pred': y_pred, 'fit_time': fit_time, 'test_time': test_time}
-            results.append(result)
+    splits = list(kf.split(x, y))
+
+    # Lists the splits of each classifier
+    tasks = [(i, k) for i in range(len(classifiers)) for k in range(len(splits))]
+    tasks_classifiers = [classifiers[i] for i, _ in tasks]
+    tasks_train = [splits[k][0] for _, k in tasks]
+    tasks_test = [splits[k][1] for _, k in tasks]
+    tasks_keep = [not lightweight] * len(tasks)
+    tasks_files = [None] * len(tasks)
+    if model_folder is not None:
+        tasks_files = [model_folder + '/' + classifiers_names[i] + '_split_' + str(k + 1) + '.joblib' for i, k in tasks]
+
+    tasks_checkpoints = [None] * len(tasks)
+    if checkpoint_folder is not None:
+        tasks_checkpoints = [checkpoint_folder + '/' + classifiers_names[i] + '_split_' + str(k + 1) + '.joblib' for i, k in tasks]
+
+    def create_result(t):
+        (i, k), (clf, y_pred, score_type, fit_time, test_time) = tasks[t], outputs[t]
+        test_index = splits[k][1]
+        if lightweight:
+            result = {'ksplit': k + 1, 'name': full_names[i], 'abbreviation': classifiers_names[i], 'test_index': test_index, 'y_test': y[test_index], 'y_pred': y_pred, 'fit_time': fit_time, 'test_time': test_time, 'score_type': score_type}
+        else:
+            result = {'ksplit': k + 1, 'name': full_names[i], 'abbreviation': classifiers_names[i], 'classifier': clf, 'x_test': x[test_index], 'y_test': y[test_index], 'y_pred': y_pred, 'fit_time': fit_time, 'test_time': test_time, 'score_type': score_type}
+        if tasks_files[t] is not None:
+            result['model_file'] = tasks_files[t]
+        return result
+
+    # Reuses the splits checkpointed by a previous run
+    outputs = [load_split_checkpoint(x, y, tasks_classifiers[t], tasks_train[t], tasks_keep[t], tasks_files[t], tasks_checkpoints[t]) for t in range(len(tasks))]
+    todo = [t for t in range(len(tasks)) if outputs[t] is None]
+    todo_arguments = [[arguments[t] for t in todo] for arguments in [tasks_classifiers, tasks_train, tasks_test, tasks_keep, tasks_files, tasks_checkpoints]]
+    if on_split is not None:
+        for t in range(len(tasks)):
+            if outputs[t] is not None:
+                on_split(create_result(t))
+
+    # Fits and tests each classifier on each remaining split (reported in the order they are done)
+    if n_jobs > 1 and len(todo) > 0:
+        with tempfile.TemporaryDirectory() as folder:
+
+            # Shares the data with the processes through memory-mapped files
+            x_path, y_path = folder + '/x.npy', folder + '/y.npy'
+            np.save(x_path, x)
+            np.save(y_path, y)
+
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = {executor.submit(fit_and_test_mapped_split, (x_path, y_path), *[a[j] for a in todo_arguments]): t for j, t in enumerate(todo)}
+                for future in as_completed(futures):
+                    outputs[futures[future]] = future.result()
+                    if on_split is not None:
+                        on_split(create_result(futures[future]))
+    else:
+        for j, t in enumerate(todo):
+            outputs[t] = fit_and_test_split(x, y, *[a[j] for a in todo_arguments])
+            if on_split is not None:
+                on_split(create_result(t))
+
+    # Merges results (in the order of the classifiers then splits)
+    results = [create_result(t) for t in range(len(tasks))]
 
     return pd.DataFrame(results)
 
 
-def create_classifiers(classifiers_names):
+def fit_and_test_split(x, y, classifier, train_index, test_index, keep_model=True, model_file=None, checkpoint_file=None):
+    """
+    Fits and tests a classifier on one split of the k-fold cross-validation.
+
+    :param x: normalized data
+    :param y: corresponding labels
+    :param classifier: unfitted classifier
+    :param train_index: indices of the training set
+    :param test_index: indices of the test set
+    :param keep_model: return the fitted classifier (None is returned otherwise)
+    :param model_file: path to the file where the fitted classifier is saved (not saved if None)
+    :param checkpoint_file: path to the file where the output is saved (not saved if None)
+    :return: fitted classifier, predicted scores, type of scores (proba or decision), fitting time and testing time
+    """
+
+    x_train, x_test = x[train_index], x[test_index]
+    y_train = y[train_index]
+
+    # Fits and times the fitting process (in CPU time of the process, which does not count the waits for the other
+    # processes of the pool)
+    clf = clone(classifier)
+    start_fit = process_time()
+    clf.fit(x_train, y_train)
+    fit_time = process_time() - start_fit
+
+    # Tests and times the testing process (with the decision function if the classifier has no probabilities)
+    start_test = process_time()
+    if hasattr(clf, 'predict_proba'):
+        y_pred = clf.predict_proba(x_test)
+        score_type = 'proba'
+    else:
+        y_pred = clf.decision_function(x_test)
+        score_type = 'decision'
+    test_time = process_time() - start_test
+
+    # Spills the fitted classifier to disk
+    if model_file is not None:
+        joblib.dump(clf, model_file)
+
+    # Checkpoints the output of the split (without the classifier, which is saved to the model file or fitted again)
+    if checkpoint_file is not None:
+        save_checkpoint((y_pred, score_type, fit_time, test_time), checkpoint_file)
+
+    return clf if keep_model else None, y_pred, score_type, fit_time, test_time
+
+
+def load_split_checkpoint(x, y, classifier, train_index, keep_model=True, model_file=None, checkpoint_file=None):
+    """
+    Loads the output of a split checkpointed by fit_and_test_split. The fitted classifier is loaded from the model file
+    or fitted again on the training set when it is kept.
+
+    :param x: normalized data
+    :param y: corresponding labels
+    :param classifier: unfitted classifier
+    :param train_index: indices of the training set
+    :param keep_model: return the fitted classifier (None is returned otherwise)
+    :param model_file: path to the file where the fitted classifier was saved (None if not saved)
+    :param checkpoint_file: path to the file where the output was saved (None if no checkpoint)
+    :return: output of fit_and_test_split (None if the split is not checkpointed)
+    """
+
+    checkpoint = load_checkpoint(checkpoint_file) if checkpoint_file is not None else None
+    if checkpoint is None:
+        return None
+
+    clf = None
+    if keep_model and model_file is not None and os.path.isfile(model_file):
+        clf = joblib.load(model_file)
+    elif keep_model:
+        clf = clone(classifier).fit(x[train_index], y[train_index])
+
+    # The checkpoints of earlier versions also hold the classifier first
+    return (clf,) + tuple(checkpoint[-4:])
+
+
+def fit_and_test_mapped_split(paths, classifier, train_index, test_index, keep_model=True, model_file=None,
+                              checkpoint_file=None):
+    """
+    Fits and tests a classifier on one split with data memory-mapped from files (used by the processes of
+    fit_and_test_classifiers).
+
+    :param paths: paths of the files containing the normalized data and the labels
+    :param classifier: unfitted classifier
+    :param train_index: indices of the training set
+    :param test_index: indices of the test set
+    :param keep_model: return the fitted classifier (None is returned otherwise)
+    :param model_file: path to the file where the fitted classifier is saved (not saved if None)
+    :param checkpoint_file: path to the file where the output is saved (not saved if None)
+    :return: fitted classifier, predicted scores, type of scores (proba or decision), fitting time and testing time
+    """
+
+    x = np.load(paths[0], mmap_mode='r')
+    y = np.load(paths[1], mmap_mode='r')
+    return fit_and_test_split(x, y, classifier, train_index, test_index, keep_model, model_file, checkpoint_file)
+
+
+def create_classifiers(classifiers_names, probability=True):
     """
     Instantiates the classifiers and set their full names.
 
     :param classifiers_names: list of wanted classifiers
+    :param probability: enable the probabilities of the SVM (internal 5-fold calibration on each fit)
     :return: classifiers and their full names
     """
 
     classifiers = []
     full_names = []
 
-    if 'knn' in classifiers_names:
-        classifiers.append(neighbors.KNeighborsClassifier())
-        full_names.append('k-Nearest Neighbour')
-    if 'svm' in classifiers_names:
-        classifiers.append(svm.SVC(probability=True))
-        full_names.append('Support Vector Machines')
-    if 'dt' in classifiers_names:
-        classifiers.append(tree.DecisionTreeClassifier())
-        full_names.append('Decision Tree')
-    if 'rf' in classifiers_names:
-        classifiers.append(RandomForestClassifier())
-        full_names.append('Random Forest')
-    if 'gb' in classifiers_names:
-        classifiers.append(GradientBoostingClassifier())
-        full_names.append('Gradient Boosting')
+    # Keeps the order of the wanted classifiers (the results are labelled with their names in this order)
+    for name in classifiers_names:
+        if name == 'knn':
+            classifiers.append(neighbors.KNeighborsClassifier())
+            full_names.append('k-Nearest Neighbour')
+        elif name == 'svm':
+            classifiers.append(svm.SVC(probability=probability))
+            full_names.append('Support Vector Machines')
+        elif name == 'dt':
+            classifiers.append(tree.DecisionTreeClassifier())
+            full_names.append('Decision Tree')
+        elif name == 'rf':
+            classifiers.append(RandomForestClassifier())
+            full_names.append('Random Forest')
+        elif name == 'gb':
+            classifiers.append(GradientBoostingClassifier())
+            full_names.append('Gradient Boosting')
 
     return classifiers, full_names
+
+
+def calibrate_classifier(classifier, x, y, k_fold):
+    """
+    Calibrates the probabilities of a classifier lacking cheap probabilities once on the whole dataset (e.g. before
+    deploying an SVM evaluated with its decision function).
+
+    :param classifier: unfitted classifier
+    :param x: normalized data
+    :param y: corresponding labels
+    :param k_fold: number of folds used by the calibration
+    :return: fitted classifier with probabilities
+    """
+
+    return CalibratedClassifierCV(clone(classifier), method='sigmoid', cv=k_fold).fit(x, y)
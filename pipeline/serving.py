@@ -0,0 +1,200 @@
+import asyncio
+import numpy as np
+
+from pipeline.acquisition import parse_counts
+
+
+# Maximal length of a TCP message [bytes] (about 16000 samples, the connections sending longer messages are closed)
+MESSAGE_LIMIT = 2 ** 20
+
+
+class IngestionServer:
+    """
+    Server receiving the raw samples of many devices over TCP and UDP. Each message holds a chunk of samples of one
+    device in the layout of the SisFall files, prefixed by the identifier of the device:
+
+        <device>:<9 counts separated by commas>;<9 counts separated by commas>;...
+
+    TCP messages end with a newline and UDP datagrams hold one or more messages separated by newlines. The samples are
+    converted and decimated by the streaming detector of the device, and the windows ready on all devices are scored
+    together in micro-batches (see collect and score of the detectors). A batch is scored when it is full or when its oldest window reaches the deadline. Each
+    score is sent back to the sender as a line <device>,<index of the last sample of the window>,<score>. The state of
+    the devices of a TCP connection is dropped when it closes and the state of the UDP devices when they are idle for
+    longer than the idle timeout. A TCP connection is not read while the scores waiting in its write buffer exceed its
+    high-water mark.
+    """
+
+    def __init__(self, detector, max_batch=256, deadline=0.02, idle_timeout=60.0):
+        """
+        :param detector: streaming detector (see pipeline/streaming.py)
+        :param max_batch: maximal number of windows scored at once
+        :param deadline: maximal waiting time of a window before being scored [s]
+        :param idle_timeout: time without message after which the state of a UDP device is dropped [s]
+        """
+
+        self.detector = detector
+        self.max_batch = max_batch
+        self.deadline = deadline
+        self.idle_timeout = idle_timeout
+        self.pending = []
+        self.ready = None
+        self.endpoints = []
+        self.datagram_devices = {}
+
+    async def serve(self, host, tcp_port=None, udp_port=None):
+        """
+        Listens on the given ports and scores the windows until cancelled.
+
+        :param host: address to listen on
+        :param tcp_port: TCP port (no TCP if None)
+        :param udp_port: UDP port (no UDP if None)
+        """
+
+        loop = asyncio.get_event_loop()
+        self.ready = asyncio.Event()
+
+        if tcp_port is not None:
+            self.endpoints.append(await asyncio.start_server(self.handle_connection, host, tcp_port, limit=MESSAGE_LIMIT))
+        if udp_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(lambda: DeviceDatagramProtocol(self), local_addr=(host, udp_port))
+            self.endpoints.append(transport)
+
+        expiring = asyncio.ensure_future(self.expire_devices())
+        try:
+            await self.score_batches()
+        finally:
+            expiring.cancel()
+
+    def receive(self, message, reply):
+        """
+        Handles the message of a device and queues its windows ready to be scored.
+
+        :param message: bytes of the message (without newline)
+        :param reply: function sending bytes back to the device
+        :return: identifier of the device (None if the message is invalid)
+        """
+
+        device, _, content = message.partition(b':')
+        counts = parse_counts(content)
+        if len(device) == 0 or counts is None:
+            return None
+        try:
+            name = device.decode('utf-8', errors='strict')
+        except UnicodeDecodeError:
+            return None
+
+        ends, rows = self.detector.collect(name, counts)
+        now = asyncio.get_event_loop().time()
+        for end, row in zip(ends, rows):
+            self.pending.append((now, reply, device, end, row))
+        if len(ends) != 0:
+            self.ready.set()
+
+        return name
+
+    async def handle_connection(self, reader, writer):
+        """
+        Receives the messages of a TCP connection.
+
+        :param reader: stream reader of the connection
+        :param writer: stream writer of the connection
+        """
+
+        def reply(data):
+            if not writer.transport.is_closing():
+                writer.write(data)
+
+        devices = set()
+        try:
+            while True:
+                message = await reader.readline()
+                if len(message) == 0:
+                    break
+                devices.add(self.receive(message.rstrip(b'\r\n'), reply))
+
+                # Stops reading the device while the scores sent back exceed the write buffer of the connection
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # The connection was reset by the device or its message is longer than the limit of the reader
+            pass
+        finally:
+            # Drops the state of the devices of the connection
+            for device in devices - {None}:
+                self.detector.remove_device(device)
+            writer.close()
+
+    async def expire_devices(self):
+        """
+        Drops the state of the UDP devices idle for longer than the idle timeout until cancelled.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            oldest = loop.time() - self.idle_timeout
+            for device in [d for d, last in self.datagram_devices.items() if last < oldest]:
+                del self.datagram_devices[device]
+                self.detector.remove_device(device)
+
+    async def score_batches(self):
+        """
+        Scores the queued windows by micro-batches and sends back their scores.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            await self.ready.wait()
+
+            # Waits for more windows until the batch is full or the oldest window reaches the deadline
+            while len(self.pending) < self.max_batch:
+                remaining = self.pending[0][0] + self.deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self.ready.clear()
+                try:
+                    await asyncio.wait_for(self.ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            # Scores the windows of all devices at once (with a cascade detector, their features are extracted at once)
+            batch = self.pending[:self.max_batch]
+            self.pending = self.pending[self.max_batch:]
+            if len(self.pending) == 0:
+                self.ready.clear()
+            scores = self.detector.score(np.array([b[4] for b in batch]))
+
+            for (_, reply, device, end, _), score in zip(batch, scores):
+                reply(device + b',' + str(end).encode() + b',' + '{:.6f}'.format(score).encode() + b'\n')
+
+            # Lets the connections receive new messages
+            await asyncio.sleep(0)
+
+
+class DeviceDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Protocol receiving the UDP datagrams of the devices for an IngestionServer.
+    """
+
+    def __init__(self, server):
+        """
+        :param server: server handling the messages
+        """
+
+        self.server = server
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        now = asyncio.get_event_loop().time()
+        for message in data.splitlines():
+            # Skips a message failing unexpectedly without dropping the following ones of the datagram
+            try:
+                device = self.server.receive(message, lambda reply, a=address: self.transport.sendto(reply, a))
+            except ValueError:
+                continue
+            if device is not None:
+                self.server.datagram_devices[device] = now
@@ -0,0 +1,466 @@
+import bisect
+import numpy as np
+
+from pipeline.acquisition import scale_counts
+from pipeline.acquisition import COLUMNS
+from pipeline.preprocessing import SENSOR_FREQUENCY
+from pipeline.feature_extraction import add_magnitudes
+from pipeline.feature_extraction import compute_spectral_features
+from pipeline.feature_extraction import extract_features_batch
+from pipeline.compiled import CompiledModel
+
+
+# Sensor's axes of the acceleration magnitude of the impact gate (ADXL345 accelerometer)
+GATE_SENSORS = [0, 1, 2]
+
+
+class SlidingWindowFeatures:
+    """
+    Features of extract_features_batch over a sliding window of a stream of samples. The statistics are updated
+    incrementally with each chunk of samples instead of being recomputed for each window: running sums for the moments, one
+    sorted list per channel for the order statistics, running sums of the per-sample spectra for the fft features and
+    a sliding DFT for the rfft features. The running values are recomputed from the window once per window length to
+    bound the rounding errors.
+    """
+
+    def __init__(self, columns, window, with_magnitude=True, spectral='fft', frequency=None):
+        """
+        :param columns: names of the channels of the samples
+        :param window: number of samples of the window
+        :param with_magnitude: calculate the magnitude of the sensors (three consecutive channels)
+        :param spectral: frequency domain features (either fft or rfft)
+        :param frequency: sampling frequency of the stream [Hz] (only used with rfft)
+        """
+
+        self.columns = list(columns)
+        self.window = window
+        self.with_magnitude = with_magnitude
+        self.spectral = spectral
+        self.n_channels = len(columns) + (len(range(0, len(columns), 3)) if with_magnitude else 0)
+
+        # Ring buffer of the samples of the window
+        self.buffer = np.zeros((window, self.n_channels))
+        self.position = 0
+        self.count = 0
+
+        # Running sums of the moments (shifted by the first sample) and sorted values of each channel
+        self.shift = None
+        self.sums = np.zeros(self.n_channels)
+        self.squares = np.zeros(self.n_channels)
+        self.sorted = [[] for _ in range(self.n_channels)]
+
+        if spectral == 'fft':
+            # Spectra over the channels of each sample of the window and their running sums
+            self.power = np.zeros((window, self.n_channels))
+            self.entropy = np.zeros((window, self.n_channels))
+            self.power_sum = np.zeros(self.n_channels)
+            self.entropy_sum = np.zeros(self.n_channels)
+        else:
+            # Sliding DFT of the window
+            self.frequencies = np.fft.rfftfreq(window, 1 / frequency)
+            self.twiddles = np.exp(2j * np.pi * np.arange(len(self.frequencies)) / window)[:, np.newaxis]
+            self.spectrum = np.zeros((len(self.frequencies), self.n_channels), dtype=complex)
+
+    def __len__(self):
+        return min(self.count, self.window)
+
+    def push(self, values):
+        """
+        Adds samples to the window (the oldest samples leave the window once it is full). The statistics are updated
+        for all the samples at once.
+
+        :param values: array of shape (samples, channels) of the converted values of the samples (at most the length
+        of the window)
+        """
+
+        x = np.asarray(values, dtype=np.float64)
+        if self.with_magnitude:
+            x = add_magnitudes(x[np.newaxis], self.columns)[0][0]
+        length = len(x)
+        positions = (self.position + np.arange(length)) % self.window
+        old = self.buffer[positions]
+        leaving = (self.count + np.arange(length)) >= self.window
+
+        # Moments (shifted by the first sample of the stream)
+        if self.shift is None:
+            self.shift = x[0].copy()
+        self.sums += np.sum(x - self.shift, axis=0) - np.sum(old[leaving] - self.shift, axis=0)
+        self.squares += np.sum((x - self.shift) ** 2, axis=0) - np.sum((old[leaving] - self.shift) ** 2, axis=0)
+
+        # Order statistics
+        for old_values in old[leaving].tolist():
+            for c, value in enumerate(old_values):
+                del self.sorted[c][bisect.bisect_left(self.sorted[c], value)]
+        for new_values in x.tolist():
+            for c, value in enumerate(new_values):
+                bisect.insort(self.sorted[c], value)
+
+        # Frequency domain (the empty slots of the ring buffer are zeros, empty bins do not contribute)
+        if self.spectral == 'fft':
+            power = np.abs(np.fft.fft(x, axis=1)) ** 2
+            entropy = power * np.log(np.where(power > 0, power, 1))
+            self.power_sum += np.sum(power, axis=0) - np.sum(self.power[positions], axis=0)
+            self.entropy_sum += np.sum(entropy, axis=0) - np.sum(self.entropy[positions], axis=0)
+            self.power[positions] = power
+            self.entropy[positions] = entropy
+        else:
+            # Each sample j rotates the spectrum (length - j) more times
+            rotations = np.exp(2j * np.pi * np.outer(np.arange(len(self.frequencies)), length - np.arange(length)) / self.window)
+            self.spectrum = self.spectrum * self.twiddles ** length + rotations @ (x - old)
+
+        self.buffer[positions] = x
+        self.position = (self.position + length) % self.window
+        self.count += length
+
+        # Bounds the rounding errors once per window length
+        if self.count // self.window != (self.count - length) // self.window:
+            self.refresh()
+
+    def refresh(self):
+        """
+        Recomputes the running sums and the sliding DFT from the samples of the window.
+        """
+
+        window = np.roll(self.buffer, -self.position, axis=0)
+        self.sums = np.sum(window - self.shift, axis=0)
+        self.squares = np.sum((window - self.shift) ** 2, axis=0)
+
+        if self.spectral == 'fft':
+            self.power_sum = np.sum(self.power, axis=0)
+            self.entropy_sum = np.sum(self.entropy, axis=0)
+        else:
+            self.spectrum = np.fft.rfft(window, axis=0)
+
+    def features(self):
+        """
+        Computes the features of the samples of the window (the window must be full).
+
+        :return: array of shape (features,) ordered as the columns of extract_features_batch
+        """
+
+        length = self.window
+
+        # Moments
+        mean = self.shift + self.sums / length
+        var = np.maximum(self.squares - self.sums * self.sums / length, 0) / length
+
+        # Order statistics (percentiles linearly interpolated as in np.percentile)
+        centiles = []
+        for q in (0.25, 0.5, 0.75):
+            p = q * (length - 1)
+            low = np.array([s[int(p)] for s in self.sorted])
+            high = np.array([s[min(int(p) + 1, length - 1)] for s in self.sorted])
+            centiles.append(low + (high - low) * (p - int(p)))
+        minimum = np.array([s[0] for s in self.sorted])
+        maximum = np.array([s[-1] for s in self.sorted])
+
+        features = [mean, var, np.sqrt(var), centiles[1], maximum, minimum, maximum - minimum, centiles[0], centiles[2]]
+
+        # Frequency domain
+        if self.spectral == 'fft':
+            features.append(self.power_sum / length)
+            features.append(-(self.entropy_sum - np.log(length) * self.power_sum) / length)
+        else:
+            psd = np.abs(self.spectrum) ** 2 / length
+            psd[1:(length + 1) // 2] *= 2
+            features.append(compute_spectral_features(psd[np.newaxis], self.frequencies)[0])
+
+        return np.hstack(features)
+
+
+class StreamingDetector:
+    """
+    Fall detector over streams of raw samples of many devices. Each device has its own sliding window of features
+    and a prediction is emitted every hop once the window is full.
+    """
+
+    def __init__(self, model, scaler, config, hop):
+        """
+        :param model: fitted classifier (see fit_and_test_classifiers) or compiled model (see CompiledModel)
+        :param scaler: fitted scaler of the features (None with a compiled model which scales them itself)
+        :param config: parameters of the preprocessing and feature extraction of the model (see save_model_config)
+        :param hop: number of samples at the frequency of the model between two predictions
+        """
+
+        self.model = model
+        self.scaler = scaler
+        self.sensors = config['sensors']
+        self.frequency = config['frequency']
+        self.spectral = config['spectral']
+        self.factor = SENSOR_FREQUENCY // self.frequency
+        self.window = len(range(0, int(config['duration'] * SENSOR_FREQUENCY / 1000), self.factor))
+        self.hop = hop
+        self.devices = {}
+
+    def create_device(self):
+        """
+        Creates the state of a new device.
+
+        :return: dictionary of the state
+        """
+
+        features = SlidingWindowFeatures([COLUMNS[s] for s in self.sensors], self.window, True, self.spectral,
+                                         self.frequency)
+        return {'features': features, 'received': 0, 'pushed': 0}
+
+    def remove_device(self, device):
+        """
+        Drops the state of a device (its next samples start a new stream).
+
+        :param device: identifier of the device
+        """
+
+        self.devices.pop(device, None)
+
+    def push(self, device, counts):
+        """
+        Adds raw samples of a device (nine axes as in the SisFall files) and extracts the features of each window
+        ending on a hop.
+
+        :param device: identifier of the device
+        :param counts: array of shape (samples, 9) of the raw counts at the frequency of the sensor
+        :return: list of the indices of the last sample of each window (at the frequency of the sensor) and array of
+        their features
+        """
+
+        if device not in self.devices:
+            self.devices[device] = self.create_device()
+        state = self.devices[device]
+
+        # Keeps one sample out of factor (as the decimate resampling) and converts them
+        first = (-state['received']) % self.factor
+        indices = np.arange(first, len(counts), self.factor)
+        values = scale_counts(np.asarray(counts)[indices][:, self.sensors], self.sensors)
+
+        ends = []
+        features = []
+        i = 0
+        while i < len(values):
+
+            # Pushes the samples up to the end of the next window ending on a hop
+            pushed = state['pushed']
+            following = self.window if pushed < self.window else self.window + ((pushed - self.window) // self.hop + 1) * self.hop
+            step = min(following - pushed, len(values) - i, self.window)
+            state['features'].push(values[i:i + step])
+            state['pushed'] += step
+            i += step
+
+            if state['pushed'] == following:
+                ends.append(state['received'] + indices[i - 1])
+                features.append(state['features'].features())
+        state['received'] += len(counts)
+
+        return ends, np.array(features) if len(features) != 0 else np.empty((0, 0))
+
+    def predict(self, features):
+        """
+        Scores many windows at once with the model.
+
+        :param features: array of shape (windows, features)
+        :return: array of the fall scores of each window (probability or decision function of the second class)
+        """
+
+        if len(features) == 0:
+            return np.empty(0)
+
+        x = self.scaler.transform(features) if self.scaler is not None else features
+        if hasattr(self.model, 'predict_proba'):
+            return self.model.predict_proba(x)[:, 1]
+        scores = self.model.decision_function(x)
+        return scores if scores.ndim == 1 else scores[:, 1]
+
+    def collect(self, device, counts):
+        """
+        Adds raw samples of a device and returns the rows of the windows ending on a hop to be scored later by score
+        (with the windows of other devices). The rows are the features of the windows.
+
+        :param device: identifier of the device
+        :param counts: array of shape (samples, 9) of the raw counts at the frequency of the sensor
+        :return: list of the indices of the last sample of each window (at the frequency of the sensor) and array of
+        their rows
+        """
+
+        return self.push(device, counts)
+
+    def score(self, rows):
+        """
+        Scores many windows at once from their rows returned by collect.
+
+        :param rows: array of the rows of the windows
+        :return: array of the fall scores of each window
+        """
+
+        return self.predict(rows)
+
+    def process(self, device, counts):
+        """
+        Adds raw samples of a device and scores the windows ending on a hop.
+
+        :param device: identifier of the device
+        :param counts: array of shape (samples, 9) of the raw counts at the frequency of the sensor
+        :return: list of the indices of the last sample of each window and array of their fall scores
+        """
+
+        ends, features = self.push(device, counts)
+        return ends, self.predict(features)
+
+
+class CascadeDetector(StreamingDetector):
+    """
+    Fall detector over streams of raw samples in two stages. The first stage is a cheap gate over the acceleration
+    magnitude of each sample which flags the candidate impacts (see impact_candidates). The second stage extracts the
+    features of the windows ending on a hop (with extract_features_batch) and scores them with the model only if a
+    candidate impact occurred within the hold time before their end. The other windows are skipped. Each device only
+    keeps the last samples of its window instead of running statistics, so that the windows of many devices can be
+    collected first and their features extracted at once (see collect and score).
+    """
+
+    def __init__(self, model, scaler, config, hop, threshold, jerk, hold):
+        """
+        :param model: fitted classifier (see fit_and_test_classifiers) or compiled model (see CompiledModel)
+        :param scaler: fitted scaler of the features (None with a compiled model which scales them itself)
+        :param config: parameters of the preprocessing and feature extraction of the model (see save_model_config)
+        :param hop: number of samples at the frequency of the model between two predictions
+        :param threshold: acceleration magnitude of a candidate impact [g]
+        :param jerk: change of the acceleration magnitude of a candidate impact [g/s]
+        :param hold: number of samples at the frequency of the model after a candidate impact whose windows are scored
+        """
+
+        super().__init__(model, scaler, config, hop)
+        self.threshold = threshold
+        self.jerk = jerk
+        self.hold = hold
+        self.columns = [COLUMNS[s] for s in self.sensors]
+
+        # Counters of the windows ending on a hop and of the windows passing the gate
+        self.windows = 0
+        self.gated = 0
+
+    def create_device(self):
+        """
+        Creates the state of a new device.
+
+        :return: dictionary of the state
+        """
+
+        return {'tail': np.empty((0, len(self.sensors))), 'magnitude': None, 'impact': None, 'received': 0, 'pushed': 0}
+
+    def push(self, device, counts):
+        """
+        Adds raw samples of a device (nine axes as in the SisFall files) and extracts the features of each window
+        ending on a hop which passes the gate.
+
+        :param device: identifier of the device
+        :param counts: array of shape (samples, 9) of the raw counts at the frequency of the sensor
+        :return: list of the indices of the last sample of each window passing the gate (at the frequency of the
+        sensor) and array of their features (only the ones used by a compiled model)
+        """
+
+        ends, windows = self.collect(device, counts)
+        return ends, self.extract(windows)
+
+    def collect(self, device, counts):
+        """
+        Adds raw samples of a device and returns the samples of each window ending on a hop which passes the gate, so
+        that the features of the windows of many devices are extracted at once by score.
+
+        :param device: identifier of the device
+        :param counts: array of shape (samples, 9) of the raw counts at the frequency of the sensor
+        :return: list of the indices of the last sample of each window passing the gate (at the frequency of the
+        sensor) and array of shape (windows, window, channels) of their converted samples
+        """
+
+        if device not in self.devices:
+            self.devices[device] = self.create_device()
+        state = self.devices[device]
+
+        # Keeps one sample out of factor (as the decimate resampling) and converts them
+        first = (-state['received']) % self.factor
+        indices = np.arange(first, len(counts), self.factor)
+        samples = np.asarray(counts)[indices]
+        values = scale_counts(samples[:, self.sensors], self.sensors)
+        pushed = state['pushed']
+
+        # Finds the candidate impacts (indices of the samples since the start of the stream)
+        magnitudes = np.sqrt(np.sum(np.square(scale_counts(samples[:, GATE_SENSORS], GATE_SENSORS)), axis=1))
+        impacts = pushed + np.flatnonzero(impact_candidates(magnitudes, self.frequency, self.threshold, self.jerk,
+                                                            state['magnitude']))
+
+        # Lists the windows ending on a hop (number of samples pushed at their end) and keeps those following an impact
+        following = self.window if pushed < self.window else self.window + ((pushed - self.window) // self.hop + 1) * self.hop
+        ends = np.arange(following, pushed + len(values) + 1, self.hop)
+        known = np.concatenate([[-self.hold if state['impact'] is None else state['impact']], impacts])
+        latest = known[np.searchsorted(known, ends - 1, side='right') - 1]
+        gated = ends[ends - 1 - latest < self.hold]
+        self.windows += len(ends)
+        self.gated += len(gated)
+
+        # Keeps the samples of the stream still needed by the following windows
+        stream = np.vstack([state['tail'], values])
+        offset = pushed - len(state['tail'])
+        state['tail'] = stream[max(len(stream) - self.window + 1, 0):]
+        state['magnitude'] = magnitudes[-1] if len(magnitudes) != 0 else state['magnitude']
+        state['impact'] = impacts[-1] if len(impacts) != 0 else state['impact']
+        state['pushed'] += len(values)
+
+        ends_indices = list(state['received'] + indices[gated - 1 - pushed])
+        state['received'] += len(counts)
+
+        return ends_indices, stream[(gated - self.window - offset)[:, np.newaxis] + np.arange(self.window)]
+
+    def extract(self, windows):
+        """
+        Extracts the features of many windows at once (a compiled model only extracts the features used by its trees).
+
+        :param windows: array of shape (windows, window, channels) of the converted samples as returned by collect
+        :return: array of shape (windows, features) of their features
+        """
+
+        if len(windows) == 0:
+            return np.empty((0, 0))
+        if isinstance(self.model, CompiledModel):
+            return self.model.extract_features(windows)
+
+        return extract_features_batch(windows, self.columns, True, self.spectral, self.frequency).values
+
+    def score(self, rows):
+        """
+        Extracts the features of many windows at once and scores them with the model.
+
+        :param rows: array of shape (windows, window, channels) of the converted samples as returned by collect
+        :return: array of the fall scores of each window
+        """
+
+        return self.predict(self.extract(rows))
+
+    def predict(self, features):
+        """
+        Scores many windows at once with the model.
+
+        :param features: array of shape (windows, features) as returned by push
+        :return: array of the fall scores of each window (probability or decision function of the second class)
+        """
+
+        if isinstance(self.model, CompiledModel) and len(features) != 0:
+            return self.model.evaluate(features)[:, 1]
+        return super().predict(features)
+
+
+def impact_candidates(magnitudes, frequency, threshold, jerk, previous=None):
+    """
+    Flags the candidate impacts of a stream of acceleration magnitudes: the samples whose magnitude reaches the
+    threshold and whose change from the previous sample reaches the jerk. A null threshold and jerk flag every sample.
+
+    :param magnitudes: array of shape (samples,) of the acceleration magnitudes [g]
+    :param frequency: sampling frequency of the stream [Hz]
+    :param threshold: acceleration magnitude of a candidate impact [g]
+    :param jerk: change of the acceleration magnitude of a candidate impact [g/s]
+    :param previous: magnitude of the sample preceding the stream (the first sample has no change if None)
+    :return: array of booleans telling if each sample is a candidate impact
+    """
+
+    if len(magnitudes) == 0:
+        return np.zeros(0, dtype=bool)
+
+    changes = np.abs(np.diff(magnitudes, prepend=magnitudes[0] if previous is None else previous)) * frequency
+    return (magnitudes >= threshold) & (changes >= jerk)
@@ -0,0 +1,92 @@
+import os
+import json
+import numpy as np
+
+from pipeline.acquisition import read_raw_files
+from pipeline.acquisition import parse_file
+from pipeline.acquisition import parse_file_csv
+from pipeline.acquisition import CACHE_MANIFEST
+
+
+def write_sisfall_file(file_path, counts):
+    """
+    Writes raw analog counts in the layout of the SisFall files.
+
+    :param file_path: the path of the file
+    :param counts: array of shape (samples, 9) of the raw counts
+    """
+
+    with open(file_path, 'w') as file:
+        file.write(''.join(' ' + ','.join(str(c) for c in row) + ';\n' for row in counts))
+
+
+def create_files(folder, number, samples=200, seed=0):
+    """
+    Writes SisFall files of random counts.
+
+    :param folder: folder of the files
+    :param number: number of files
+    :param samples: number of samples of each file
+    :param seed: seed of the counts
+    :return: list of the paths of the files
+    """
+
+    random = np.random.RandomState(seed)
+    paths = []
+    for i in range(number):
+        paths.append(str(folder) + '/D01_SA01_R0' + str(i + 1) + '.txt')
+        write_sisfall_file(paths[-1], random.randint(-4096, 4096, (samples, 9)))
+
+    return paths
+
+
+def test_parse_file_matches_pandas_parser(tmp_path):
+    path = create_files(tmp_path, 1)[0]
+
+    np.testing.assert_array_equal(parse_file(path), parse_file_csv(path))
+
+
+def test_cache_returns_parsed_counts(tmp_path):
+    paths = create_files(tmp_path, 3)
+    cache = str(tmp_path / 'cache')
+
+    first = read_raw_files(paths, cache)
+    second = read_raw_files(paths, cache)
+
+    # The second read memory-maps the cached counts
+    assert all(isinstance(data, np.memmap) for data in second)
+    for path, parsed, cached in zip(paths, first, second):
+        np.testing.assert_array_equal(parsed, parse_file(path))
+        np.testing.assert_array_equal(cached, parse_file(path))
+        assert cached.dtype == parsed.dtype
+
+
+def test_cache_with_workers_keeps_order(tmp_path):
+    paths = create_files(tmp_path, 4)
+
+    for path, data in zip(paths, read_raw_files(paths, str(tmp_path / 'cache'), workers=2)):
+        np.testing.assert_array_equal(data, parse_file(path))
+
+
+def test_cache_evicts_modified_and_deleted_files(tmp_path):
+    paths = create_files(tmp_path, 3)
+    cache = str(tmp_path / 'cache')
+    read_raw_files(paths, cache)
+    with open(cache + '/' + CACHE_MANIFEST) as file:
+        entries = json.load(file)
+
+    # Rewrites the first file with other counts (and another modification time) and deletes the last one
+    write_sisfall_file(paths[0], np.full((100, 9), 7))
+    os.utime(paths[0], ns=(0, entries[os.path.abspath(paths[0])]['mtime'] + 10 ** 9))
+    os.remove(paths[2])
+
+    data = read_raw_files(paths[0:2], cache)
+    np.testing.assert_array_equal(data[0], np.full((100, 9), 7))
+    np.testing.assert_array_equal(data[1], parse_file(paths[1]))
+
+    # The entry of the deleted file and its counts are removed
+    with open(cache + '/' + CACHE_MANIFEST) as file:
+        manifest = json.load(file)
+    assert sorted(manifest) == sorted(os.path.abspath(p) for p in paths[0:2])
+    assert not os.path.isfile(cache + '/' + entries[os.path.abspath(paths[2])]['file'])
+    assert sorted(os.listdir(cache)) == sorted([CACHE_MANIFEST] + [e['file'] for e in manifest.values()])
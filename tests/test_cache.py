@@ -0,0 +1,97 @@
+import os
+import numpy as np
+import pandas as pd
+
+from utils.cache import dataset_fingerprint
+from utils.cache import features_cache_key
+from utils.cache import load_cached_features
+from utils.cache import cache_features
+
+
+PARAMETERS = {'sensors': [0, 1, 2, 3, 4, 5], 'ignored_subjects': ['SA01'], 'duration': 10000, 'frequency': 50,
+              'classification': 'binary', 'spectral': 'fft', 'resampling': 'decimate'}
+
+
+def create_dataset(folder):
+    """
+    Creates a dataset folder of two subjects with two empty files each.
+
+    :param folder: folder of the dataset
+    :return: path of the dataset
+    """
+
+    for subject in ('SA01', 'SA02'):
+        os.makedirs(str(folder) + '/' + subject)
+        for activity in ('D01', 'F01'):
+            with open(str(folder) + '/' + subject + '/' + activity + '_' + subject + '_R01.txt', 'w') as file:
+                file.write('1,2,3,4,5,6,7,8,9;\n')
+
+    return str(folder)
+
+
+def create_features(rows, seed=0):
+    """
+    Creates a random feature matrix and its labels.
+
+    :param rows: number of rows
+    :param seed: seed of the values
+    :return: feature matrix and labels
+    """
+
+    random = np.random.RandomState(seed)
+    return pd.DataFrame(random.normal(0, 1, (rows, 4)), columns=['a', 'b', 'c', 'd']), list(random.randint(0, 2, rows))
+
+
+def test_fingerprint_follows_the_used_files(tmp_path):
+    folder = create_dataset(tmp_path)
+    fingerprint = dataset_fingerprint(folder, [])
+
+    assert dataset_fingerprint(folder, []) == fingerprint
+    assert dataset_fingerprint(folder, ['SA01']) != fingerprint
+
+    # Modifying an ignored file keeps the fingerprint, modifying a used one changes it
+    ignored = dataset_fingerprint(folder, ['SA01'])
+    with open(folder + '/SA01/D01_SA01_R01.txt', 'a') as file:
+        file.write('1,2,3,4,5,6,7,8,9;\n')
+    assert dataset_fingerprint(folder, ['SA01']) == ignored
+    assert dataset_fingerprint(folder, []) != fingerprint
+
+
+def test_key_follows_the_parameters():
+    key = features_cache_key('dataset', PARAMETERS)
+
+    # The order of the keys does not matter but the order of the sensors does
+    assert features_cache_key('dataset', dict(reversed(list(PARAMETERS.items())))) == key
+    assert features_cache_key('dataset', dict(PARAMETERS, sensors=[3, 4, 5, 0, 1, 2])) != key
+    assert features_cache_key('dataset', dict(PARAMETERS, frequency=20)) != key
+    assert features_cache_key('other', PARAMETERS) != key
+
+
+def test_cache_returns_saved_features(tmp_path):
+    cache = str(tmp_path / 'cache')
+    features = create_features(100)
+
+    assert load_cached_features(cache, 'key') is None
+    cache_features(cache, 'key', features, 1024 ** 2)
+    dataset, labels = load_cached_features(cache, 'key')
+
+    pd.testing.assert_frame_equal(dataset, features[0])
+    assert labels == features[1]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = str(tmp_path / 'cache')
+    cache_features(cache, 'first', create_features(500), 1024 ** 2)
+    size = os.path.getsize(cache + '/first.joblib')
+    os.utime(cache + '/first.joblib', ns=(0, 10 ** 9))
+    cache_features(cache, 'second', create_features(500, 1), 1024 ** 2)
+    os.utime(cache + '/second.joblib', ns=(0, 2 * 10 ** 9))
+
+    # A hit makes the first entry the most recently used, so the second one is evicted
+    assert load_cached_features(cache, 'first') is not None
+    cache_features(cache, 'third', create_features(500, 2), int(2.5 * size))
+    assert sorted(os.listdir(cache)) == ['first.joblib', 'third.joblib']
+
+    # The most recently used entry is kept even above the budget
+    cache_features(cache, 'fourth', create_features(500, 3), 1)
+    assert os.listdir(cache) == ['fourth.joblib']
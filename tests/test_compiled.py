@@ -0,0 +1,100 @@
+import pytest
+import numpy as np
+
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+
+from pipeline.acquisition import COLUMNS
+from pipeline.feature_extraction import extract_features_batch
+from pipeline.feature_extraction import extract_features_subset
+from pipeline.compiled import compile_model
+from pipeline.compiled import export_model
+from pipeline.compiled import load_compiled_model
+from pipeline.compiled import CompiledModel
+
+
+SENSORS = [0, 1, 2, 3, 4, 5]
+MODELS = [DecisionTreeClassifier(random_state=0), RandomForestClassifier(n_estimators=10, random_state=0),
+          GradientBoostingClassifier(n_estimators=10, random_state=0)]
+
+
+def create_windows(windows=120, time=50, seed=0):
+    """
+    Creates random windows of converted samples whose labels depend on their first channel.
+
+    :param windows: number of windows
+    :param time: number of samples of each window
+    :param seed: seed of the values
+    :return: array of shape (windows, time, channels) and labels of three classes
+    """
+
+    random = np.random.RandomState(seed)
+    labels = random.randint(0, 3, windows)
+    data = random.normal(0, 1, (windows, time, len(SENSORS)))
+    data[:, :, 0] += labels[:, np.newaxis]
+
+    return data, labels
+
+
+def fit_model(model, spectral, classes=2):
+    """
+    Fits a model and its scaler on the features of random windows.
+
+    :param model: unfitted classifier
+    :param spectral: frequency domain features (either fft or rfft)
+    :param classes: number of classes (2 or 3)
+    :return: fitted model, scaler, configuration, names and features of the windows, and the windows
+    """
+
+    data, labels = create_windows()
+    features = extract_features_batch(data, [COLUMNS[s] for s in SENSORS], True, spectral, 20)
+    scaler = MinMaxScaler().fit(features.values)
+    model.fit(scaler.transform(features.values), labels if classes == 3 else labels > 0)
+    config = {'sensors': SENSORS, 'frequency': 20, 'duration': 2500, 'spectral': spectral}
+
+    return model, scaler, config, list(features.columns), features.values, data
+
+
+@pytest.mark.parametrize('model', MODELS)
+@pytest.mark.parametrize('classes', [2, 3])
+def test_compiled_matches_predict_proba(model, classes):
+    model, scaler, config, names, features, _ = fit_model(model, 'fft', classes)
+
+    compiled = CompiledModel(compile_model(model, scaler, config, names))
+
+    np.testing.assert_array_equal(compiled.classes_, model.classes_)
+    np.testing.assert_allclose(compiled.predict_proba(features), model.predict_proba(scaler.transform(features)),
+                               atol=1e-12)
+
+
+def test_exported_model_matches_predict_proba(tmp_path):
+    model, scaler, config, names, features, data = fit_model(MODELS[2], 'rfft')
+
+    export_model(model, scaler, config, names, str(tmp_path / 'model.npz'))
+    compiled = load_compiled_model(str(tmp_path / 'model.npz'))
+
+    assert compiled.config == config
+    expected = model.predict_proba(scaler.transform(features))
+    np.testing.assert_allclose(compiled.predict_proba(features), expected, atol=1e-12)
+    np.testing.assert_allclose(compiled.predict_windows(data), expected, atol=1e-12)
+
+
+@pytest.mark.parametrize('spectral', ['fft', 'rfft'])
+def test_subset_matches_batch(spectral):
+    data, _ = create_windows()
+    columns = [COLUMNS[s] for s in SENSORS]
+    features = extract_features_batch(data, columns, True, spectral, 20)
+
+    for names in (['mean_acc_x'], ['ptp_mag_gyro', 'var_acc_z', 'mean_gyro_y'], list(features.columns[-10:])):
+        np.testing.assert_allclose(extract_features_subset(data, columns, names, True, spectral, 20),
+                                   features[names].values, rtol=1e-9, atol=1e-12)
+
+
+def test_unsupported_model_is_rejected():
+    model, scaler, config, names, _, _ = fit_model(LogisticRegression(), 'fft')
+
+    with pytest.raises(ValueError):
+        compile_model(model, scaler, config, names)
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from scipy import signal
+from scipy import stats
+
+from pipeline.feature_extraction import extract_features
+from pipeline.feature_extraction import extract_features_batch
+from pipeline.feature_extraction import extract_segments_features
+from pipeline.feature_extraction import extract_spectral_features
+from pipeline.feature_extraction import power_spectrum
+from pipeline.feature_extraction import features_names
+from pipeline.feature_extraction import SPECTRAL_BANDS
+from pipeline.preprocessing import divide_fall
+from pipeline.preprocessing import divide_falls
+
+
+COLUMNS = ['acc_x', 'acc_y', 'acc_z', 'gyro_x', 'gyro_y', 'gyro_z']
+
+
+def create_samples(samples=5, time=200, channels=6, seed=0):
+    """
+    Creates random samples of activity.
+
+    :param samples: number of samples
+    :param time: number of time steps of each sample
+    :param channels: number of channels
+    :param seed: seed of the values
+    :return: array of shape (samples, time, channels)
+    """
+
+    return np.random.RandomState(seed).normal(0, 1, (samples, time, channels))
+
+
+def test_batch_matches_extract_features():
+    data = create_samples()
+
+    batch = extract_features_batch(data, COLUMNS, True)
+    expected = pd.concat([extract_features(pd.DataFrame(d, columns=COLUMNS), True) for d in data], ignore_index=True)
+
+    assert list(batch.columns) == list(expected.columns)
+    np.testing.assert_allclose(batch.values, expected.values, rtol=1e-9, atol=1e-9)
+
+
+def test_periodogram_matches_fft():
+    data = create_samples(time=201)
+
+    psd, frequencies = power_spectrum(data, 50)
+
+    # One-sided spectrum of the full spectrum of each channel
+    full = np.abs(np.fft.fft(data, axis=1)) ** 2 / data.shape[1]
+    np.testing.assert_allclose(psd[:, 0], full[:, 0])
+    np.testing.assert_allclose(psd[:, 1:], 2 * full[:, 1:psd.shape[1]])
+    np.testing.assert_allclose(frequencies, np.fft.fftfreq(201, 1 / 50)[0:psd.shape[1]])
+
+    # Parseval's theorem
+    np.testing.assert_allclose(np.sum(psd, axis=1), np.sum(np.square(data), axis=1))
+
+
+def test_welch_matches_scipy():
+    data = create_samples(time=200)
+
+    psd, frequencies = power_spectrum(data, 50, welch_segments=3)
+
+    # Same segments and window as the engine (the engine scales the density to the energy of the whole sample)
+    length = 100
+    expected_frequencies, density = signal.welch(data, 50, window=np.hanning(length), nperseg=length,
+                                                 noverlap=length // 2, detrend=False, axis=1)
+    np.testing.assert_allclose(frequencies, expected_frequencies)
+    np.testing.assert_allclose(psd, density * 50 * data.shape[1] / length)
+
+
+def test_spectral_features_match_reference():
+    data = create_samples()
+    frequency = 50
+    length = data.shape[1]
+
+    features = extract_spectral_features(data, frequency)
+    energy, entropy, dominant = features[:, 0:6], features[:, 6:12], features[:, 12:18]
+    bands = features[:, 18:].reshape(len(data), len(SPECTRAL_BANDS), -1)
+
+    # One-sided spectrum of an even length (the Nyquist bin is not folded)
+    psd = np.abs(np.fft.rfft(data, axis=1)) ** 2 / length
+    psd[:, 1:-1] *= 2
+    frequencies = np.fft.rfftfreq(length, 1 / frequency)
+    np.testing.assert_allclose(energy, np.sum(np.square(data), axis=1))
+    np.testing.assert_allclose(entropy, stats.entropy(psd, axis=1))
+    np.testing.assert_array_equal(dominant, frequencies[np.argmax(psd[:, 1:], axis=1) + 1])
+
+    # The bands cover all the frequencies below the Nyquist frequency of 50Hz
+    np.testing.assert_allclose(np.sum(bands, axis=1), energy)
+
+
+def test_dominant_frequency_of_sine():
+    time = np.arange(400) / 100
+    data = np.sin(2 * np.pi * 7 * time)[np.newaxis, :, np.newaxis] + 3
+
+    features = extract_features_batch(data, ['acc_x'], False, 'rfft', 100)
+
+    assert list(features.columns) == features_names(['acc_x'], False, 'rfft')
+    assert features['dominant_acc_x'][0] == 7
+    np.testing.assert_allclose(features['band_3_8_acc_x'][0], 200, rtol=1e-9)
+
+
+def test_segments_match_extract_features():
+    data = create_samples() + 5
+    segments = np.array([[0, 0, 200], [0, 10, 11], [1, 3, 120], [2, 50, 52], [4, 199, 200], [4, 0, 150]])
+
+    features = extract_segments_features(data, segments, COLUMNS, True)
+
+    for row, (sample, start, stop) in zip(features.values, segments):
+        expected = extract_features(pd.DataFrame(data[sample, start:stop], columns=COLUMNS), True)
+        np.testing.assert_allclose(row, expected.values[0], rtol=1e-7, atol=1e-9)
+
+
+def test_segments_match_rfft_batch():
+    data = create_samples()
+    segments = np.array([[0, 0, 200], [1, 20, 120], [2, 100, 200], [3, 5, 90], [4, 0, 20]])
+
+    for welch_segments in (1, 3):
+        features = extract_segments_features(data, segments, COLUMNS, True, 'rfft', 50, welch_segments)
+        for row, (sample, start, stop) in zip(features.values, segments):
+            expected = extract_features_batch(data[sample:sample + 1, start:stop], COLUMNS, True, 'rfft', 50,
+                                              welch_segments)
+            np.testing.assert_allclose(row, expected.values[0], rtol=1e-7, atol=1e-9)
+
+
+def test_divide_falls_matches_divide_fall():
+    data = create_samples(samples=6, channels=3)
+    data[np.arange(6), [0, 3, 100, 196, 199, 150], 0] = 10
+    is_fall = np.array([True, True, True, True, False, True])
+
+    segments, labels = divide_falls(data, is_fall, 100, 50)
+
+    expected = []
+    for sample, fall in zip(data, is_fall):
+        phases = divide_fall(pd.DataFrame(sample), fall, 100, 50)
+        expected.append([p.values for p in phases if p is not None])
+    expected = [p for phases in expected for p in phases]
+    assert len(segments) == len(expected) == len(labels)
+    for (sample, start, stop), phase in zip(segments, expected):
+        np.testing.assert_array_equal(data[sample, start:stop], phase)
@@ -0,0 +1,111 @@
+import math
+import pytest
+import numpy as np
+
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import GradientBoostingClassifier
+
+from pipeline.acquisition import scale_counts
+from pipeline.acquisition import COLUMNS
+from pipeline.feature_extraction import add_magnitudes
+from pipeline.feature_extraction import compute_time_features
+from pipeline.feature_extraction import features_names
+from pipeline.compiled import compile_model
+from pipeline.compiled import CompiledModel
+from pipeline.fixed_point import integer_sqrt
+from pipeline.fixed_point import extract_fixed_point_features
+from pipeline.fixed_point import fixed_point_units
+from pipeline.fixed_point import QuantizedModel
+
+
+SENSORS = [0, 1, 2, 3, 4, 5]
+CHANNELS = len(SENSORS) + 2
+
+
+def create_counts(windows=200, time=101, seed=0):
+    """
+    Creates random windows of raw counts whose labels depend on the spread of their first axis.
+
+    :param windows: number of windows
+    :param time: number of samples of each window
+    :param seed: seed of the counts
+    :return: array of shape (windows, time, len(SENSORS)) and labels
+    """
+
+    random = np.random.RandomState(seed)
+    labels = random.randint(0, 2, windows)
+    counts = random.randint(-500, 500, (windows, time, len(SENSORS)))
+    counts[:, :, 0] *= 1 + 3 * labels[:, np.newaxis]
+
+    return counts, labels
+
+
+def float_features(counts):
+    """
+    Extracts the time domain features in floating point from the converted counts.
+
+    :param counts: array of shape (windows, time, len(SENSORS)) of the raw counts
+    :return: array of shape (windows, features)
+    """
+
+    data, _ = add_magnitudes(scale_counts(counts, SENSORS), [COLUMNS[s] for s in SENSORS])
+    return compute_time_features(data)
+
+
+def test_integer_sqrt_matches_isqrt():
+    random = np.random.RandomState(0)
+    values = np.concatenate([np.arange(1000), random.randint(0, 2 ** 62, 1000, dtype=np.int64)])
+    squares = random.randint(0, 2 ** 31, 1000, dtype=np.int64) ** 2
+    values = np.concatenate([values, squares, squares - 1, squares + 1, [2 ** 63 - 1]])
+    values = values[values >= 0]
+
+    np.testing.assert_array_equal(integer_sqrt(values), [math.isqrt(int(v)) for v in values])
+
+
+@pytest.mark.parametrize('fraction_bits', [2, 4])
+def test_features_match_floating_point(fraction_bits):
+    counts, _ = create_counts()
+
+    fixed = extract_fixed_point_features(counts, SENSORS, True, fraction_bits)
+    units = fixed_point_units(SENSORS, True, fraction_bits)
+    floating = float_features(counts)
+    error = fixed * units - floating
+    mean, var, std, orders = [slice(i * CHANNELS, (i + 1) * CHANNELS) for i in range(3)] + [slice(3 * CHANNELS, None)]
+
+    # The mean is rounded and the variance floored in fixed point (the magnitudes also lose less than one unit per
+    # sample)
+    assert fixed.dtype == np.int64
+    assert np.all(np.abs(error[:, mean]) <= 1.5 * units[mean])
+    assert np.all(np.abs(error[:, var]) <= units[var] + 4 * np.sqrt(floating[:, var] * units[var]))
+    assert np.all(np.abs(error[:, std]) <= 2 * units[std])
+
+    # The order statistics of the axes are exact, the ones of the magnitudes lose less than one unit
+    axes = np.tile(np.arange(CHANNELS) < len(SENSORS), 6)
+    np.testing.assert_allclose(error[:, orders][:, axes], 0, atol=1e-12)
+    assert np.all(np.abs(error[:, orders][:, ~axes]) <= units[orders][~axes])
+
+
+@pytest.mark.parametrize('model', [DecisionTreeClassifier(random_state=0),
+                                   RandomForestClassifier(n_estimators=10, random_state=0),
+                                   GradientBoostingClassifier(n_estimators=10, random_state=0)])
+def test_quantized_matches_compiled(model):
+    counts, labels = create_counts()
+    fixed = extract_fixed_point_features(counts, SENSORS, True)
+    units = fixed_point_units(SENSORS, True)
+    names = features_names([COLUMNS[s] for s in SENSORS], True, 'rfft')[0:len(units)]
+
+    # Fits the model on the floating point features
+    floating = float_features(counts)
+    scaler = MinMaxScaler().fit(floating)
+    model.fit(scaler.transform(floating), labels)
+    arrays = compile_model(model, scaler, {'sensors': SENSORS, 'frequency': 20, 'spectral': 'rfft'}, names)
+
+    # The quantized model compares the fixed-point features as the compiled model compares their floating point value
+    # (the values of the leaves are rounded to 2^-15)
+    quantized = QuantizedModel(arrays, units).predict_proba(fixed)
+    np.testing.assert_allclose(quantized, CompiledModel(arrays).predict_proba(fixed * units), atol=1e-4)
+
+    # Both arithmetics agree on most windows
+    assert np.mean(np.argmax(quantized, axis=1) == model.predict(scaler.transform(floating))) > 0.9
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from scipy import signal
+
+from pipeline.acquisition import create_time_index
+from pipeline.preprocessing import change_activity_duration
+from pipeline.preprocessing import change_activity_sampling
+from pipeline.preprocessing import trim_activities
+from pipeline.preprocessing import resample_activities
+from pipeline.preprocessing import decimate_activities
+
+
+FREQUENCIES = [200, 100, 50, 40, 25, 20, 10, 8, 5, 4, 2, 1]
+
+
+def create_samples(samples=4, time=2000, channels=3, seed=0):
+    """
+    Creates random samples of activity at the frequency of the sensor.
+
+    :param samples: number of samples
+    :param time: number of time steps of each sample
+    :param channels: number of channels
+    :param seed: seed of the values
+    :return: array of shape (samples, time, channels)
+    """
+
+    return np.random.RandomState(seed).normal(0, 1, (samples, time, channels))
+
+
+def test_trim_matches_change_activity_duration():
+    data = create_samples()
+    samples = [data[0], data[1, 0:1999], data[2, 0:1500], data[3, 0:700]]
+
+    for sample, trimmed in zip(samples, trim_activities(samples, 3500)):
+        expected = change_activity_duration(pd.DataFrame(sample, index=create_time_index(len(sample))), 3500)
+        np.testing.assert_array_equal(trimmed, expected.values)
+
+
+def test_decimate_matches_change_activity_sampling():
+    data = create_samples()
+
+    resampled = resample_activities(data, FREQUENCIES)
+
+    for frequency in FREQUENCIES:
+        for sample, decimated in zip(data, resampled[frequency]):
+            expected = change_activity_sampling(pd.DataFrame(sample, index=create_time_index(len(sample))), frequency)
+            np.testing.assert_array_equal(decimated, expected.values)
+
+
+def test_decimate_cascade_matches_direct_decimation():
+    data = create_samples(time=1999)
+
+    resampled = resample_activities(data, FREQUENCIES)
+
+    assert list(resampled) == FREQUENCIES
+    for frequency in FREQUENCIES:
+        np.testing.assert_array_equal(resampled[frequency], data[:, ::200 // frequency, :])
+
+
+def test_polyphase_cascade_matches_resample_poly():
+    data = create_samples()
+
+    resampled = resample_activities(data, [100, 50, 40, 8], 'polyphase')
+
+    # 50Hz comes from 100Hz, 40Hz from 200Hz and 8Hz from 40Hz
+    half = signal.resample_poly(data, 1, 2, axis=1)
+    np.testing.assert_allclose(resampled[100], half)
+    np.testing.assert_allclose(resampled[50], signal.resample_poly(half, 1, 2, axis=1))
+    np.testing.assert_allclose(resampled[40], signal.resample_poly(data, 1, 5, axis=1))
+    np.testing.assert_allclose(resampled[8], signal.resample_poly(resampled[40], 1, 5, axis=1))
+
+    # Without 100Hz, 50Hz comes from 200Hz
+    np.testing.assert_allclose(resample_activities(data, [50], 'polyphase')[50], signal.resample_poly(data, 1, 4, axis=1))
+    np.testing.assert_array_equal(decimate_activities(data, 1, 'polyphase'), data)
+
+
+def test_polyphase_removes_aliasing():
+    time = np.arange(2000) / 200
+    data = np.sin(2 * np.pi * 45 * time)[np.newaxis, :, np.newaxis]
+
+    # A 45Hz sine aliases to 5Hz when decimated to 50Hz, the anti-aliasing filter removes it
+    decimated = resample_activities(data, [50], 'decimate')[50]
+    filtered = resample_activities(data, [50], 'polyphase')[50]
+    assert np.std(decimated) > 0.5
+    assert np.std(filtered[:, 50:-50]) < 0.05
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from sklearn.preprocessing import MinMaxScaler
+from sklearn.ensemble import RandomForestClassifier
+
+from pipeline.acquisition import scale_counts
+from pipeline.acquisition import COLUMNS
+from pipeline.feature_extraction import extract_features
+from pipeline.feature_extraction import extract_features_batch
+from pipeline.streaming import SlidingWindowFeatures
+from pipeline.streaming import StreamingDetector
+from pipeline.streaming import CascadeDetector
+
+
+SENSORS = [0, 1, 2, 3, 4, 5]
+
+
+def create_counts(samples=3000, seed=0):
+    """
+    Creates a stream of random raw counts of the nine axes at the frequency of the sensor.
+
+    :param samples: number of samples
+    :param seed: seed of the counts
+    :return: array of shape (samples, 9)
+    """
+
+    return np.random.RandomState(seed).randint(-600, 600, (samples, 9))
+
+
+def fit_model(config, seed=0):
+    """
+    Fits a random forest and its scaler on the features of random windows.
+
+    :param config: parameters of the preprocessing and feature extraction of the model
+    :param seed: seed of the windows
+    :return: fitted model and scaler
+    """
+
+    window = config['duration'] * config['frequency'] // 1000
+    values = scale_counts(create_counts(40 * window, seed)[:, SENSORS], SENSORS).reshape(40, window, -1)
+    features = extract_features_batch(values, [COLUMNS[s] for s in SENSORS], True, config['spectral'],
+                                      config['frequency']).values
+    labels = np.arange(40) % 2
+    scaler = MinMaxScaler().fit(features)
+
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(features), labels), scaler
+
+
+def test_sliding_window_matches_extract_features():
+    values = scale_counts(create_counts(500)[:, SENSORS], SENSORS)
+    columns = [COLUMNS[s] for s in SENSORS]
+
+    for spectral in ('fft', 'rfft'):
+        window = SlidingWindowFeatures(columns, 64, True, spectral, 50)
+        pushed = 0
+        for chunk in (64, 1, 5, 13, 64, 40, 63, 2, 100):
+            for start in range(0, chunk, 64):
+                window.push(values[pushed + start:pushed + min(chunk, start + 64)])
+            pushed += chunk
+            expected = extract_features_batch(values[np.newaxis, pushed - 64:pushed], columns, True, spectral, 50)
+            np.testing.assert_allclose(window.features(), expected.values[0], rtol=1e-6, atol=1e-9)
+
+    # The time domain features are the ones of extract_features
+    expected = extract_features(pd.DataFrame(values[pushed - 64:pushed], columns=columns), True)
+    np.testing.assert_allclose(window.features()[0:9 * 8], expected.values[0, 0:9 * 8], rtol=1e-6, atol=1e-9)
+
+
+def test_detector_matches_batch():
+    counts = create_counts()
+
+    for spectral in ('fft', 'rfft'):
+        config = {'sensors': SENSORS, 'frequency': 20, 'duration': 2000, 'spectral': spectral}
+        model, scaler = fit_model(config)
+        detector = StreamingDetector(model, scaler, config, 7)
+
+        ends, scores = [], []
+        for start in range(0, len(counts), 137):
+            chunk_ends, chunk_scores = detector.process('device', counts[start:start + 137])
+            ends += chunk_ends
+            scores += list(chunk_scores)
+
+        # Windows of the decimated stream ending every hop once the first window is full
+        values = scale_counts(counts[::10][:, SENSORS], SENSORS)
+        stops = np.arange(40, len(values) + 1, 7)
+        windows = np.stack([values[s - 40:s] for s in stops])
+        features = extract_features_batch(windows, [COLUMNS[s] for s in SENSORS], True, spectral, 20).values
+        assert ends == list((stops - 1) * 10)
+        np.testing.assert_allclose(scores, model.predict_proba(scaler.transform(features))[:, 1], atol=1e-9)
+
+
+def test_cascade_without_gate_matches_detector():
+    counts = create_counts()
+    config = {'sensors': SENSORS, 'frequency': 20, 'duration': 2000, 'spectral': 'rfft'}
+    model, scaler = fit_model(config)
+    detector = StreamingDetector(model, scaler, config, 5)
+    cascade = CascadeDetector(model, scaler, config, 5, 0.0, 0.0, 1)
+
+    expected_ends, expected_scores = detector.process('device', counts)
+    ends, rows = [], []
+    for start in range(0, len(counts), 91):
+        chunk_ends, chunk_rows = cascade.collect('device', counts[start:start + 91])
+        ends += chunk_ends
+        rows += list(chunk_rows)
+
+    assert ends == expected_ends
+    np.testing.assert_allclose(cascade.score(np.array(rows)), expected_scores, atol=1e-9)
+    assert cascade.windows == cascade.gated == len(ends)
+
+
+def test_cascade_only_scores_after_impacts():
+    counts = create_counts()
+    counts[1500, 0:3] = 4000
+    config = {'sensors': SENSORS, 'frequency': 20, 'duration': 2000, 'spectral': 'rfft'}
+    model, scaler = fit_model(config)
+    detector = StreamingDetector(model, scaler, config, 5)
+    cascade = CascadeDetector(model, scaler, config, 5, 10.0, 0.0, 20)
+
+    expected_ends, expected_scores = detector.process('device', counts)
+    ends, scores = cascade.process('device', counts)
+
+    # Only the windows ending within 20 samples after the impact are scored, with the scores of every window
+    expected = [i for i, end in enumerate(expected_ends) if 0 <= (end - 1500) // 10 < 20]
+    assert len(expected) != 0
+    assert ends == [expected_ends[i] for i in expected]
+    np.testing.assert_allclose(scores, np.array(expected_scores)[expected], atol=1e-9)
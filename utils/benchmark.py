@@ -0,0 +1,166 @@
+import os
+import numpy as np
+
+from timeit import default_timer as timer
+
+from pipeline.acquisition import parse_file
+from pipeline.acquisition import parse_file_csv
+from pipeline.feature_extraction import moment_statistics
+from pipeline.feature_extraction import order_statistics
+from pipeline.processing import fit_and_test_classifiers
+from pipeline.evaluation import calculates_scores
+
+from sklearn.datasets import make_classification
+
+
+# Names used to create a synthetic dataset with the layout of SisFall
+SUBJECTS = ['SA' + str(i).zfill(2) for i in range(1, 24)] + ['SE' + str(i).zfill(2) for i in range(1, 16)]
+ACTIVITIES = ['D' + str(i).zfill(2) for i in range(1, 20)] + ['F' + str(i).zfill(2) for i in range(1, 16)]
+TRIALS = ['R' + str(i).zfill(2) for i in range(1, 6)]
+
+
+def create_synthetic_dataset(folder_path, n_files, n_samples, seed=0):
+    """
+    Creates a synthetic dataset with the same folder hierarchy, file names and file format as SisFall. The samples
+    are random analog counts within the range of the sensors.
+
+    :param folder_path: path of the folder where the dataset is created
+    :param n_files: number of files to create
+    :param n_samples: number of samples per file
+    :param seed: seed of the random generator
+    :return: list of the paths of the created files
+    """
+
+    random = np.random.RandomState(seed)
+    files = []
+
+    # Creates the files subject by subject
+    for subject in SUBJECTS:
+        subject_path = folder_path + '/' + subject
+        os.makedirs(subject_path, exist_ok=True)
+
+        for activity in ACTIVITIES:
+            for trial in TRIALS:
+                if len(files) == n_files:
+                    return files
+
+                # Writes random counts in the SisFall format
+                file_path = subject_path + '/' + activity + '_' + subject + '_' + trial + '.txt'
+                data = random.randint(-4096, 4096, size=(n_samples, 9))
+                np.savetxt(file_path, data, fmt='%d', delimiter=',', newline=';\n')
+                files.append(file_path)
+
+    return files
+
+
+def time_function(function, arguments):
+    """
+    Times a function called once for each given argument.
+
+    :param function: function to time
+    :param arguments: list of arguments
+    :return: total duration in [s] and list of the returned values
+    """
+
+    start = timer()
+    values = [function(a) for a in arguments]
+    stop = timer()
+
+    return stop - start, values
+
+
+def benchmark_parser(folder_path, n_files, n_samples):
+    """
+    Compares the dedicated parser of the SisFall files with the pandas parser on a synthetic dataset.
+
+    :param folder_path: path of the folder where the synthetic dataset is created
+    :param n_files: number of files in the synthetic dataset
+    :param n_samples: number of samples per file
+    """
+
+    files = create_synthetic_dataset(folder_path, n_files, n_samples)
+    print("Synthetic dataset: " + str(len(files)) + " files of " + str(n_samples) + " samples")
+
+    # Times both parsers on the whole dataset
+    time_csv, data_csv = time_function(parse_file_csv, files)
+    time_fast, data_fast = time_function(parse_file, files)
+
+    # Ensures both parsers read the same counts
+    for d1, d2 in zip(data_csv, data_fast):
+        if not np.array_equal(d1, d2):
+            raise AssertionError("The parsers read different counts.")
+
+    print("pandas parser    : " + '{:.3f}'.format(time_csv) + " s")
+    print("dedicated parser : " + '{:.3f}'.format(time_fast) + " s")
+    print("speed-up         : " + '{:.1f}'.format(time_csv / time_fast) + "x")
+
+
+def benchmark_order_statistics(n_windows, n_samples, n_channels=12, repeat=5):
+    """
+    Compares the fused moment and order statistics kernels with separate NumPy reductions on random windows.
+
+    :param n_windows: number of windows
+    :param n_samples: number of samples per window
+    :param n_channels: number of channels per window (nine axes and three magnitudes by default)
+    :param repeat: number of repetitions (the best duration is kept)
+    """
+
+    data = np.random.RandomState(0).randn(n_windows, n_samples, n_channels)
+    print("Random windows: " + str(n_windows) + " windows of " + str(n_samples) + " samples and " + str(n_channels) + " channels")
+
+    # Times both implementations
+    time_separate, separate = min((time_function(separate_statistics, [data]) for _ in range(repeat)), key=lambda r: r[0])
+    time_fused, fused = min((time_function(fused_statistics, [data]) for _ in range(repeat)), key=lambda r: r[0])
+
+    # Ensures both implementations give the same statistics
+    for s1, s2 in zip(separate[0], fused[0]):
+        if not np.allclose(s1, s2):
+            raise AssertionError("The implementations give different statistics.")
+
+    print("separate reductions : " + '{:.3f}'.format(time_separate) + " s")
+    print("fused kernels       : " + '{:.3f}'.format(time_fused) + " s")
+    print("speed-up            : " + '{:.1f}'.format(time_separate / time_fused) + "x")
+
+
+def separate_statistics(data):
+    """
+    Computes the time domain statistics with one NumPy reduction per statistic.
+
+    :param data: array of shape (windows, samples, channels)
+    :return: list of the statistics
+    """
+
+    return [np.mean(data, axis=1), np.var(data, axis=1), np.std(data, axis=1), np.min(data, axis=1),
+            np.percentile(data, 25, axis=1), np.median(data, axis=1), np.percentile(data, 75, axis=1),
+            np.max(data, axis=1), np.ptp(data, axis=1)]
+
+
+def fused_statistics(data):
+    """
+    Computes the time domain statistics with the fused moment and order statistics kernels.
+
+    :param data: array of shape (windows, samples, channels)
+    :return: list of the statistics in the order of separate_statistics
+    """
+
+    return list(moment_statistics(data)) + list(order_statistics(data))
+
+
+def benchmark_svm_probability(n_rows, n_features, k_fold=5):
+    """
+    Compares the fitting and testing times of the SVM with probabilities (internal calibration on each fit) and with
+    its decision function on a random classification problem.
+
+    :param n_rows: number of rows of the features matrix
+    :param n_features: number of features
+    :param k_fold: number of folds in the k-fold cross-validation
+    """
+
+    x, y = make_classification(n_samples=n_rows, n_features=n_features, n_informative=n_features // 4, random_state=0)
+    print("Random features: " + str(n_rows) + " rows of " + str(n_features) + " features, " + str(k_fold) + " folds")
+
+    # Fits and tests the SVM in both modes
+    for probability, mode in [(True, "probabilities      "), (False, "decision function  ")]:
+        results = calculates_scores(fit_and_test_classifiers(x, list(y), ['svm'], k_fold, probability=probability))
+        print(mode + ": fit " + '{:.3f}'.format(results['fit_time'].mean()) + " s, test "
+              + '{:.3f}'.format(results['test_time'].mean()) + " s, auroc " + '{:.3f}'.format(results['auroc'].mean()))
@@ -0,0 +1,97 @@
+import os
+import json
+import glob
+import hashlib
+
+from pipeline.acquisition import list_sisfall_files
+from utils.utils import save_checkpoint
+from utils.utils import load_checkpoint
+
+
+def dataset_fingerprint(folder_path, ignored_subjects):
+    """
+    Computes a fingerprint of the dataset files used by an experiment from their relative path, size and
+    modification time (the files are not read).
+
+    :param folder_path: path to the sisfall dataset
+    :param ignored_subjects: list of subjects to ignore
+    :return: hexadecimal fingerprint
+    """
+
+    manifest = []
+
+    # Lists the size and modification time of each file
+    for subject, file_name, file_path in list_sisfall_files(folder_path, ignored_subjects):
+        stat = os.stat(file_path)
+        manifest.append([subject + '/' + file_name, stat.st_size, stat.st_mtime_ns])
+
+    return hashlib.sha256(json.dumps(manifest).encode('utf-8')).hexdigest()
+
+
+def features_cache_key(fingerprint, parameters):
+    """
+    Computes the key of a feature matrix from the fingerprint of the dataset and the parameters of its preprocessing
+    and feature extraction. The lists are hashed in their given order, so the parameters whose order changes the
+    matrix (e.g. the sensors) must not be sorted.
+
+    :param fingerprint: fingerprint of the dataset files
+    :param parameters: dictionary of the parameters (values serializable to JSON)
+    :return: hexadecimal key
+    """
+
+    content = json.dumps({'dataset': fingerprint, 'parameters': parameters}, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def load_cached_features(cache_folder, key):
+    """
+    Loads a feature matrix and its labels from the cache. A hit marks the entry as recently used.
+
+    :param cache_folder: path to the folder caching the feature matrices
+    :param key: key of the feature matrix
+    :return: feature matrix and labels (None if the key is not cached)
+    """
+
+    file_location = cache_folder + '/' + key + '.joblib'
+    features = load_checkpoint(file_location)
+    if features is not None:
+        os.utime(file_location)
+
+    return features
+
+
+def cache_features(cache_folder, key, features, budget):
+    """
+    Saves a feature matrix and its labels to the cache, then evicts the least recently used entries exceeding the
+    size budget. Creates the cache folder if it does not exist.
+
+    :param cache_folder: path to the folder caching the feature matrices
+    :param key: key of the feature matrix
+    :param features: feature matrix and labels
+    :param budget: maximal size of the cache in [bytes]
+    """
+
+    os.makedirs(cache_folder, exist_ok=True)
+    save_checkpoint(features, cache_folder + '/' + key + '.joblib')
+    evict_least_recently_used(cache_folder, budget)
+
+
+def evict_least_recently_used(cache_folder, budget):
+    """
+    Removes the least recently used entries of the cache until its size is within the budget. The most recently used
+    entry is always kept.
+
+    :param cache_folder: path to the folder caching the feature matrices
+    :param budget: maximal size of the cache in [bytes]
+    """
+
+    # Sorts the entries from the most to the least recently used
+    entries = [(os.stat(f).st_mtime_ns, os.stat(f).st_size, f) for f in glob.glob(cache_folder + '/*.joblib')]
+    entries.sort(reverse=True)
+
+    # Removes the entries exceeding the budget
+    size = 0
+    for i, (_, entry_size, file_location) in enumerate(entries):
+        size += entry_size
+        if size > budget and i > 0:
+            os.remove(file_location)
@@ -0,0 +1,161 @@
+import os
+import asyncio
+import numpy as np
+
+from pipeline.acquisition import parse_file
+from pipeline.preprocessing import SENSOR_FREQUENCY
+
+
+def create_messages(device, counts, chunk):
+    """
+    Creates the messages sent by a device replaying the raw counts of a trial (see IngestionServer).
+
+    :param device: identifier of the device
+    :param counts: array of shape (samples, 9) of the raw counts
+    :param chunk: number of samples per message
+    :return: list of the messages (bytes ending with a newline)
+    """
+
+    lines = [','.join(str(c) for c in row) for row in counts]
+    return [(device + ':' + ';'.join(lines[i:i + chunk]) + '\n').encode() for i in range(0, len(lines), chunk)]
+
+
+class LoadStatistics:
+    """
+    Counters and latencies of the replayed devices.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.scores = []
+        self.latencies = []
+
+    def report(self, threshold):
+        """
+        Summarises the statistics.
+
+        :param threshold: fall score above which an alert is raised
+        :return: list of lines of the report
+        """
+
+        scores = np.array(self.scores)
+        latencies = np.array(self.latencies) * 1000
+        alerts = latencies[scores >= threshold]
+        lines = ["messages sent     : " + str(self.messages),
+                 "scores received   : " + str(len(scores)) + " (" + str(len(alerts)) + " alerts)"]
+
+        # Latencies of all the scores and of the alerts only
+        for prefix, values in (("latency", latencies), ("alert latency", alerts)):
+            if len(values) != 0:
+                lines.append((prefix + " p50").ljust(18) + ": " + '{:.2f}'.format(np.percentile(values, 50)) + " ms")
+                lines.append((prefix + " p99").ljust(18) + ": " + '{:.2f}'.format(np.percentile(values, 99)) + " ms")
+                lines.append((prefix + " max").ljust(18) + ": " + '{:.2f}'.format(np.max(values)) + " ms")
+        return lines
+
+
+async def replay_device(device, counts, host, port, protocol, speed, chunk, statistics, offset=0.0, drain=1.0):
+    """
+    Replays the raw counts of a trial as one device sending a message per chunk of samples at the pace of the sensor
+    times the speed. The latency of each score is the time between the sending of the last sample of its window and
+    the reception of the score.
+
+    :param device: identifier of the device
+    :param counts: array of shape (samples, 9) of the raw counts
+    :param host: address of the server
+    :param port: port of the server
+    :param protocol: either tcp or udp
+    :param speed: factor of the real time
+    :param chunk: number of samples per message
+    :param statistics: statistics updated with the messages and scores
+    :param offset: delay before the first sample [s]
+    :param drain: waiting time for the last scores after the last message [s]
+    """
+
+    loop = asyncio.get_event_loop()
+    messages = create_messages(device, counts, chunk)
+    sent = [None] * len(messages)
+
+    def receive(line):
+        _, end, score = line.decode().split(',')
+        if sent[int(end) // chunk] is not None:
+            statistics.latencies.append(loop.time() - sent[int(end) // chunk])
+            statistics.scores.append(float(score))
+
+    # Opens the connection (the scores are received by a concurrent task with TCP)
+    if protocol == 'tcp':
+        reader, writer = await asyncio.open_connection(host, port)
+        send = writer.write
+
+        async def read_scores():
+            while True:
+                line = await reader.readline()
+                if len(line) == 0:
+                    break
+                receive(line.rstrip(b'\n'))
+
+        reading = asyncio.ensure_future(read_scores())
+    else:
+        transport, _ = await loop.create_datagram_endpoint(lambda: ScoreDatagramProtocol(receive), remote_addr=(host, port))
+        send = transport.sendto
+
+    # Sends each chunk when its last sample is recorded
+    start = loop.time() + offset
+    for i, message in enumerate(messages):
+        delay = start + min((i + 1) * chunk, len(counts)) / SENSOR_FREQUENCY / speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        sent[i] = loop.time()
+        send(message)
+        statistics.messages += 1
+
+    # Waits for the last scores
+    await asyncio.sleep(drain)
+    if protocol == 'tcp':
+        writer.close()
+        reading.cancel()
+    else:
+        transport.close()
+
+
+async def replay_files(files_paths, devices, host, port, protocol, speed, chunk):
+    """
+    Replays SisFall files on many concurrent devices (the files are assigned to the devices in turn).
+
+    :param files_paths: paths of the SisFall files
+    :param devices: number of devices
+    :param host: address of the server
+    :param port: port of the server
+    :param protocol: either tcp or udp
+    :param speed: factor of the real time
+    :param chunk: number of samples per message
+    :return: statistics of the replay
+    """
+
+    statistics = LoadStatistics()
+    trials = [parse_file(f) for f in files_paths]
+
+    # Names the devices uniquely (the server keeps the state of the UDP devices of a previous replay until they are
+    # idle) and spreads their messages over the period of a chunk
+    prefix = 'device_' + str(os.getpid()) + '_'
+    period = chunk / SENSOR_FREQUENCY / speed
+    await asyncio.gather(*[replay_device(prefix + str(i), trials[i % len(trials)], host, port, protocol, speed, chunk,
+                                         statistics, period * i / devices) for i in range(devices)])
+
+    return statistics
+
+
+class ScoreDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Protocol receiving the scores sent back by the server to a UDP device.
+    """
+
+    def __init__(self, receive):
+        """
+        :param receive: function handling each line of score
+        """
+
+        self.receive = receive
+
+    def datagram_received(self, data, address):
+        for line in data.splitlines():
+            self.receive(line)
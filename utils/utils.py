@@ -1,17 +1,41 @@
 import os
-import openpyxl
+import json
+import glob
+import joblib
 import pandas as pd
 
 from datetime import datetime
 
 
-def create_output_hierarchy(output_folder, frequencies, models):
+# Columns of the results store and their types
+RESULTS_SCHEMA = {
+    'frequency': 'int64',
+    'name': 'str',
+    'abbreviation': 'str',
+    'ksplit': 'int64',
+    'score_type': 'str',
+    'fit_time': 'float64',
+    'test_time': 'float64',
+    'accuracy': 'float64',
+    'specificity': 'float64',
+    'sensitivity': 'float64',
+    'precision': 'float64',
+    'f1': 'float64',
+    'auroc': 'float64',
+    'model_file': 'str'
+}
+RESULTS_FILE = 'results.csv'
+MODEL_CONFIG_FILE = 'config.json'
+
+
+def create_output_hierarchy(output_folder, frequencies, models, resume=False):
     """
     Creates the hierarchy of folders for saving the plots and scores.
 
     :param output_folder: root output directory
     :param frequencies: list of frequencies
     :param models: list of models
+    :param resume: reuse the latest output directory (a new one is created if there is none)
     :return: path to output directory
     """
 
@@ -19,35 +43,133 @@ def create_output_hierarchy(output_folder, frequencies, models):
     now = datetime.now()
     dt_string = now.strftime('%Y%m%d_%H%M%S')
 
-    # Creates root output directory
+    # Creates root output directory (or reuses the latest one)
     results_directory = output_folder + '/results_' + dt_string
-    os.mkdir(results_directory)
+    runs = sorted(glob.glob(output_folder + '/results_*/'))
+    if resume and len(runs) != 0:
+        results_directory = os.path.dirname(runs[-1])
+    os.makedirs(results_directory, exist_ok=resume)
 
     # Creates directory for plots
     plot_directory = results_directory + '/plots'
-    os.mkdir(plot_directory)
+    os.makedirs(plot_directory, exist_ok=resume)
 
     # Creates sub directories for each plot type
     for frequency in frequencies:
         frequency_directory = plot_directory + '/' + str(frequency) + 'Hz'
-        os.mkdir(frequency_directory)
+        os.makedirs(frequency_directory, exist_ok=resume)
 
         # Creates box and whisker directory
         baw_directory = frequency_directory + '/baw'
-        os.mkdir(baw_directory)
+        os.makedirs(baw_directory, exist_ok=resume)
 
         # Creates confusion matrix directory
         cnf_directory = frequency_directory + '/cnf'
-        os.mkdir(cnf_directory)
+        os.makedirs(cnf_directory, exist_ok=resume)
 
         # Creates directory for each model (only for cnf)
         for model in models:
             model_directory = cnf_directory + '/' + model
-            os.mkdir(model_directory)
+            os.makedirs(model_directory, exist_ok=resume)
+
+        # Creates checkpoints directory
+        checkpoint_directory = results_directory + '/checkpoints/' + str(frequency) + 'Hz'
+        os.makedirs(checkpoint_directory, exist_ok=True)
 
     return results_directory
 
 
+def save_checkpoint(value, file_location):
+    """
+    Saves a value to a checkpoint file. The file is written under a temporary name then renamed, so an interrupted
+    run never leaves a partial checkpoint.
+
+    :param value: value to save
+    :param file_location: path of the checkpoint file
+    """
+
+    joblib.dump(value, file_location + '.tmp')
+    os.replace(file_location + '.tmp', file_location)
+
+
+def load_checkpoint(file_location):
+    """
+    Loads the value of a checkpoint file.
+
+    :param file_location: path of the checkpoint file
+    :return: saved value (None if there is no checkpoint)
+    """
+
+    if not os.path.isfile(file_location):
+        return None
+    return joblib.load(file_location)
+
+
+def save_model_config(model_folder, config):
+    """
+    Saves the parameters of the preprocessing and feature extraction of the models of a folder, so that the models can
+    be deployed on new data (see pipeline/streaming.py).
+
+    :param model_folder: path to the folder of the fitted models
+    :param config: dictionary of the parameters
+    """
+
+    with open(model_folder + '/' + MODEL_CONFIG_FILE, 'w') as file:
+        json.dump(config, file, indent=4)
+
+
+def load_model_config(model_folder):
+    """
+    Loads the parameters of the preprocessing and feature extraction of the models of a folder.
+
+    :param model_folder: path to the folder of the fitted models
+    :return: dictionary of the parameters
+    """
+
+    with open(model_folder + '/' + MODEL_CONFIG_FILE, 'r') as file:
+        return json.load(file)
+
+
+def append_results(output_folder, results):
+    """
+    Appends the scores of some splits to the results store of a run (a CSV file with the columns of RESULTS_SCHEMA).
+    The file and its header are created by the first call.
+
+    :param output_folder: output directory of the run
+    :param results: dataframe of scores
+    """
+
+    file_location = output_folder + '/' + RESULTS_FILE
+    rows = results.reindex(columns=list(RESULTS_SCHEMA)).astype({'frequency': 'int64', 'ksplit': 'int64'})
+    rows.to_csv(file_location, mode='a', header=not os.path.isfile(file_location), index=False)
+
+
+def load_results(output_folder, query=None):
+    """
+    Loads the results stores of all the runs (results_* folders) of an output directory into one dataframe with a
+    column naming the run of each split.
+
+    :param output_folder: root output directory
+    :param query: expression selecting the splits (see pandas.DataFrame.query, all splits if None)
+    :return: dataframe of scores
+    """
+
+    runs = []
+
+    # Reads the store of each run with the types of the schema
+    for file_location in sorted(glob.glob(output_folder + '/results_*/' + RESULTS_FILE)):
+        run = pd.read_csv(file_location, dtype=RESULTS_SCHEMA)
+        run.insert(0, 'run', os.path.basename(os.path.dirname(file_location)))
+        runs.append(run)
+
+    if len(runs) == 0:
+        results = pd.DataFrame(columns=['run'] + list(RESULTS_SCHEMA))
+    else:
+        results = pd.concat(runs, ignore_index=True)
+
+    return results if query is None else results.query(query)
+
+
 def save_to_file(output_folder, results):
     """
     Saves the calculated scores to an excel file for data persistence
@@ -56,19 +178,11 @@ def save_to_file(output_folder, results):
     :param results: dataframe of scores
     """
 
-    # Creates and open excel file
+    # Regenerates the excel file from all the scores of the run (a resumed run replaces the file of the previous
+    # attempt instead of adding a sheet to it)
     file_location = output_folder + '/results.xlsx'
-    writer = pd.ExcelWriter(file_location, engine='openpyxl')
-    if os.path.isfile(output_folder):
-        book = openpyxl.load_workbook(output_folder)
-        writer.book = book
-
-    # Writes the results to the file
-    results.drop(['classifier', 'x_test', 'y_test', 'y_pred'], axis=1).to_excel(writer, index=False)
-
-    # Saves and closes the file
-    writer.save()
-    writer.book.close()
+    with pd.ExcelWriter(file_location, engine='openpyxl') as writer:
+        results.drop(['classifier', 'x_test', 'test_index', 'y_test', 'y_pred', 'cnf_matrix'], axis=1, errors='ignore').to_excel(writer, index=False)
 
 
 def with_magnitude(sensors):
@@ -1,3 +1,5 @@
+import json
+import numpy as np
 import os.path as path
 
 
@@ -15,13 +17,28 @@ def validates_main_experiment_arguments(args):
     validates_output_folder(errors, args.output_folder)
     validates_sensors(errors, args.sensors)
     validates_ignored_subjects(errors, args.ignored_subjects)
-    validates_duration(errors, args.duration)
+    validates_duration(errors, args.duration, 10000)
     validates_frequencies(errors, args.frequencies)
     validates_pre_time(errors, args.pre_time, args.duration)
     validates_post_time(errors, args.post_time, args.duration)
     validates_classification(errors, args.classification)
     validates_models(errors, args.models)
     validates_k_fold(errors, args.k_fold)
+    validates_cache_folder(errors, args.cache_folder)
+    validates_workers(errors, args.workers)
+    validates_spectral(errors, args.spectral)
+    validates_resampling(errors, args.resampling)
+    validates_n_jobs(errors, args.n_jobs)
+    validates_scores(errors, args.scores)
+    validates_results(errors, args.results)
+    validates_model_folder(errors, args.model_folder)
+    validates_rendering(errors, args.rendering)
+    validates_plot_jobs(errors, args.plot_jobs)
+    validates_plots(errors, args.plots)
+    validates_export(errors, args.export)
+    validates_feature_cache(errors, args.feature_cache)
+    validates_feature_cache_size(errors, args.feature_cache_size)
+    validates_extraction(errors, args.extraction, args.spectral, args.sensors, args.classification)
 
     return errors
 
@@ -46,6 +63,161 @@ def validates_main_plot_sample_arguments(args):
     return errors
 
 
+def validates_main_benchmark_arguments(args):
+    """
+    Validates the main_benchmark script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    validates_benchmark(errors, args.benchmark)
+    validates_synthetic_folder(errors, args.folder)
+    validates_n_files(errors, args.n_files)
+    validates_n_samples(errors, args.n_samples)
+
+    return errors
+
+
+def validates_main_stream_arguments(args):
+    """
+    Validates the main_stream script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    validates_model_file(errors, args.model_file)
+    for data_file in args.data_files:
+        validates_data_file(errors, data_file)
+    validates_hop(errors, args.hop)
+    validates_chunk(errors, args.chunk)
+    validates_gate_threshold(errors, args.gate_threshold)
+    validates_gate_jerk(errors, args.gate_jerk)
+    validates_gate_hold(errors, args.gate_hold)
+
+    return errors
+
+
+def validates_main_server_arguments(args):
+    """
+    Validates the main_server script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    validates_model_file(errors, args.model_file)
+    validates_port(errors, args.tcp_port, True)
+    validates_port(errors, args.udp_port, True)
+    validates_hop(errors, args.hop)
+    validates_max_batch(errors, args.max_batch)
+    validates_deadline(errors, args.deadline)
+    validates_idle_timeout(errors, args.idle_timeout)
+    validates_gate_threshold(errors, args.gate_threshold)
+    validates_gate_jerk(errors, args.gate_jerk)
+    validates_gate_hold(errors, args.gate_hold)
+
+    return errors
+
+
+def validates_main_load_arguments(args):
+    """
+    Validates the main_load script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    for data_file in args.data_files:
+        validates_data_file(errors, data_file)
+    validates_port(errors, args.port)
+    validates_protocol(errors, args.protocol)
+    validates_devices(errors, args.devices)
+    validates_speed(errors, args.speed)
+    validates_chunk(errors, args.chunk)
+
+    return errors
+
+
+def validates_main_cascade_arguments(args):
+    """
+    Validates the main_cascade script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    validates_dataset_folder(errors, args.dataset_folder)
+    validates_ignored_subjects(errors, args.ignored_subjects)
+    validates_frequencies(errors, args.frequencies)
+    validates_models(errors, [args.model])
+    validates_split(errors, args.split)
+    validates_frequencies_models(errors, args.model_folder, args.frequencies, args.model, args.split)
+    validates_cache_folder(errors, args.cache_folder)
+    validates_workers(errors, args.workers)
+    validates_hop(errors, args.hop)
+    validates_gate_threshold(errors, args.gate_threshold)
+    validates_gate_jerk(errors, args.gate_jerk)
+    validates_gate_hold(errors, args.gate_hold)
+
+    return errors
+
+
+def validates_main_export_arguments(args):
+    """
+    Validates the main_export script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    validates_tree_model_file(errors, args.model_file)
+    validates_output_file(errors, args.output_file)
+    validates_n_rows(errors, args.n_rows)
+
+    return errors
+
+
+def validates_main_fixed_point_arguments(args):
+    """
+    Validates the main_fixed_point script arguments
+
+    :param args: list of arguments
+    :return: list of errors
+    """
+
+    errors = []
+
+    validates_dataset_folder(errors, args.dataset_folder)
+    validates_sensors(errors, args.sensors)
+    validates_whole_sensors(errors, args.sensors)
+    validates_ignored_subjects(errors, args.ignored_subjects)
+    validates_duration(errors, args.duration, 10000)
+    validates_frequencies(errors, args.frequencies)
+    validates_tree_models(errors, args.models)
+    validates_k_fold(errors, args.k_fold)
+    validates_cache_folder(errors, args.cache_folder)
+    validates_workers(errors, args.workers)
+    validates_n_jobs(errors, args.n_jobs)
+    validates_fraction_bits(errors, args.fraction_bits)
+    validates_value_bits(errors, args.value_bits)
+
+    return errors
+
+
 def validates_dataset_folder(errors, dataset_folder):
     """
     Validates the dataset location. Performs the following checks:
@@ -143,17 +315,18 @@ def validates_ignored_subjects(errors, ignored_subjects):
             break
 
 
-def validates_duration(errors, duration):
+def validates_duration(errors, duration, maximum=12000):
     """
     Validates the list of frequencies. Performs the following checks:
-        - is within valid range
+        - is within valid range (the samples of D01 to D04 last 10000ms in the whole dataset)
 
     :param errors:
     :param duration:
+    :param maximum:
     :return:
     """
 
-    if duration < 1000 or duration > 12000:
+    if duration < 1000 or duration > maximum:
         errors.append("Invalid duration argument.")
 
 
@@ -278,3 +451,659 @@ def validates_k_fold(errors, k_fold):
 
     if k_fold < 2 or k_fold > 20:
         errors.append("Invalid k_fold argument.")
+
+
+def validates_cache_folder(errors, cache_folder):
+    """
+    Validates the cache folder location. Performs the following checks:
+        - is folder or does not exist yet (optional argument)
+
+    :param errors:
+    :param cache_folder:
+    :return:
+    """
+
+    if cache_folder is not None and path.exists(cache_folder) and not path.isdir(cache_folder):
+        errors.append("Invalid cache folder argument.")
+
+
+def validates_workers(errors, workers):
+    """
+    Validates the number of worker processes. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param workers:
+    :return:
+    """
+
+    if workers < 1:
+        errors.append("Invalid workers argument.")
+
+
+def validates_spectral(errors, spectral):
+    """
+    Validates the frequency domain features. Performs the following checks:
+        - is valid spectral engine
+
+    :param errors:
+    :param spectral:
+    :return:
+    """
+
+    valid_spectral = ['fft', 'rfft']
+
+    if spectral not in valid_spectral:
+        errors.append("Invalid spectral argument.")
+
+
+def validates_resampling(errors, resampling):
+    """
+    Validates the resampling method. Performs the following checks:
+        - is valid method
+
+    :param errors:
+    :param resampling:
+    :return:
+    """
+
+    valid_resampling = ['decimate', 'polyphase']
+
+    if resampling not in valid_resampling:
+        errors.append("Invalid resampling argument.")
+
+
+def validates_n_jobs(errors, n_jobs):
+    """
+    Validates the number of processes fitting the models. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param n_jobs:
+    :return:
+    """
+
+    if n_jobs < 1:
+        errors.append("Invalid n_jobs argument.")
+
+
+def validates_scores(errors, scores):
+    """
+    Validates the scores of the models lacking cheap probabilities. Performs the following checks:
+        - is valid scores
+
+    :param errors:
+    :param scores:
+    :return:
+    """
+
+    valid_scores = ['probability', 'decision']
+
+    if scores not in valid_scores:
+        errors.append("Invalid scores argument.")
+
+
+def validates_results(errors, results):
+    """
+    Validates the results kept for each split. Performs the following checks:
+        - is valid results
+
+    :param errors:
+    :param results:
+    :return:
+    """
+
+    valid_results = ['full', 'light']
+
+    if results not in valid_results:
+        errors.append("Invalid results argument.")
+
+
+def validates_model_folder(errors, model_folder):
+    """
+    Validates the models folder location. Performs the following checks:
+        - is folder or does not exist yet (optional argument)
+
+    :param errors:
+    :param model_folder:
+    :return:
+    """
+
+    if model_folder is not None and path.exists(model_folder) and not path.isdir(model_folder):
+        errors.append("Invalid model folder argument.")
+
+
+def validates_rendering(errors, rendering):
+    """
+    Validates the rendering of the charts. Performs the following checks:
+        - is valid rendering
+
+    :param errors:
+    :param rendering:
+    :return:
+    """
+
+    valid_renderings = ['show', 'headless']
+
+    if rendering not in valid_renderings:
+        errors.append("Invalid rendering argument.")
+
+
+def validates_plot_jobs(errors, plot_jobs):
+    """
+    Validates the number of processes rendering the charts. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param plot_jobs:
+    :return:
+    """
+
+    if plot_jobs < 1:
+        errors.append("Invalid plot_jobs argument.")
+
+
+def validates_plots(errors, plots):
+    """
+    Validates the charts to plot. Performs the following checks:
+        - is valid plots
+
+    :param errors:
+    :param plots:
+    :return:
+    """
+
+    valid_plots = ['all', 'summary']
+
+    if plots not in valid_plots:
+        errors.append("Invalid plots argument.")
+
+
+def validates_export(errors, export):
+    """
+    Validates the final export of the scores. Performs the following checks:
+        - is valid export
+
+    :param errors:
+    :param export:
+    :return:
+    """
+
+    valid_exports = ['excel', 'none']
+
+    if export not in valid_exports:
+        errors.append("Invalid export argument.")
+
+
+def validates_feature_cache(errors, feature_cache):
+    """
+    Validates the feature cache folder location. Performs the following checks:
+        - is folder or does not exist yet (optional argument)
+
+    :param errors:
+    :param feature_cache:
+    :return:
+    """
+
+    if feature_cache is not None and path.exists(feature_cache) and not path.isdir(feature_cache):
+        errors.append("Invalid feature cache argument.")
+
+
+def validates_feature_cache_size(errors, feature_cache_size):
+    """
+    Validates the maximal size of the feature cache. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param feature_cache_size:
+    :return:
+    """
+
+    if feature_cache_size < 1:
+        errors.append("Invalid feature_cache_size argument.")
+
+
+def validates_extraction(errors, extraction, spectral, sensors, classification):
+    """
+    Validates the channels whose features are extracted. Performs the following checks:
+        - is valid extraction
+        - superset is only used with the rfft spectral features
+        - superset is only used with whole sensors (each group of three consecutive axes is one sensor)
+        - superset is only used with binary classification (the falls are divided around the peak of the magnitude
+          of all the extracted channels)
+
+    :param errors:
+    :param extraction:
+    :param spectral:
+    :param sensors:
+    :param classification:
+    :return:
+    """
+
+    valid_extractions = ['sensors', 'superset']
+
+    error = extraction not in valid_extractions
+    if extraction == 'superset':
+        if spectral != 'rfft' or len(sensors) % 3 != 0 or classification != 'binary':
+            error = True
+        for i in range(0, len(sensors) - len(sensors) % 3, 3):
+            if sorted(sensors[i:i + 3]) != list(range(sensors[i] - sensors[i] % 3, sensors[i] - sensors[i] % 3 + 3)):
+                error = True
+
+    if error:
+        errors.append("Invalid extraction argument.")
+
+
+def validates_model_file(errors, model_file):
+    """
+    Validates the model file. Performs the following checks:
+        - is valid path
+        - is file
+        - has the scaler and the configuration in its folder (or is a compiled model)
+        - is a binary model of decimated data
+
+    :param errors:
+    :param model_file:
+    :return:
+    """
+
+    folder = path.dirname(path.abspath(model_file))
+    compiled = model_file.endswith('.npz')
+    if not path.isfile(model_file) or (not compiled and (not path.isfile(folder + '/scaler.joblib') or not path.isfile(folder + '/config.json'))):
+        errors.append("Invalid model file argument.")
+        return
+
+    if compiled:
+        with np.load(model_file) as artifact:
+            config = json.loads(str(artifact['config'])) if 'config' in artifact.files else None
+    else:
+        with open(folder + '/config.json', 'r') as file:
+            config = json.load(file)
+    if config is None or config['classification'] != 'binary' or config['resampling'] != 'decimate':
+        errors.append("Invalid model file argument.")
+
+
+def validates_hop(errors, hop):
+    """
+    Validates the time between two predictions. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param hop:
+    :return:
+    """
+
+    if hop < 1:
+        errors.append("Invalid hop argument.")
+
+
+def validates_chunk(errors, chunk):
+    """
+    Validates the number of samples sent at once. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param chunk:
+    :return:
+    """
+
+    if chunk < 1:
+        errors.append("Invalid chunk argument.")
+
+
+def validates_port(errors, port, optional=False):
+    """
+    Validates a network port. Performs the following checks:
+        - is within valid range (0 is allowed for optional ports)
+
+    :param errors:
+    :param port:
+    :param optional:
+    :return:
+    """
+
+    if not (1 <= port <= 65535 or (optional and port == 0)):
+        errors.append("Invalid port argument.")
+
+
+def validates_max_batch(errors, max_batch):
+    """
+    Validates the maximal number of windows scored at once. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param max_batch:
+    :return:
+    """
+
+    if max_batch < 1:
+        errors.append("Invalid max_batch argument.")
+
+
+def validates_deadline(errors, deadline):
+    """
+    Validates the maximal waiting time of a window. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param deadline:
+    :return:
+    """
+
+    if deadline < 0:
+        errors.append("Invalid deadline argument.")
+
+
+def validates_idle_timeout(errors, idle_timeout):
+    """
+    Validates the idle timeout of the UDP devices. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param idle_timeout:
+    :return:
+    """
+
+    if idle_timeout < 1:
+        errors.append("Invalid idle_timeout argument.")
+
+
+def validates_protocol(errors, protocol):
+    """
+    Validates the protocol of the devices. Performs the following checks:
+        - is valid protocol
+
+    :param errors:
+    :param protocol:
+    :return:
+    """
+
+    valid_protocols = ['tcp', 'udp']
+
+    if protocol not in valid_protocols:
+        errors.append("Invalid protocol argument.")
+
+
+def validates_devices(errors, devices):
+    """
+    Validates the number of devices. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param devices:
+    :return:
+    """
+
+    if devices < 1:
+        errors.append("Invalid devices argument.")
+
+
+def validates_speed(errors, speed):
+    """
+    Validates the replay speed. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param speed:
+    :return:
+    """
+
+    if speed <= 0:
+        errors.append("Invalid speed argument.")
+
+
+def validates_split(errors, split):
+    """
+    Validates the split of the fitted model. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param split:
+    :return:
+    """
+
+    if split < 1:
+        errors.append("Invalid split argument.")
+
+
+def validates_frequencies_models(errors, model_folder, frequencies, model, split):
+    """
+    Validates the models saved for each frequency. Performs the following checks:
+        - is valid model file for each frequency (see validates_model_file)
+        - has the frequency of its folder
+
+    :param errors:
+    :param model_folder:
+    :param frequencies:
+    :param model:
+    :param split:
+    :return:
+    """
+
+    for frequency in frequencies:
+        frequency_model_folder = model_folder + '/' + str(frequency) + 'Hz'
+        model_errors = []
+        validates_model_file(model_errors, frequency_model_folder + '/' + model + '_split_' + str(split) + '.joblib')
+        if len(model_errors) != 0:
+            errors.append("Invalid model folder argument (no valid model at " + str(frequency) + "Hz).")
+            return
+
+        with open(frequency_model_folder + '/config.json', 'r') as file:
+            config = json.load(file)
+        if config['frequency'] != frequency:
+            errors.append("Invalid model folder argument (no valid model at " + str(frequency) + "Hz).")
+            return
+
+
+def validates_gate_threshold(errors, gate_threshold):
+    """
+    Validates the acceleration magnitude of a candidate impact. Performs the following checks:
+        - is within valid range (no gate if None)
+
+    :param errors:
+    :param gate_threshold:
+    :return:
+    """
+
+    if gate_threshold is not None and gate_threshold < 0:
+        errors.append("Invalid gate threshold argument.")
+
+
+def validates_gate_jerk(errors, gate_jerk):
+    """
+    Validates the change of the acceleration magnitude of a candidate impact. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param gate_jerk:
+    :return:
+    """
+
+    if gate_jerk < 0:
+        errors.append("Invalid gate jerk argument.")
+
+
+def validates_gate_hold(errors, gate_hold):
+    """
+    Validates the time after a candidate impact during which the windows are scored. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param gate_hold:
+    :return:
+    """
+
+    if gate_hold < 1:
+        errors.append("Invalid gate hold argument.")
+
+
+def validates_tree_model_file(errors, model_file):
+    """
+    Validates the file of a tree model. Performs the following checks:
+        - is valid path
+        - is file
+        - has the scaler and the configuration in its folder
+        - is a decision tree, random forest or gradient boosting model
+
+    :param errors:
+    :param model_file:
+    :return:
+    """
+
+    folder = path.dirname(path.abspath(model_file))
+    if not path.isfile(model_file) or not path.isfile(folder + '/scaler.joblib') or not path.isfile(folder + '/config.json'):
+        errors.append("Invalid model file argument.")
+        return
+
+    if path.basename(model_file).split('_')[0] not in ['dt', 'rf', 'gb']:
+        errors.append("Invalid model file argument.")
+
+
+def validates_output_file(errors, output_file):
+    """
+    Validates the output file location. Performs the following checks:
+        - is in an existing folder (optional argument)
+        - is not a folder
+
+    :param errors:
+    :param output_file:
+    :return:
+    """
+
+    if output_file is not None and (not path.isdir(path.dirname(path.abspath(output_file))) or path.isdir(output_file)):
+        errors.append("Invalid output file argument.")
+
+
+def validates_n_rows(errors, n_rows):
+    """
+    Validates the number of random rows. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param n_rows:
+    :return:
+    """
+
+    if n_rows < 1:
+        errors.append("Invalid n_rows argument.")
+
+
+def validates_whole_sensors(errors, sensors):
+    """
+    Validates that the sensors' axes form whole sensors. Performs the following checks:
+        - each group of three consecutive axes is the three axes of one sensor
+
+    :param errors:
+    :param sensors:
+    :return:
+    """
+
+    error = len(sensors) % 3 != 0
+    for i in range(0, len(sensors) - len(sensors) % 3, 3):
+        if sorted(sensors[i:i + 3]) != list(range(sensors[i] - sensors[i] % 3, sensors[i] - sensors[i] % 3 + 3)):
+            error = True
+
+    if error:
+        errors.append("Invalid sensors argument (whole sensors are needed).")
+
+
+def validates_tree_models(errors, models):
+    """
+    Validates the list of tree models. Performs the following checks:
+        - is valid list of models
+        - has only tree models
+
+    :param errors:
+    :param models:
+    :return:
+    """
+
+    validates_models(errors, models)
+    if any(m not in ['dt', 'rf', 'gb'] for m in models):
+        errors.append("Invalid models argument (only dt, rf and gb).")
+
+
+def validates_fraction_bits(errors, fraction_bits):
+    """
+    Validates the number of fractional bits of the fixed-point samples. Performs the following checks:
+        - is within valid range (exact percentiles need two bits, the sums of squares overflow 64 bits above four)
+
+    :param errors:
+    :param fraction_bits:
+    :return:
+    """
+
+    if fraction_bits < 2 or fraction_bits > 4:
+        errors.append("Invalid fraction_bits argument.")
+
+
+def validates_value_bits(errors, value_bits):
+    """
+    Validates the number of fractional bits of the values of the leaves. Performs the following checks:
+        - is within valid range
+
+    :param errors:
+    :param value_bits:
+    :return:
+    """
+
+    if value_bits < 1 or value_bits > 40:
+        errors.append("Invalid value_bits argument.")
+
+
+def validates_benchmark(errors, benchmark):
+    """
+    Validates the benchmark name. Performs the following checks:
+        - is valid benchmark
+
+    :param errors:
+    :param benchmark:
+    :return:
+    """
+
+    valid_benchmarks = ['parser', 'order_statistics', 'svm_probability']
+
+    if benchmark not in valid_benchmarks:
+        errors.append("Invalid benchmark argument.")
+
+
+def validates_synthetic_folder(errors, folder):
+    """
+    Validates the folder of the synthetic data. Performs the following checks:
+        - is folder or does not exist yet (optional argument)
+
+    :param errors:
+    :param folder:
+    :return:
+    """
+
+    if folder is not None and path.exists(folder) and not path.isdir(folder):
+        errors.append("Invalid folder argument.")
+
+
+def validates_n_files(errors, n_files):
+    """
+    Validates the number of synthetic files. Performs the following checks:
+        - is within valid range (optional argument)
+
+    :param errors:
+    :param n_files:
+    :return:
+    """
+
+    if n_files is not None and (n_files < 1 or n_files > 38 * 34 * 5):
+        errors.append("Invalid n_files argument.")
+
+
+def validates_n_samples(errors, n_samples):
+    """
+    Validates the number of samples per synthetic file. Performs the following checks:
+        - is within valid range (optional argument)
+
+    :param errors:
+    :param n_samples:
+    :return:
+    """
+
+    if n_samples is not None and n_samples < 1:
+        errors.append("Invalid n_samples argument.")